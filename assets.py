@@ -0,0 +1,158 @@
+"""Fingerprinted, minified, precompressed static assets for webapp.py.
+
+The pages' CSS and JavaScript live in assets/ instead of inline in every
+response. At startup each file is minified, named after a hash of its
+content (dashboard.css -> dashboard.3f9a1c2b7d4e.css) and compressed once
+with gzip and brotli (the `brotli` package; without it, gzip only).
+Templates link them with {{ asset_url('dashboard.css') }}; since a new
+version always gets a new URL, browsers may cache them for a year without
+revalidating. Edits to assets/ take effect on the next restart.
+
+    python assets.py    # print the manifest
+"""
+import os
+import re
+import gzip
+import hashlib
+import logging
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+URL_PREFIX = "/assets"
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+CONTENT_TYPES = {
+    ".css": "text/css; charset=utf-8",
+    ".js": "application/javascript; charset=utf-8",
+}
+
+
+def minify_css(text):
+    """Drop comments and collapse whitespace around punctuation."""
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text):
+    """Drop indentation, blank lines and whole-line // comments.
+
+    Deliberately line-based: nothing inside a statement is touched, so no
+    tokenizer is needed to stay correct.
+    """
+    lines = (line.strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//")) + "\n"
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+class Asset:
+    """One built asset: its fingerprinted name and body per content-coding."""
+
+    def __init__(self, source_name, text):
+        stem, ext = os.path.splitext(source_name)
+        body = MINIFIERS[ext](text).encode("utf-8")
+        self.digest = hashlib.sha256(body).hexdigest()[:12]
+        self.name = f"{stem}.{self.digest}{ext}"
+        self.content_type = CONTENT_TYPES[ext]
+        self.source_size = len(text.encode("utf-8"))
+        self.bodies = {"identity": body}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.bodies["gzip"] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, mode=brotli.MODE_TEXT, quality=11)
+            if len(compressed) < len(body):
+                self.bodies["br"] = compressed
+
+
+class Bundle:
+    """Every asset in a directory, by source name and by fingerprinted name."""
+
+    def __init__(self, directory=ASSETS_DIR):
+        self.by_source = {}
+        self.by_name = {}
+        for source_name in sorted(os.listdir(directory)):
+            if os.path.splitext(source_name)[1] not in MINIFIERS:
+                continue
+            with open(os.path.join(directory, source_name), encoding="utf-8") as f:
+                asset = Asset(source_name, f.read())
+            self.by_source[source_name] = asset
+            self.by_name[asset.name] = asset
+        self._lock = threading.Lock()
+        self.served = {"identity": 0, "gzip": 0, "br": 0}
+        self.not_modified = 0
+
+    def url(self, source_name):
+        return f"{URL_PREFIX}/{self.by_source[source_name].name}"
+
+    def count(self, coding, not_modified=False):
+        with self._lock:
+            if not_modified:
+                self.not_modified += 1
+            else:
+                self.served[coding] += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "assets": len(self.by_source),
+                "source_bytes": sum(a.source_size for a in self.by_source.values()),
+                "minified_bytes": sum(len(a.bodies["identity"]) for a in self.by_source.values()),
+                "brotli": brotli is not None,
+                "served": dict(self.served),
+                "not_modified": self.not_modified,
+            }
+
+
+def choose_coding(asset, accept_encodings):
+    """Best stored coding the client accepts: br, then gzip, then identity."""
+    for coding in ("br", "gzip"):
+        if coding in asset.bodies and accept_encodings.quality(coding) > 0:
+            return coding
+    return "identity"
+
+
+def init_app(app, directory=ASSETS_DIR):
+    """Build the bundle, add GET /assets/<name> and the asset_url() template global."""
+    from flask import Response, abort, request
+
+    bundle = Bundle(directory)
+    logger.info("Built %d static assets", len(bundle.by_source))
+
+    def serve_asset(filename):
+        asset = bundle.by_name.get(filename)
+        if asset is None:
+            abort(404)
+        coding = choose_coding(asset, request.accept_encodings)
+        response = Response(asset.bodies[coding], content_type=asset.content_type)
+        if coding != "identity":
+            response.headers["Content-Encoding"] = coding
+        response.headers["Cache-Control"] = IMMUTABLE
+        response.headers["Vary"] = "Accept-Encoding"
+        response.set_etag(f"{asset.digest}-{coding}")
+        response = response.make_conditional(request)
+        bundle.count(coding, not_modified=response.status_code == 304)
+        return response
+
+    app.add_url_rule(f"{URL_PREFIX}/<path:filename>", endpoint="asset", view_func=serve_asset)
+    app.jinja_env.globals["asset_url"] = bundle.url
+    return bundle
+
+
+if __name__ == "__main__":
+    bundle = Bundle()
+    print(f"{'source':24}{'asset':36}{'bytes':>8}{'min':>8}{'gzip':>8}{'br':>8}")
+    for source_name, asset in bundle.by_source.items():
+        sizes = [len(asset.bodies.get(c, b"")) or "-" for c in ("identity", "gzip", "br")]
+        print(f"{source_name:24}{asset.name:36}{asset.source_size:>8}{sizes[0]:>8}{sizes[1]:>8}{sizes[2]:>8}")
@@ -0,0 +1,21 @@
+async function deleteExercise(exerciseId) {
+    if (!confirm('Are you sure you want to delete this exercise?')) {
+        return;
+    }
+
+    try {
+        const response = await fetch(`/api/delete-exercise/${exerciseId}`, {
+            method: 'DELETE'
+        });
+
+        if (response.ok) {
+            alert('✅ Exercise deleted successfully!');
+            window.location.reload();
+        } else {
+            alert('❌ Error deleting exercise');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        alert('❌ Error deleting exercise');
+    }
+}
@@ -0,0 +1,32 @@
+function logExercise(exerciseName, muscleGroup) {
+    const sets = prompt("How many sets?", "3");
+    if (!sets) return;
+
+    const reps = prompt("How many reps?", "10");
+    if (!reps) return;
+
+    const weight = prompt("Weight in kg?", "20");
+    if (!weight) return;
+
+    fetch('/api/log-workout', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            muscle_group: muscleGroup,
+            exercises: [{
+                name: exerciseName,
+                sets: parseInt(sets),
+                reps: parseInt(reps),
+                weight: parseFloat(weight)
+            }]
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            alert('✅ Workout logged successfully!');
+        } else {
+            alert('❌ Error logging workout');
+        }
+    });
+}
@@ -0,0 +1,68 @@
+let setCount = 3;
+
+function toggleCheck(element) {
+    element.classList.toggle('checked');
+    if (element.classList.contains('checked')) {
+        element.innerHTML = '✓';
+    } else {
+        element.innerHTML = '';
+    }
+}
+
+function addSet() {
+    setCount++;
+    const container = document.getElementById('setsContainer');
+
+    const setRow = document.createElement('div');
+    setRow.className = 'set-row';
+    setRow.innerHTML = `
+        <div class="set-number">${setCount}</div>
+        <input type="number" class="set-input weight-input" placeholder="0" step="0.5">
+        <input type="number" class="set-input reps-input" placeholder="0">
+        <div class="check-mark" onclick="toggleCheck(this)"></div>
+    `;
+
+    container.appendChild(setRow);
+}
+
+async function saveWorkout() {
+    const setRows = document.querySelectorAll('.set-row');
+    const exercises = [];
+
+    setRows.forEach((row, index) => {
+        const weight = row.querySelector('.weight-input').value;
+        const reps = row.querySelector('.reps-input').value;
+        const checked = row.querySelector('.check-mark').classList.contains('checked');
+
+        if (weight && reps && checked) {
+            exercises.push({
+                name: exerciseCard.exerciseName,
+                sets: 1,
+                reps: parseInt(reps),
+                weight: parseFloat(weight)
+            });
+        }
+    });
+
+    if (exercises.length === 0) {
+        alert('⚠️ Please complete at least one set!');
+        return;
+    }
+
+    const response = await fetch('/api/log-workout', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            muscle_group: exerciseCard.muscleGroup,
+            exercises: exercises,
+            workout_date: selectedDate
+        })
+    });
+
+    if (response.ok) {
+        alert('✅ Workout logged successfully!');
+        window.location.href = '/dashboard';
+    } else {
+        alert('❌ Error logging workout');
+    }
+}
@@ -0,0 +1,28 @@
+// Date picker shared by the logging forms (log_exercise.html, log_swimming.html)
+const exerciseCard = document.querySelector('.exercise-card').dataset;
+let selectedDate = document.getElementById('datePicker').value;
+
+function toggleDatePicker() {
+    const picker = document.getElementById('datePicker');
+    // Try modern API first, fallback to click
+    if (picker.showPicker) {
+        try {
+            picker.showPicker();
+        } catch (e) {
+            // Fallback for browsers that don't support showPicker
+            picker.focus();
+            picker.click();
+        }
+    } else {
+        // Fallback for older browsers
+        picker.focus();
+        picker.click();
+    }
+}
+
+function updateDate(picker) {
+    selectedDate = picker.value;
+    const date = new Date(picker.value + 'T00:00:00');
+    const options = { year: 'numeric', month: 'short', day: 'numeric' };
+    document.getElementById('displayDate').textContent = date.toLocaleDateString('en-US', options);
+}
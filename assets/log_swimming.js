@@ -0,0 +1,99 @@
+let currentMode = 'duration';
+
+function setMode(mode) {
+    currentMode = mode;
+    const durationBtn = document.getElementById('durationBtn');
+    const distanceBtn = document.getElementById('distanceBtn');
+    const durationSection = document.getElementById('durationSection');
+    const distanceSection = document.getElementById('distanceSection');
+
+    if (mode === 'duration') {
+        durationBtn.classList.add('active');
+        distanceBtn.classList.remove('active');
+        durationSection.style.display = 'block';
+        distanceSection.style.display = 'none';
+    } else {
+        distanceBtn.classList.add('active');
+        durationBtn.classList.remove('active');
+        distanceSection.style.display = 'block';
+        durationSection.style.display = 'none';
+    }
+    calculateCalories();
+}
+
+function calculateCalories() {
+    const strokeType = document.getElementById('strokeType').value;
+    let calories = 0;
+
+    // Approximate calories per minute for different strokes (for 70kg person)
+    const caloriesPerMinute = {
+        'Freestyle': 11,
+        'Backstroke': 9,
+        'Breaststroke': 10,
+        'Butterfly': 13
+    };
+
+    if (currentMode === 'duration') {
+        const hours = parseInt(document.getElementById('hours').value) || 0;
+        const minutes = parseInt(document.getElementById('minutes').value) || 0;
+        const totalMinutes = (hours * 60) + minutes;
+        calories = Math.round(totalMinutes * caloriesPerMinute[strokeType]);
+    } else {
+        const distance = parseInt(document.getElementById('distance').value) || 0;
+        // Approximate: 100m takes about 2 minutes for average swimmer
+        const estimatedMinutes = (distance / 100) * 2;
+        calories = Math.round(estimatedMinutes * caloriesPerMinute[strokeType]);
+    }
+
+    document.getElementById('caloriesDisplay').textContent = calories;
+}
+
+// Calculate initial calories
+calculateCalories();
+
+async function saveWorkout() {
+    const strokeType = document.getElementById('strokeType').value;
+    let duration = 0;
+    let distance = 0;
+
+    if (currentMode === 'duration') {
+        const hours = parseInt(document.getElementById('hours').value) || 0;
+        const minutes = parseInt(document.getElementById('minutes').value) || 0;
+        duration = (hours * 60) + minutes;
+
+        if (duration === 0) {
+            alert('⚠️ Please enter a duration!');
+            return;
+        }
+    } else {
+        distance = parseInt(document.getElementById('distance').value) || 0;
+
+        if (distance === 0) {
+            alert('⚠️ Please enter a distance!');
+            return;
+        }
+    }
+
+    const calories = parseInt(document.getElementById('caloriesDisplay').textContent);
+
+    const response = await fetch('/api/log-swimming-workout', {
+        method: 'POST',
+        headers: {'Content-Type': 'application/json'},
+        body: JSON.stringify({
+            exercise_name: exerciseCard.exerciseName,
+            stroke_type: strokeType,
+            mode: currentMode,
+            duration: duration,
+            distance: distance,
+            calories: calories,
+            workout_date: selectedDate
+        })
+    });
+
+    if (response.ok) {
+        alert('✅ Workout logged successfully!');
+        window.location.href = '/dashboard';
+    } else {
+        alert('❌ Error logging workout');
+    }
+}
@@ -0,0 +1 @@
+"""Local benchmarks and load tests. Run modules with `python -m benchmarks.<name>`."""
@@ -0,0 +1,188 @@
+"""Time the dashboard data fetch: three sequential queries vs one round trip.
+
+Seeds a throwaway schema (default `bench_dashboard`) with users, workouts,
+exercises and personal records of realistic size, then times
+
+* legacy - the three queries /dashboard used to run, and
+* single - dashboard.fetch_dashboard (one UNION ALL statement),
+
+first without and then with the indexes schema.py creates. Uses the
+database configured in .env/DB_*; the schema is dropped afterwards unless
+--keep is given.
+
+    python -m benchmarks.dashboard_queries --users 500 --workouts 150 --iterations 300
+"""
+import time
+import random
+import argparse
+import statistics
+
+import psycopg2
+
+import db_pool
+import schema
+from dashboard import fetch_dashboard
+from benchmarks.loadtest import percentile
+
+TABLES = """
+    CREATE TABLE users (
+        id SERIAL PRIMARY KEY,
+        wa_id VARCHAR(20) UNIQUE NOT NULL,
+        name TEXT, email TEXT, registered BOOLEAN DEFAULT FALSE, language VARCHAR(5)
+    );
+    CREATE TABLE workouts (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        workout_date DATE NOT NULL,
+        muscle_group VARCHAR(50)
+    );
+    CREATE TABLE workout_exercises (
+        id SERIAL PRIMARY KEY,
+        workout_id INTEGER NOT NULL REFERENCES workouts(id) ON DELETE CASCADE,
+        exercise_name VARCHAR(200) NOT NULL,
+        sets INTEGER, reps INTEGER, weight NUMERIC(7, 2),
+        order_index INTEGER
+    );
+    CREATE TABLE personal_records (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER NOT NULL REFERENCES users(id),
+        exercise_name VARCHAR(200) NOT NULL,
+        weight NUMERIC(7, 2), reps INTEGER,
+        date_achieved DATE DEFAULT CURRENT_DATE,
+        e1rm NUMERIC(8, 2), max_volume NUMERIC(12, 2),
+        best_distance NUMERIC(8, 2), best_duration NUMERIC(8, 2),
+        UNIQUE (user_id, exercise_name)
+    );
+"""
+
+SEED = """
+    INSERT INTO users (wa_id, name, registered, language)
+    SELECT '1555' || lpad(u::text, 7, '0'), 'User ' || u, TRUE, 'en'
+    FROM generate_series(1, %(users)s) AS u;
+
+    -- Workouts spread over the last two years, roughly every 5 days.
+    INSERT INTO workouts (user_id, workout_date, muscle_group)
+    SELECT u.id,
+           CURRENT_DATE - (random() * 730)::int,
+           (ARRAY['chest','back','biceps','triceps','shoulders','legs','abs'])[1 + (random() * 6)::int]
+    FROM users u, generate_series(1, %(workouts)s);
+
+    INSERT INTO workout_exercises (workout_id, exercise_name, sets, reps, weight, order_index)
+    SELECT w.id, w.muscle_group || ' exercise ' || (1 + (random() * 11)::int),
+           3 + (random() * 2)::int, 6 + (random() * 8)::int, round((20 + random() * 120)::numeric, 2), i
+    FROM workouts w, generate_series(0, %(exercises)s - 1) AS i;
+
+    INSERT INTO personal_records (user_id, exercise_name, weight, reps, date_achieved)
+    SELECT w.user_id, we.exercise_name, MAX(we.weight), MAX(we.reps), MAX(w.workout_date)
+    FROM workouts w JOIN workout_exercises we ON we.workout_id = w.id
+    GROUP BY w.user_id, we.exercise_name;
+"""
+
+LEGACY_QUERIES = (
+    """
+    SELECT COUNT(DISTINCT w.id) as total_workouts,
+           COUNT(we.id) as total_exercises,
+           COALESCE(SUM(we.sets * we.reps), 0) as total_reps
+    FROM workouts w
+    LEFT JOIN workout_exercises we ON we.workout_id = w.id
+    WHERE w.user_id = %s
+    """,
+    """
+    SELECT w.workout_date, w.muscle_group,
+           we.exercise_name, we.sets, we.reps, we.weight, we.id as exercise_id
+    FROM workouts w
+    JOIN workout_exercises we ON we.workout_id = w.id
+    WHERE w.user_id = %s AND w.workout_date >= CURRENT_DATE - INTERVAL '30 days'
+    ORDER BY w.workout_date DESC, we.order_index
+    LIMIT 50
+    """,
+    """
+    SELECT exercise_name, weight, reps, date_achieved
+    FROM personal_records
+    WHERE user_id = %s
+    ORDER BY date_achieved DESC
+    LIMIT 10
+    """,
+)
+
+INDEXED_TABLES = ("ON workouts ", "ON workout_exercises ", "ON personal_records ")
+
+
+def fetch_legacy(cur, user_id):
+    results = []
+    for query in LEGACY_QUERIES:
+        cur.execute(query, (user_id,))
+        results.append(cur.fetchall())
+    stats, workouts, records = results
+    return workouts, records, stats[0]
+
+
+def time_variant(cur, fetch, user_ids, iterations):
+    timings = []
+    for _ in range(iterations):
+        user_id = random.choice(user_ids)
+        started = time.perf_counter()
+        fetch(cur, user_id)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:28}{statistics.mean(timings) * 1000:>10.2f}"
+          f"{percentile(timings, 50) * 1000:>10.2f}{percentile(timings, 95) * 1000:>10.2f}"
+          f"{percentile(timings, 99) * 1000:>10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default="bench_dashboard")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workouts", type=int, default=150, help="workouts per user")
+    parser.add_argument("--exercises", type=int, default=5, help="exercises per workout")
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--keep", action="store_true", help="keep the seeded schema")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(**db_pool.get_pool().connect_kwargs)
+    conn.autocommit = True
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {args.schema}")
+        cur.execute(f"SET search_path TO {args.schema}")
+        cur.execute(TABLES)
+
+        started = time.perf_counter()
+        cur.execute(SEED, {"users": args.users, "workouts": args.workouts, "exercises": args.exercises})
+        cur.execute("ANALYZE users, workouts, workout_exercises, personal_records")
+        cur.execute("SELECT COUNT(*) FROM workout_exercises")
+        print(f"Seeded {args.users} users, {args.users * args.workouts} workouts, "
+              f"{cur.fetchone()[0]} exercises in {time.perf_counter() - started:.1f}s")
+
+        cur.execute("SELECT id FROM users")
+        user_ids = [row[0] for row in cur.fetchall()]
+
+        sample = random.choice(user_ids)
+        legacy, single = fetch_legacy(cur, sample), fetch_dashboard(cur, sample)
+        if legacy[2] != single[2] or sorted(legacy[0]) != sorted(single[0]) or sorted(legacy[1]) != sorted(single[1]):
+            # Rows tied on date can legitimately fall either side of a LIMIT.
+            print(f"Note: legacy and single-query rows differ for user {sample}")
+
+        print(f"\n{'ms per page view':28}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        for indexed in (False, True):
+            if indexed:
+                for statement in schema.STATEMENTS:
+                    if "CREATE INDEX" in statement and any(table in statement for table in INDEXED_TABLES):
+                        cur.execute(statement)
+                cur.execute("ANALYZE users, workouts, workout_exercises, personal_records")
+            suffix = "indexed" if indexed else "no indexes"
+            report(f"legacy, {suffix}", time_variant(cur, fetch_legacy, user_ids, args.iterations))
+            report(f"single, {suffix}", time_variant(cur, fetch_dashboard, user_ids, args.iterations))
+    finally:
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Local stand-in for the WhatsApp Cloud (Graph) API.
+
+Accepts POST /<version>/<phone_number_id>/messages and
+GET /<version>/<phone_number_id> like graph.facebook.com, with
+configurable latency and 429 injection, and records when each message
+arrived so the load test can measure end-to-end latency.
+
+    python -m benchmarks.fake_graph --port 9000 --latency-ms 80 --throttle-rate 0.02
+
+then point the bot at it with GRAPH_API_URL=http://127.0.0.1:9000.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeGraphAPI:
+    """Threaded fake Graph API server; use start()/stop() or as a context manager."""
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.02,
+                 throttle_rate=0.0, retry_after=1, throttle_code=130429):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.throttle_code = throttle_code
+
+        self._lock = threading.Lock()
+        self._received = defaultdict(list)   # recipient -> [(perf_counter, type)]
+        self.requests = 0
+        self.throttled = 0
+        self.by_type = defaultdict(int)
+        self._ids = 0
+
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"   # keep-alive, like the real API
+
+            def _reply(self, status, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                status, body, headers = fake.handle_message(self.path, payload)
+                self._reply(status, body, headers)
+
+            def do_GET(self):
+                fake.sleep()
+                self._reply(200, {"id": self.path.rstrip("/").rsplit("/", 1)[-1],
+                                  "display_phone_number": "15550000000"})
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def sleep(self):
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle_message(self, path, payload):
+        self.sleep()
+        if not path.endswith("/messages"):
+            return 404, {"error": {"message": "Unknown path", "code": 100}}, ()
+        with self._lock:
+            self.requests += 1
+            if self.throttle_rate and random.random() < self.throttle_rate:
+                self.throttled += 1
+                error = {"error": {"message": "Rate limit hit", "code": self.throttle_code}}
+                return 429, error, (("Retry-After", str(self.retry_after)),)
+            self._ids += 1
+            message_type = payload.get("type", "text")
+            self.by_type[message_type] += 1
+            self._received[payload.get("to")].append((time.perf_counter(), message_type))
+            message_id = f"wamid.fake{self._ids}"
+        return 200, {"messaging_product": "whatsapp", "messages": [{"id": message_id}]}, ()
+
+    def first_reply_after(self, recipient, since):
+        """perf_counter time of the first message to recipient at or after `since`."""
+        with self._lock:
+            for received_at, _ in self._received.get(recipient, ()):
+                if received_at >= since:
+                    return received_at
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "delivered": sum(self.by_type.values()),
+                "by_type": dict(self.by_type),
+            }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-graph", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    fake = FakeGraphAPI(args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                        args.throttle_rate, args.retry_after)
+    print(f"Fake Graph API listening on {fake.url}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(fake.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""Webhook load test against a local fake Graph API.
+
+Simulated users walk through a realistic conversation (greeting, language
+button, registration, muscle-group texts, logout) while status callbacks
+(sent/delivered/read) are fired in between, as Meta does. For every
+inbound message we record
+
+* ack latency - POST /webhook until the 200 comes back, and
+* end-to-end latency - POST /webhook until the first reply to that user
+  reaches the fake Graph API.
+
+By default webhook2.app is started in-process on a local port with
+GRAPH_API_URL pointing at the fake. The app still talks to the database
+configured in .env/DB_* - use a scratch database, not production.
+
+    python -m benchmarks.loadtest --users 50 --rounds 2 --latency-ms 80 --throttle-rate 0.02
+
+To drive an already running server, start it with
+GRAPH_API_URL=http://127.0.0.1:<graph-port> and pass --url:
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:5001/webhook --graph-port 9000
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+
+import requests
+
+from benchmarks.fake_graph import FakeGraphAPI
+
+STATUSES = ("sent", "delivered", "read")
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(values):
+    return {
+        "count": len(values),
+        "p50_ms": _ms(percentile(values, 50)),
+        "p95_ms": _ms(percentile(values, 95)),
+        "p99_ms": _ms(percentile(values, 99)),
+        "max_ms": _ms(max(values) if values else None),
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+# -- payloads ------------------------------------------------------------
+
+def _envelope(value):
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{
+            "id": "WABA_ID",
+            "changes": [{"field": "messages", "value": {
+                "messaging_product": "whatsapp",
+                "metadata": {"display_phone_number": "15550000000", "phone_number_id": "bench"},
+                **value,
+            }}],
+        }],
+    }
+
+
+def text_message(wa_id, text):
+    return _envelope({
+        "contacts": [{"profile": {"name": "Bench"}, "wa_id": wa_id}],
+        "messages": [{
+            "from": wa_id,
+            "id": f"wamid.bench.{uuid.uuid4().hex}",
+            "timestamp": str(int(time.time())),
+            "type": "text",
+            "text": {"body": text},
+        }],
+    })
+
+
+def button_reply(wa_id, reply_id, title):
+    return _envelope({
+        "contacts": [{"profile": {"name": "Bench"}, "wa_id": wa_id}],
+        "messages": [{
+            "from": wa_id,
+            "id": f"wamid.bench.{uuid.uuid4().hex}",
+            "timestamp": str(int(time.time())),
+            "type": "interactive",
+            "interactive": {"type": "button_reply", "button_reply": {"id": reply_id, "title": title}},
+        }],
+    })
+
+
+def status_callback(wa_id, status):
+    return _envelope({
+        "statuses": [{
+            "id": f"wamid.fake{random.randint(1, 10 ** 9)}",
+            "status": status,
+            "timestamp": str(int(time.time())),
+            "recipient_id": wa_id,
+        }],
+    })
+
+
+def conversation(wa_id, index):
+    """One user's session: the registration path, two muscle groups, logout."""
+    return [
+        text_message(wa_id, "hi"),
+        button_reply(wa_id, "lang_en", "English"),
+        text_message(wa_id, f"Bench User {index}"),
+        text_message(wa_id, f"bench{index}@example.com"),
+        text_message(wa_id, random.choice(["chest", "back", "legs"])),
+        text_message(wa_id, random.choice(["biceps", "triceps", "shoulders", "abs"])),
+        text_message(wa_id, "logout"),
+    ]
+
+
+# -- runner ---------------------------------------------------------------
+
+class LoadTest:
+    def __init__(self, url, fake, users, rounds, status_ratio, reply_timeout, think):
+        self.url = url
+        self.fake = fake
+        self.users = users
+        self.rounds = rounds
+        self.status_ratio = status_ratio
+        self.reply_timeout = reply_timeout
+        self.think = think
+
+        self._lock = threading.Lock()
+        self.message_acks = []
+        self.status_acks = []
+        self.end_to_end = []
+        self.errors = 0
+        self.reply_timeouts = 0
+        self.webhooks = 0
+
+    def _post(self, session, payload):
+        started = time.perf_counter()
+        try:
+            ok = session.post(self.url, json=payload, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        return started, time.perf_counter() - started, ok
+
+    def _wait_for_reply(self, wa_id, since):
+        deadline = since + self.reply_timeout
+        while time.perf_counter() < deadline:
+            replied_at = self.fake.first_reply_after(wa_id, since)
+            if replied_at is not None:
+                return replied_at - since
+            time.sleep(0.002)
+        return None
+
+    def _run_user(self, index):
+        session = requests.Session()
+        wa_id = f"1999{os.getpid() % 1000:03d}{index:05d}"
+        for _ in range(self.rounds):
+            for payload in conversation(wa_id, index):
+                started, ack, ok = self._post(session, payload)
+                latency = self._wait_for_reply(wa_id, started) if ok else None
+                statuses = [self._post(session, status_callback(wa_id, random.choice(STATUSES)))
+                            for _ in range(self._status_count())]
+                with self._lock:
+                    self.webhooks += 1 + len(statuses)
+                    self.errors += (not ok) + sum(1 for _, _, s_ok in statuses if not s_ok)
+                    if ok:
+                        self.message_acks.append(ack)
+                    self.status_acks.extend(s_ack for _, s_ack, s_ok in statuses if s_ok)
+                    if latency is None:
+                        self.reply_timeouts += ok
+                    else:
+                        self.end_to_end.append(latency)
+                if self.think:
+                    time.sleep(random.uniform(0, self.think))
+        session.close()
+
+    def _status_count(self):
+        whole = int(self.status_ratio)
+        return whole + (random.random() < self.status_ratio - whole)
+
+    def run(self):
+        threads = [threading.Thread(target=self._run_user, args=(i,), daemon=True) for i in range(self.users)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return {
+            "users": self.users,
+            "rounds": self.rounds,
+            "elapsed_s": round(elapsed, 3),
+            "webhooks": self.webhooks,
+            "throughput_rps": round(self.webhooks / elapsed, 1) if elapsed else None,
+            "errors": self.errors,
+            "reply_timeouts": self.reply_timeouts,
+            "ack_messages": summarize(self.message_acks),
+            "ack_statuses": summarize(self.status_acks),
+            "end_to_end": summarize(self.end_to_end),
+            "graph_api": self.fake.stats(),
+        }
+
+
+def start_in_process_app(graph_url):
+    """Import webhook2 against the fake Graph API and serve it on a free port."""
+    os.environ["GRAPH_API_URL"] = graph_url
+    os.environ.setdefault("WHATSAPP_ACCESS_TOKEN", "bench-token")
+    os.environ.setdefault("WHATSAPP_PHONE_NUMBER_ID", "bench")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_LEVELS", "werkzeug=WARNING")
+    from werkzeug.serving import make_server
+    import webhook2
+
+    server = make_server("127.0.0.1", 0, webhook2.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name="webhook2", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/webhook"
+
+
+def print_report(report):
+    print(f"\n{report['users']} users x {report['rounds']} rounds, {report['webhooks']} webhooks "
+          f"in {report['elapsed_s']}s -> {report['throughput_rps']} req/s "
+          f"({report['errors']} errors, {report['reply_timeouts']} reply timeouts)")
+    print(f"{'':16}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for label, key in (("ack (messages)", "ack_messages"), ("ack (statuses)", "ack_statuses"),
+                       ("end-to-end", "end_to_end")):
+        row = report[key]
+        cells = "".join(f"{'-' if row[c] is None else row[c]:>10}" for c in ("p50_ms", "p95_ms", "p99_ms", "max_ms"))
+        print(f"{label:16}{row['count']:>8}{cells}")
+    graph = report["graph_api"]
+    print(f"Graph API: {graph['requests']} requests, {graph['throttled']} throttled (429), "
+          f"by type {graph['by_type']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="webhook URL of a running server (default: start webhook2 in-process)")
+    parser.add_argument("--graph-port", type=int, default=0, help="port for the fake Graph API")
+    parser.add_argument("--users", type=int, default=20, help="concurrent simulated users")
+    parser.add_argument("--rounds", type=int, default=1, help="conversations per user")
+    parser.add_argument("--status-ratio", type=float, default=3.0,
+                        help="status callbacks fired per inbound message")
+    parser.add_argument("--latency-ms", type=float, default=50, help="fake Graph API latency")
+    parser.add_argument("--jitter-ms", type=float, default=20)
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of sends answered with 429")
+    parser.add_argument("--reply-timeout", type=float, default=10.0, help="seconds to wait for a reply")
+    parser.add_argument("--think-ms", type=float, default=0, help="max random pause between user messages")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    fake = FakeGraphAPI(port=args.graph_port, latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                        throttle_rate=args.throttle_rate).start()
+    server = None
+    try:
+        url = args.url
+        if url is None:
+            server, url = start_in_process_app(fake.url)
+        else:
+            print(f"Fake Graph API on {fake.url} - the server under test must use GRAPH_API_URL={fake.url}",
+                  file=sys.stderr)
+        test = LoadTest(url, fake, args.users, args.rounds, args.status_ratio,
+                        args.reply_timeout, args.think_ms / 1000)
+        report = test.run()
+    finally:
+        if server is not None:
+            server.shutdown()
+        fake.stop()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return report
+
+
+if __name__ == "__main__":
+    main()
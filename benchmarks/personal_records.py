@@ -0,0 +1,184 @@
+"""Time personal record maintenance for users with thousands of logged sets.
+
+Seeds a throwaway schema (default `bench_records`) with the dashboard
+benchmark's tables, a history of --sets sets per user (strength and
+swimming) and records built by personal_records.recompute, then times
+
+* log (legacy)    - one PR upsert per set, as /api/log-workout used to do
+* log (set-based) - personal_records.record_sets for the same workout
+* delete          - recompute of the one exercise a deleted set belonged to
+* rebuild user    - recompute of every record of one user
+
+Every timed write is rolled back, so each iteration sees the same data.
+Before timing, a batch of random workouts is merged incrementally and
+checked against a full recompute. Uses the database configured in
+.env/DB_*; the schema is dropped afterwards unless --keep is given.
+
+    python -m benchmarks.personal_records --users 20 --sets 5000 --iterations 200
+"""
+import time
+import random
+import argparse
+import datetime
+
+import psycopg2
+
+import db_pool
+import schema
+import personal_records
+from benchmarks.dashboard_queries import TABLES, report
+
+SEED = """
+    INSERT INTO users (wa_id, name, registered, language)
+    SELECT '1666' || lpad(u::text, 7, '0'), 'User ' || u, TRUE, 'en'
+    FROM generate_series(1, %(users)s) AS u;
+
+    -- Five sets per workout; one workout in twenty is a swim.
+    INSERT INTO workouts (user_id, workout_date, muscle_group)
+    SELECT u.id, CURRENT_DATE - (random() * 1000)::int,
+           CASE WHEN random() < 0.05 THEN 'swimming'
+                ELSE (ARRAY['chest','back','legs','shoulders'])[1 + (random() * 3)::int] END
+    FROM users u, generate_series(1, %(sets)s / 5);
+
+    INSERT INTO workout_exercises (workout_id, exercise_name, sets, reps, weight, order_index)
+    SELECT w.id,
+           CASE WHEN w.muscle_group = 'swimming' THEN 'Freestyle Swimming'
+                ELSE w.muscle_group || ' exercise ' || (1 + (random() * 7)::int) END,
+           CASE WHEN w.muscle_group = 'swimming' THEN 1 ELSE 3 + (random() * 2)::int END,
+           CASE WHEN w.muscle_group = 'swimming' THEN (200 + random() * 400)::int
+                ELSE 1 + (random() * 14)::int END,
+           CASE WHEN w.muscle_group = 'swimming' AND random() < 0.5 THEN (20 + random() * 60)::int
+                WHEN w.muscle_group = 'swimming' THEN (1000 + random() * 3000)::int
+                ELSE round((20 + random() * 160)::numeric, 2) END,
+           i
+    FROM workouts w, generate_series(0, 4) AS i;
+"""
+
+LEGACY_UPSERT = """
+    INSERT INTO personal_records (user_id, exercise_name, weight, reps, date_achieved)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (user_id, exercise_name)
+    DO UPDATE SET weight = EXCLUDED.weight, reps = EXCLUDED.reps, date_achieved = EXCLUDED.date_achieved
+    WHERE EXCLUDED.weight > personal_records.weight
+"""
+
+RECORD_COLUMNS = "user_id, exercise_name, weight, reps, date_achieved, e1rm, max_volume, best_distance, best_duration"
+
+
+def random_workout(names):
+    return [(random.choice(names), random.randint(3, 5), random.randint(1, 15),
+             round(random.uniform(20, 200), 2)) for _ in range(10)]
+
+
+def snapshot(cur):
+    cur.execute(f"SELECT {RECORD_COLUMNS} FROM personal_records ORDER BY user_id, exercise_name")
+    return cur.fetchall()
+
+
+def check_incremental(conn, cur, user_ids, names, workouts):
+    """Merge random workouts one by one and compare with a full recompute."""
+    today = datetime.date.today()
+    for _ in range(workouts):
+        user_id = random.choice(user_ids)
+        sets = random_workout(names)
+        cur.execute("INSERT INTO workouts (user_id, workout_date, muscle_group) VALUES (%s, %s, 'chest') RETURNING id",
+                    (user_id, today))
+        workout_id = cur.fetchone()[0]
+        cur.executemany("""
+            INSERT INTO workout_exercises (workout_id, exercise_name, sets, reps, weight, order_index)
+            VALUES (%s, %s, %s, %s, %s, 0)
+        """, [(workout_id, *s) for s in sets])
+        personal_records.record_sets(cur, user_id, today, sets)
+    incremental = snapshot(cur)
+    personal_records.recompute(cur)
+    full = snapshot(cur)
+    conn.rollback()
+    # Ties on weight/reps may keep an earlier date; compare the measures.
+    strip = [row[:4] + row[5:] for row in incremental], [row[:4] + row[5:] for row in full]
+    return strip[0] == strip[1]
+
+
+def time_rolled_back(conn, cur, action, iterations):
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        action(cur)
+        timings.append(time.perf_counter() - started)
+        conn.rollback()
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--schema", default="bench_records")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--sets", type=int, default=5000, help="logged sets per user")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--check-workouts", type=int, default=200,
+                        help="random workouts merged before comparing with a full recompute")
+    parser.add_argument("--keep", action="store_true", help="keep the seeded schema")
+    args = parser.parse_args(argv)
+
+    conn = psycopg2.connect(**db_pool.get_pool().connect_kwargs)
+    cur = conn.cursor()
+    try:
+        cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {args.schema}")
+        cur.execute(f"SET search_path TO {args.schema}")
+        cur.execute(TABLES)
+        for statement in schema.STATEMENTS:
+            if "ON workouts " in statement or "ON workout_exercises " in statement:
+                cur.execute(statement)
+
+        started = time.perf_counter()
+        cur.execute(SEED, {"users": args.users, "sets": args.sets})
+        rebuilt = time.perf_counter()
+        written, _ = personal_records.recompute(cur)
+        rebuilt = time.perf_counter() - rebuilt
+        cur.execute("ANALYZE users, workouts, workout_exercises, personal_records")
+        conn.commit()
+        cur.execute("SELECT COUNT(*) FROM workout_exercises")
+        print(f"Seeded {args.users} users, {cur.fetchone()[0]} sets in {time.perf_counter() - started:.1f}s; "
+              f"full rebuild wrote {written} records in {rebuilt * 1000:.0f}ms")
+
+        cur.execute("SELECT id FROM users")
+        user_ids = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT DISTINCT exercise_name FROM workout_exercises WHERE exercise_name NOT LIKE '%Swimming'")
+        names = [row[0] for row in cur.fetchall()]
+        conn.rollback()
+
+        matches = check_incremental(conn, cur, user_ids, names, args.check_workouts)
+        print(f"Incremental records {'match' if matches else 'DO NOT match'} a full recompute "
+              f"after {args.check_workouts} workouts")
+
+        today = datetime.date.today()
+
+        def log_legacy(cur):
+            user_id = random.choice(user_ids)
+            for name, _, reps, weight in random_workout(names):
+                cur.execute(LEGACY_UPSERT, (user_id, name, weight, reps, today))
+
+        def log_set_based(cur):
+            personal_records.record_sets(cur, random.choice(user_ids), today, random_workout(names))
+
+        def delete(cur):
+            personal_records.recompute(cur, random.choice(user_ids), [random.choice(names)])
+
+        def rebuild_user(cur):
+            personal_records.recompute(cur, random.choice(user_ids))
+
+        print(f"\n{'ms per operation':28}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+        report("log 10 sets (legacy)", time_rolled_back(conn, cur, log_legacy, args.iterations))
+        report("log 10 sets (set-based)", time_rolled_back(conn, cur, log_set_based, args.iterations))
+        report("delete (one exercise)", time_rolled_back(conn, cur, delete, args.iterations))
+        report("rebuild user", time_rolled_back(conn, cur, rebuild_user, max(1, args.iterations // 10)))
+    finally:
+        conn.rollback()
+        if not args.keep:
+            cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+            conn.commit()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
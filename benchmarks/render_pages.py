@@ -0,0 +1,101 @@
+"""Micro-benchmark: render time of each webapp page, without the database.
+
+Renders the dashboard (with --workouts recent exercise rows and --records
+personal records), an exercise list of --exercises cards and both logging
+forms inside a test request context, with the fragment caches cleared
+before every render (cold) and left warm, and reports per-page timings.
+The sample catalog stands in for the exercises table, so the forms are
+cacheable (webapp.render_form).
+
+    python -m benchmarks.render_pages --iterations 2000
+"""
+import os
+import time
+import random
+import argparse
+import datetime
+import statistics
+from decimal import Decimal
+
+from benchmarks.loadtest import percentile
+
+STROKES = ("Freestyle", "Backstroke", "Breaststroke", "Butterfly")
+
+
+def sample_dashboard(workouts, records):
+    today = datetime.date.today()
+    rows = []
+    for i in range(workouts):
+        day = today - datetime.timedelta(days=i // 5)
+        if i % 10 == 9:
+            rows.append((day, "swimming", f"{random.choice(STROKES)} Swimming", 1, 300,
+                         Decimal(random.choice((45, 1500))), i))
+        else:
+            rows.append((day, "chest", f"Exercise {i % 12}", 3, 10, Decimal("62.50"), i))
+    prs = [(f"Exercise {i}", Decimal("100.00"), 5, today) for i in range(records)]
+    return rows, prs, (420, 3150, 94500)
+
+
+def sample_catalog(exercises):
+    import exercise_catalog
+    rows = [(f"Exercise {i}", f"Ejercicio {i}", "Barbell", f"https://img.example/{i}.png",
+             f"https://img.example/{i}.gif" if i % 2 else None, "chest", None) for i in range(exercises)]
+    rows += [(f"{stroke} Swimming", None, None, None, None, "swimming", None) for stroke in STROKES]
+    return exercise_catalog.Catalog(rows, version=1)
+
+
+def time_render(render, iterations, before=None):
+    timings = []
+    for _ in range(iterations):
+        if before:
+            before()
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def report(label, timings):
+    print(f"{label:32}{statistics.mean(timings) * 1e6:>10.0f}{percentile(timings, 50) * 1e6:>10.0f}"
+          f"{percentile(timings, 99) * 1e6:>10.0f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--workouts", type=int, default=50, help="recent exercise rows on the dashboard")
+    parser.add_argument("--records", type=int, default=10)
+    parser.add_argument("--exercises", type=int, default=40, help="cards on the exercise list")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import flask
+    import webapp
+    import fragments
+    import exercise_catalog
+
+    workouts, records, stats = sample_dashboard(args.workouts, args.records)
+    catalog = exercise_catalog._catalog = sample_catalog(args.exercises)
+
+    def clear_fragments():
+        fragments.cache.clear()
+        fragments.user_cache.clear()
+
+    pages = (
+        ("dashboard", lambda: webapp.render_dashboard("Bench", workouts, records, stats, "en")),
+        ("exercises", lambda: webapp.render_exercises_page("chest", "en", catalog)),
+        ("log exercise", lambda: webapp.log_exercise_form("chest", "Exercise 1")),
+        ("log swimming", lambda: webapp.log_exercise_form("swimming", "Freestyle Swimming")),
+    )
+
+    print(f"{'us per render':32}{'mean':>10}{'p50':>10}{'p99':>10}")
+    with webapp.app.test_request_context():
+        flask.session["user_id"] = 1
+        for label, render in pages:
+            report(f"{label} (cold fragments)", time_render(render, args.iterations, clear_fragments))
+            report(f"{label} (warm fragments)", time_render(render, args.iterations))
+    print(f"\nFragment cache: {fragments.cache.stats()}\nUser fragment cache: {fragments.user_cache.stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Transparent gzip/brotli compression of webapp.py responses.
+
+init_app(app) adds an after_request hook that compresses HTML, JSON and
+other text bodies of at least COMPRESSION_MIN_SIZE bytes with the best
+coding the client accepts: brotli (the `brotli` package in
+requirements.txt), else gzip. Left alone:
+
+- responses that already have a Content-Encoding (/assets/ serves
+  precompressed files, assets.py)
+- streamed and passthrough responses (/api/workouts/export compresses
+  its own stream, workout_export.py)
+- anything but a 200, e.g. 304s, which have no body
+
+A compressed response's strong ETag is made weak, since its bytes now
+differ from the identity representation the tag was computed for.
+"""
+import os
+import gzip
+import logging
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "500"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+# Brotli's 0-11 scale; 4-5 compresses better than gzip -6 at similar speed.
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE = {
+    "text/html", "text/plain", "text/css", "text/csv",
+    "application/json", "application/javascript", "application/x-ndjson",
+}
+
+
+class CompressionStats:
+    """Counters of compressed responses and bytes saved, for /metrics."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.compressed = {"gzip": 0, "br": 0}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def record(self, coding, size_in, size_out):
+        with self._lock:
+            self.compressed[coding] += 1
+            self.bytes_in += size_in
+            self.bytes_out += size_out
+
+    def stats(self):
+        with self._lock:
+            return {
+                "gzip": self.compressed["gzip"],
+                "br": self.compressed["br"],
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else 0.0,
+            }
+
+
+def choose_coding(accept_encodings):
+    if brotli is not None and accept_encodings.quality("br") > 0:
+        return "br"
+    if accept_encodings.quality("gzip") > 0:
+        return "gzip"
+    return None
+
+
+def compress(body, coding):
+    if coding == "br":
+        return brotli.compress(body, mode=brotli.MODE_TEXT, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=COMPRESSION_LEVEL, mtime=0)
+
+
+def init_app(app, min_size=COMPRESSION_MIN_SIZE):
+    """Compress eligible responses of app; returns the CompressionStats."""
+    from flask import request
+
+    counters = CompressionStats()
+
+    @app.after_request
+    def _compress_response(response):
+        if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+                or "Content-Encoding" in response.headers or response.mimetype not in COMPRESSIBLE):
+            return response
+        response.vary.add("Accept-Encoding")
+        coding = choose_coding(request.accept_encodings)
+        if coding is None:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        compressed = compress(body, coding)
+        if len(compressed) >= len(body):
+            return response
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = coding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        counters.record(coding, len(body), len(compressed))
+        return response
+
+    return counters
@@ -0,0 +1,100 @@
+"""Data for the /dashboard page in one database round trip.
+
+The page used to run three queries back to back (totals, last 30 days of
+exercises, personal records). DASHBOARD_SQL computes all three in CTEs and
+returns them as one UNION ALL result, tagged by section, so a page view
+costs a single statement. Values keep their column types (dates, numerics)
+so render_dashboard sees exactly what the separate queries returned.
+Totals come from the user_stats summary row (user_stats.py) when there is
+one.
+
+The covering indexes in schema.py (workouts (user_id, workout_date, id),
+workout_exercises (workout_id, order_index)) let every part run as an
+index scan on the user's rows.
+"""
+
+RECENT_DAYS = 30
+RECENT_LIMIT = 50
+RECORDS_LIMIT = 10
+
+DASHBOARD_SQL = """
+    WITH user_workouts AS (
+        SELECT id, workout_date, muscle_group
+        FROM workouts
+        WHERE user_id = %(user_id)s
+    ),
+    totals AS (
+        SELECT total_workouts, total_exercises, total_reps
+        FROM user_stats
+        WHERE user_id = %(user_id)s
+        UNION ALL
+        -- No user_stats row yet (see user_stats.py): aggregate the history.
+        SELECT COUNT(DISTINCT w.id), COUNT(we.id), COALESCE(SUM(we.sets * we.reps), 0)
+        FROM user_workouts w
+        LEFT JOIN workout_exercises we ON we.workout_id = w.id
+        WHERE NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = %(user_id)s)
+        -- WHERE skips the scan; HAVING drops the aggregate's lone empty row.
+        HAVING NOT EXISTS (SELECT 1 FROM user_stats WHERE user_id = %(user_id)s)
+    ),
+    recent AS (
+        SELECT w.workout_date, w.muscle_group,
+               we.exercise_name, we.sets, we.reps, we.weight, we.id AS exercise_id,
+               ROW_NUMBER() OVER (ORDER BY w.workout_date DESC, we.order_index) AS position
+        FROM user_workouts w
+        JOIN workout_exercises we ON we.workout_id = w.id
+        WHERE w.workout_date >= CURRENT_DATE - %(recent_days)s * INTERVAL '1 day'
+        ORDER BY w.workout_date DESC, we.order_index
+        LIMIT %(recent_limit)s
+    ),
+    records AS (
+        SELECT exercise_name, weight, reps, date_achieved,
+               ROW_NUMBER() OVER (ORDER BY date_achieved DESC) AS position
+        FROM personal_records
+        WHERE user_id = %(user_id)s
+          -- Swimming bests are minutes/meters, not a weight to show in kg.
+          AND best_distance IS NULL AND best_duration IS NULL
+        ORDER BY date_achieved DESC
+        LIMIT %(records_limit)s
+    )
+    SELECT 0 AS section, 0 AS position,
+           NULL, NULL, NULL,
+           total_workouts, total_exercises, total_reps, NULL, NULL
+    FROM totals
+    UNION ALL
+    SELECT 1, position,
+           workout_date, muscle_group, exercise_name,
+           sets, reps, NULL, weight, exercise_id
+    FROM recent
+    UNION ALL
+    SELECT 2, position,
+           date_achieved::date, NULL, exercise_name,
+           NULL, reps, NULL, weight, NULL
+    FROM records
+    ORDER BY section, position
+"""
+
+
+def fetch_dashboard(cur, user_id, recent_days=RECENT_DAYS, recent_limit=RECENT_LIMIT,
+                    records_limit=RECORDS_LIMIT):
+    """Return (workouts, records, stats) shaped like the old three queries:
+
+    workouts: (workout_date, muscle_group, exercise_name, sets, reps, weight, exercise_id)
+    records:  (exercise_name, weight, reps, date_achieved)
+    stats:    (total_workouts, total_exercises, total_reps)
+    """
+    cur.execute(DASHBOARD_SQL, {
+        "user_id": user_id,
+        "recent_days": recent_days,
+        "recent_limit": recent_limit,
+        "records_limit": records_limit,
+    })
+    stats = (0, 0, 0)
+    workouts, records = [], []
+    for section, _, day, muscle_group, exercise, a, b, c, weight, exercise_id in cur.fetchall():
+        if section == 0:
+            stats = (a, b, c)
+        elif section == 1:
+            workouts.append((day, muscle_group, exercise, a, b, weight, exercise_id))
+        else:
+            records.append((exercise, weight, b, day))
+    return workouts, records, stats
@@ -0,0 +1,42 @@
+"""Per-user data version for cache keys and cheap conditional GETs.
+
+users.data_version is a counter that every write to a user's workouts
+(logging a workout or swim, deleting an exercise) bumps in its own
+transaction. Reading it is a primary-key lookup, and it says whether
+anything a page shows could have changed, so webapp.py keys the user's
+cached pages and weak ETags on it: a write invalidates exactly that user's
+entries, and a matching If-None-Match gets a 304 before any of the page's
+queries run. The `rebuild` commands of user_stats.py and
+personal_records.py bump it too, for the user they rebuilt or everyone.
+"""
+import hashlib
+
+
+def fetch(cur, user_id):
+    """The user's current data version (0 before their first write)."""
+    cur.execute("SELECT data_version FROM users WHERE id = %s", (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def bump(cur, user_id):
+    """Advance the version in the caller's transaction; returns the new one.
+
+    Call after the write itself, so the users row lock is held only until
+    commit.
+    """
+    cur.execute("UPDATE users SET data_version = data_version + 1 WHERE id = %s RETURNING data_version",
+                (user_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def bump_all(cur):
+    """Advance every user's version, after a rebuild that touched them all."""
+    cur.execute("UPDATE users SET data_version = data_version + 1")
+    return cur.rowcount
+
+
+def etag(*parts):
+    """Opaque tag for a response built from `parts` (user, version, request inputs)."""
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
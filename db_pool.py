@@ -0,0 +1,291 @@
+"""Shared, bounded PostgreSQL connection pool.
+
+Both Flask apps (webapp.py, webhook2.py) and the gunicorn/waitress workers
+borrow connections from here instead of opening a fresh psycopg2 connection
+per request.
+
+    with db_pool.cursor() as cur:
+        cur.execute("SELECT ...")
+
+The connection is committed when the block exits cleanly, rolled back if it
+raises, and handed back to the pool either way. Pooled connections use
+TimedCursor, so every statement shows up in metrics.DB_QUERY_SECONDS.
+"""
+import os
+import re
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+import psycopg2.extensions
+from dotenv import load_dotenv
+
+import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_HOST = os.getenv("DB_HOST")
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_PORT = os.getenv("DB_PORT")
+
+POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))            # seconds to wait for a free slot
+POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))  # recycle connections after 30 min
+POOL_HEALTHCHECK_AFTER = float(os.getenv("DB_POOL_HEALTHCHECK_AFTER", "30"))  # ping if idle longer than this
+
+
+_STATEMENT_TABLE = re.compile(r"\b(?:from|into|update|table)\s+(?:if\s+(?:not\s+)?exists\s+)?([a-z_][a-z0-9_]*)", re.I)
+
+
+def statement_label(query):
+    """'select users', 'insert workout_exercises', ... - low-cardinality query label."""
+    if isinstance(query, bytes):
+        query = query.decode("utf-8", "replace")
+    query = str(query).lstrip()
+    verb = query.split(None, 1)[0].lower() if query else "unknown"
+    table = _STATEMENT_TABLE.search(query)
+    return f"{verb} {table.group(1).lower()}" if table else verb
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that records each execute() in metrics.DB_QUERY_SECONDS."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started,
+                                             statement=statement_label(query))
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            metrics.DB_QUERY_SECONDS.observe(time.perf_counter() - started,
+                                             statement=statement_label(query))
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection becomes available within the timeout."""
+
+
+class _Entry:
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """Thread-safe pool with health checks and max-lifetime recycling."""
+
+    def __init__(self, min_size=POOL_MIN_SIZE, max_size=POOL_MAX_SIZE,
+                 timeout=POOL_TIMEOUT, max_lifetime=POOL_MAX_LIFETIME,
+                 healthcheck_after=POOL_HEALTHCHECK_AFTER, **connect_kwargs):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.min_size = min(min_size, max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.healthcheck_after = healthcheck_after
+        self.connect_kwargs = connect_kwargs or dict(
+            host=DB_HOST, database=DB_NAME,
+            user=DB_USER, password=DB_PASSWORD,
+            port=DB_PORT
+        )
+
+        self._idle = deque()
+        self._size = 0          # open connections, idle + borrowed
+        self._cond = threading.Condition()
+        self._closed = False
+
+    # -- internals -----------------------------------------------------
+
+    def _open(self):
+        kwargs = {"cursor_factory": TimedCursor, **self.connect_kwargs}
+        return _Entry(psycopg2.connect(**kwargs))
+
+    def _expired(self, entry):
+        return time.monotonic() - entry.created_at > self.max_lifetime
+
+    def _usable(self, entry):
+        conn = entry.conn
+        if conn.closed or self._expired(entry):
+            return False
+        if time.monotonic() - entry.last_used < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            logger.info("Discarding pooled connection that failed health check")
+            return False
+
+    def _discard(self, entry):
+        try:
+            entry.conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    # -- public API ----------------------------------------------------
+
+    def getconn(self, timeout=None):
+        """Borrow a raw connection. Pair every call with putconn()."""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolTimeout("connection pool is closed")
+                    if self._idle:
+                        entry = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"no database connection available after {self.timeout}s")
+                    self._cond.wait(remaining)
+
+            if entry is None:
+                try:
+                    entry = self._open()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                return entry
+
+            if self._usable(entry):
+                return entry
+            self._discard(entry)
+
+    def putconn(self, entry, discard=False):
+        """Return a connection borrowed with getconn()."""
+        conn = entry.conn
+        if not discard and not conn.closed:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                discard = True
+        if discard or conn.closed or self._expired(entry) or self._closed:
+            self._discard(entry)
+            return
+        entry.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """Borrow a connection; commit on success, roll back on error."""
+        started = time.perf_counter()
+        entry = self.getconn(timeout)
+        metrics.DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+        discard = False
+        try:
+            yield entry.conn
+            entry.conn.commit()
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            try:
+                entry.conn.rollback()
+            except psycopg2.Error:
+                discard = True
+            raise
+        finally:
+            self.putconn(entry, discard=discard)
+
+    @contextmanager
+    def cursor(self, timeout=None, **cursor_kwargs):
+        with self.connection(timeout) as conn:
+            with conn.cursor(**cursor_kwargs) as cur:
+                yield cur
+
+    def warm(self):
+        """Open min_size connections ahead of the first request."""
+        entries = []
+        try:
+            for _ in range(self.min_size):
+                entries.append(self.getconn())
+        finally:
+            for entry in entries:
+                self.putconn(entry)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+            self._cond.notify_all()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            return {"size": self._size, "idle": len(self._idle), "max_size": self.max_size}
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return this process's pool, creating it on first use.
+
+    gunicorn forks workers after import, so a pool inherited from the parent
+    is dropped (without closing the parent's sockets) and rebuilt per pid.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            _pool = ConnectionPool()
+            _pool_pid = pid
+        return _pool
+
+
+@contextmanager
+def connection(timeout=None):
+    with get_pool().connection(timeout) as conn:
+        yield conn
+
+
+@contextmanager
+def cursor(timeout=None, **cursor_kwargs):
+    with get_pool().cursor(timeout, **cursor_kwargs) as cur:
+        yield cur
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None and _pool_pid == os.getpid():
+            _pool.close()
+        _pool = None
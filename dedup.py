@@ -0,0 +1,102 @@
+"""Idempotency guard for redelivered WhatsApp webhook messages.
+
+Meta redelivers a payload whenever our ack is slow, which used to re-run
+get_user, re-send menus and re-queue exercise bursts. The webhook asks
+`deduplicator.is_duplicate(message_id)` before doing any DB or Graph API
+work; ids live in a bounded LRU with a TTL and, with
+WEBHOOK_DEDUP_PERSIST=1, in the `processed_messages` table too so
+duplicates are caught across workers and restarts.
+"""
+import os
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+DEDUP_MAX_ENTRIES = int(os.getenv("WEBHOOK_DEDUP_MAX_ENTRIES", "20000"))
+DEDUP_TTL = float(os.getenv("WEBHOOK_DEDUP_TTL", str(24 * 3600)))
+DEDUP_PERSIST = os.getenv("WEBHOOK_DEDUP_PERSIST", "0") == "1"
+
+
+class MessageDeduplicator:
+    """Check-and-mark set of recently processed message ids."""
+
+    PURGE_EVERY = 1000   # persisted inserts between expired-row cleanups
+
+    def __init__(self, max_entries=DEDUP_MAX_ENTRIES, ttl=DEDUP_TTL, persist=DEDUP_PERSIST):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.persist = persist
+        self._seen = OrderedDict()   # message_id -> expires_at
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.duplicates = 0
+        self.persisted_duplicates = 0
+        self._inserts = 0
+
+    def _check_memory(self, message_id, now):
+        """Return True if already seen; otherwise remember it."""
+        expires_at = self._seen.get(message_id)
+        if expires_at is not None and expires_at > now:
+            self._seen.move_to_end(message_id)
+            return True
+        self._seen[message_id] = now + self.ttl
+        self._seen.move_to_end(message_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        return False
+
+    def _check_persisted(self, message_id):
+        with db_pool.cursor() as cur:
+            cur.execute("""
+                INSERT INTO processed_messages (message_id) VALUES (%s)
+                ON CONFLICT (message_id) DO NOTHING
+                RETURNING 1
+            """, (message_id,))
+            inserted = cur.fetchone() is not None
+            with self._lock:
+                self._inserts += 1
+                due = self._inserts % self.PURGE_EVERY == 0
+            if due:
+                cur.execute("""
+                    DELETE FROM processed_messages
+                    WHERE received_at < NOW() - make_interval(secs => %s)
+                """, (self.ttl,))
+        return not inserted
+
+    def is_duplicate(self, message_id):
+        """True if message_id was already processed; marks it otherwise."""
+        if not message_id:
+            return False
+        with self._lock:
+            self.checked += 1
+            if self._check_memory(message_id, time.monotonic()):
+                self.duplicates += 1
+                return True
+        if self.persist:
+            try:
+                if self._check_persisted(message_id):
+                    with self._lock:
+                        self.duplicates += 1
+                        self.persisted_duplicates += 1
+                    return True
+            except Exception:
+                # Better to risk a duplicate reply than to drop a message.
+                logger.exception("Persisted dedup check failed for %s", message_id)
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "checked": self.checked,
+                "duplicates_dropped": self.duplicates,
+                "persisted_duplicates_dropped": self.persisted_duplicates,
+                "tracked": len(self._seen),
+            }
+
+
+deduplicator = MessageDeduplicator()
@@ -0,0 +1,160 @@
+"""Compact store for WhatsApp delivery/read receipts.
+
+Status callbacks (sent, delivered, read, failed) are most of our webhook
+traffic. The webhook recognises status-only payloads from the raw body,
+hands the statuses to `recorder.record()` and acks; a background thread
+writes them to `message_statuses` in batches, keeping only the latest
+status per message id.
+"""
+import os
+import re
+import time
+import threading
+import logging
+from collections import deque
+
+from psycopg2.extras import execute_values
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_STATUS_ENABLED = os.getenv("DELIVERY_STATUS_ENABLED", "1") == "1"
+DELIVERY_STATUS_BATCH = int(os.getenv("DELIVERY_STATUS_BATCH", "200"))
+DELIVERY_STATUS_FLUSH_INTERVAL = float(os.getenv("DELIVERY_STATUS_FLUSH_INTERVAL", "2"))
+DELIVERY_STATUS_MAX_PENDING = int(os.getenv("DELIVERY_STATUS_MAX_PENDING", "20000"))
+
+
+# A "messages" *key*; the envelope's `"field": "messages"` value must not match.
+_MESSAGES_KEY = re.compile(rb'"messages"\s*:')
+
+
+def is_status_only(raw_body):
+    """Cheap pre-check on the undecoded body: no "messages" key means the
+    payload carries nothing but statuses (or nothing at all)."""
+    return _MESSAGES_KEY.search(raw_body) is None
+
+
+def iter_statuses(data):
+    for entry in data.get("entry", []):
+        for change in entry.get("changes", []):
+            yield from change.get("value", {}).get("statuses", [])
+
+
+def compact(status):
+    """(message_id, recipient_id, status, unix_ts, error_code) for one callback."""
+    errors = status.get("errors") or [{}]
+    try:
+        timestamp = int(status.get("timestamp") or 0)
+    except (TypeError, ValueError):
+        timestamp = 0
+    return (
+        status.get("id"),
+        status.get("recipient_id"),
+        status.get("status"),
+        timestamp or int(time.time()),
+        errors[0].get("code"),
+    )
+
+
+class DeliveryStatusRecorder:
+    """Buffers compact status rows and upserts them in batches."""
+
+    def __init__(self, batch_size=DELIVERY_STATUS_BATCH, flush_interval=DELIVERY_STATUS_FLUSH_INTERVAL,
+                 max_pending=DELIVERY_STATUS_MAX_PENDING, enabled=DELIVERY_STATUS_ENABLED):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        # Bounded: if the database is down we shed the oldest receipts
+        # rather than grow without limit.
+        self._pending = deque(maxlen=max_pending)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher_pid = None
+        self.recorded = 0
+        self.flushed = 0
+        self.dropped = 0
+        self.flush_errors = 0
+
+    def record(self, statuses):
+        """Queue status callbacks for the next flush; never touches the DB."""
+        if not self.enabled:
+            return
+        rows = [compact(status) for status in statuses if status.get("id")]
+        if not rows:
+            return
+        self._ensure_flusher()
+        with self._lock:
+            overflow = len(self._pending) + len(rows) - self._pending.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self._pending.extend(rows)
+            self.recorded += len(rows)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write everything pending now. Returns the number of rows written."""
+        with self._lock:
+            rows = list(self._pending)
+            self._pending.clear()
+        if not rows:
+            return 0
+        # One statement can't update the same row twice, so keep the newest
+        # status per message id within the batch.
+        latest = {}
+        for row in rows:
+            current = latest.get(row[0])
+            if current is None or row[3] >= current[3]:
+                latest[row[0]] = row
+        try:
+            with db_pool.cursor() as cur:
+                execute_values(cur, """
+                    INSERT INTO message_statuses (message_id, recipient_id, status, status_at, error_code)
+                    VALUES %s
+                    ON CONFLICT (message_id) DO UPDATE
+                    SET status = EXCLUDED.status, status_at = EXCLUDED.status_at,
+                        error_code = EXCLUDED.error_code
+                    WHERE message_statuses.status_at <= EXCLUDED.status_at
+                """, list(latest.values()),
+                    template="(%s, %s, %s, to_timestamp(%s), %s)", page_size=self.batch_size)
+        except Exception:
+            with self._lock:
+                self.flush_errors += 1
+                self.dropped += len(rows)
+            logger.exception("Failed to write %d delivery statuses", len(rows))
+            return 0
+        with self._lock:
+            self.flushed += len(latest)
+        return len(latest)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "flushed": self.flushed,
+                "pending": len(self._pending),
+                "dropped": self.dropped,
+                "flush_errors": self.flush_errors,
+            }
+
+    def _ensure_flusher(self):
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            thread = threading.Thread(target=self._flush_forever, name="delivery-status", daemon=True)
+            thread.start()
+
+    def _flush_forever(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+
+recorder = DeliveryStatusRecorder()
@@ -0,0 +1,179 @@
+"""Outbound message dispatcher.
+
+A single long-lived asyncio loop (in a daemon thread) owns one FIFO lane per
+WhatsApp recipient. Jobs for the same wa_id run strictly in submission order;
+jobs for different recipients run in parallel on a bounded thread pool. The
+webhook only has to call submit() and can ack Meta immediately.
+"""
+import os
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_WORKERS = int(os.getenv("DISPATCH_WORKERS", "8"))
+LATENCY_SAMPLES = 1024
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "enqueued_at")
+
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.enqueued_at = time.monotonic()
+
+    def run(self):
+        return self.fn(*self.args, **self.kwargs)
+
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class OutboundDispatcher:
+    """Per-recipient ordered, cross-recipient parallel job runner."""
+
+    def __init__(self, max_workers=DISPATCH_WORKERS):
+        self.max_workers = max_workers
+        self._loop = None
+        self._thread = None
+        self._executor = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+        # Lanes are only touched from the loop thread.
+        self._lanes = {}
+
+        self._stats_lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._wait_samples = deque(maxlen=LATENCY_SAMPLES)
+        self._run_samples = deque(maxlen=LATENCY_SAMPLES)
+
+    # -- lifecycle -----------------------------------------------------
+
+    def _ensure_started(self):
+        pid = os.getpid()
+        if self._loop is not None and self._pid == pid:
+            return
+        with self._start_lock:
+            if self._loop is not None and self._pid == pid:
+                return
+            # Fresh state after a fork: the parent's loop thread doesn't exist here.
+            self._lanes = {}
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix="dispatch")
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run, name="outbound-dispatcher", daemon=True)
+            self._thread.start()
+            ready.wait()
+            self._loop = loop
+            self._pid = pid
+
+    def shutdown(self, wait=True):
+        with self._start_lock:
+            if self._loop is None or self._pid != os.getpid():
+                return
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            if wait:
+                self._thread.join()
+            self._executor.shutdown(wait=wait)
+            self._loop = None
+
+    # -- submission ----------------------------------------------------
+
+    def submit(self, wa_id, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) behind earlier jobs for wa_id."""
+        self._ensure_started()
+        job = _Job(fn, args, kwargs)
+        with self._stats_lock:
+            self._queued += 1
+            self._submitted += 1
+        self._loop.call_soon_threadsafe(self._enqueue, wa_id, job)
+
+    def _enqueue(self, wa_id, job):
+        lane = self._lanes.get(wa_id)
+        if lane is None:
+            lane = deque()
+            self._lanes[wa_id] = lane
+            self._loop.create_task(self._drain(wa_id, lane))
+        lane.append(job)
+
+    async def _drain(self, wa_id, lane):
+        while lane:
+            job = lane.popleft()
+            started = time.monotonic()
+            with self._stats_lock:
+                self._queued -= 1
+                self._running += 1
+                self._wait_samples.append(started - job.enqueued_at)
+            failed = False
+            try:
+                await self._loop.run_in_executor(self._executor, job.run)
+            except Exception:
+                failed = True
+                logger.exception("Outbound job for %s failed", wa_id)
+            with self._stats_lock:
+                self._running -= 1
+                self._completed += 1
+                if failed:
+                    self._failed += 1
+                self._run_samples.append(time.monotonic() - started)
+        # No await between the emptiness check and the delete, so a job
+        # enqueued meanwhile always finds either this lane or a new one.
+        del self._lanes[wa_id]
+
+    # -- metrics -------------------------------------------------------
+
+    def queue_depth(self):
+        with self._stats_lock:
+            return self._queued
+
+    def stats(self):
+        with self._stats_lock:
+            waits = list(self._wait_samples)
+            runs = list(self._run_samples)
+            snapshot = {
+                "queue_depth": self._queued,
+                "running": self._running,
+                "active_lanes": len(self._lanes),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+            }
+        snapshot.update({
+            "wait_p50": _percentile(waits, 50),
+            "wait_p95": _percentile(waits, 95),
+            "wait_max": max(waits, default=0.0),
+            "run_p50": _percentile(runs, 50),
+            "run_p95": _percentile(runs, 95),
+            "run_max": max(runs, default=0.0),
+        })
+        return snapshot
+
+
+dispatcher = OutboundDispatcher()
+
+
+def submit(wa_id, fn, *args, **kwargs):
+    dispatcher.submit(wa_id, fn, *args, **kwargs)
@@ -0,0 +1,172 @@
+"""Warm, immutable in-memory exercise catalog.
+
+The exercises table only changes when seed_exercises.py or getUrlimg.py
+runs, so every process keeps a snapshot indexed by muscle group (and by
+language) and exercise lookups become dictionary reads.
+
+A background thread LISTENs on the `exercise_catalog` channel (see
+schema.py for the trigger that NOTIFYs) and also polls the catalog
+version, which covers poolers that drop LISTEN. Either signal swaps in a
+freshly loaded snapshot; readers never see a half-built one.
+"""
+import os
+import time
+import select
+import threading
+import logging
+from types import MappingProxyType
+
+import psycopg2
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "exercise_catalog"
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", "60"))
+
+
+class Catalog:
+    """One immutable snapshot of the exercises table."""
+
+    def __init__(self, rows, version):
+        self.version = version
+        self.loaded_at = time.time()
+
+        by_muscle = {}
+        by_muscle_language = {}
+        for name_en, name_es, equipment, image_url, gif_url, muscle_group, language in rows:
+            key = (muscle_group or "").lower()
+            exercise = (name_en, name_es, equipment, image_url, gif_url)
+            by_muscle.setdefault(key, []).append(exercise)
+            # Rows without a language belong to every language, like the
+            # "language = %s OR language IS NULL" filters they replace.
+            for lang in ((language,) if language else ("en", "es")):
+                bucket = by_muscle_language.setdefault((key, lang), [])
+                if exercise not in bucket:
+                    bucket.append(exercise)
+
+        self._by_muscle = MappingProxyType({k: tuple(v) for k, v in by_muscle.items()})
+        self._by_muscle_language = MappingProxyType({k: tuple(v) for k, v in by_muscle_language.items()})
+        self._muscle_groups = tuple(sorted({row[5] for row in rows if row[5]}))
+        self._names = frozenset(
+            ((row[5] or "").lower(), name) for row in rows for name in row[:2] if name)
+
+    def by_muscle(self, muscle_group):
+        """All rows for a muscle group (every language), ordered by name_en."""
+        return self._by_muscle.get(muscle_group.lower(), ())
+
+    def by_muscle_language(self, muscle_group, language):
+        """Distinct rows for a muscle group in one language, ordered by name_en."""
+        return self._by_muscle_language.get((muscle_group.lower(), language), ())
+
+    def has_muscle_group(self, muscle_group):
+        return muscle_group.lower() in self._by_muscle
+
+    def has_exercise(self, muscle_group, name):
+        """Whether name (English or Spanish) is an exercise of muscle_group."""
+        return (muscle_group.lower(), name) in self._names
+
+    def muscle_groups(self):
+        return self._muscle_groups
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._by_muscle.values())
+
+
+def _read_version(cur):
+    try:
+        cur.execute("SELECT version FROM exercise_catalog_version")
+        row = cur.fetchone()
+        return row[0] if row else 0
+    except psycopg2.errors.UndefinedTable:
+        # schema.py hasn't been applied; we still load, just can't version.
+        cur.connection.rollback()
+        return 0
+
+
+def load_catalog():
+    with db_pool.cursor() as cur:
+        version = _read_version(cur)
+        cur.execute("""
+            SELECT name_en, name_es, equipment, image_url, gif_url, muscle_group, language
+            FROM exercises
+            ORDER BY name_en
+        """)
+        rows = cur.fetchall()
+    return Catalog(rows, version)
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+_listener_pid = None
+
+
+def refresh():
+    """Reload the snapshot now and swap it in."""
+    global _catalog
+    catalog = load_catalog()
+    with _catalog_lock:
+        _catalog = catalog
+    logger.info("Loaded exercise catalog v%s (%d exercises)", catalog.version, len(catalog))
+    return catalog
+
+
+def get_catalog():
+    """Return the current snapshot, loading it on first use in this process."""
+    _ensure_listener()
+    catalog = _catalog
+    if catalog is None:
+        with _catalog_lock:
+            catalog = _catalog
+        if catalog is None:
+            catalog = refresh()
+    return catalog
+
+
+def start():
+    """Warm the catalog and start listening for changes, without blocking."""
+    _ensure_listener()
+
+
+def _ensure_listener():
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid:
+        return
+    with _catalog_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        thread = threading.Thread(target=_listen_forever, name="exercise-catalog", daemon=True)
+        thread.start()
+
+
+def _listen_forever():
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**db_pool.get_pool().connect_kwargs)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CATALOG_CHANNEL}")
+            # Load after LISTEN so a change in between is never missed.
+            refresh()
+            while True:
+                ready, _, _ = select.select([conn], [], [], CATALOG_POLL_INTERVAL)
+                if ready:
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        refresh()
+                    continue
+                # Quiet interval: compare versions in case NOTIFY was lost.
+                current = _catalog
+                if current is not None and _read_version(cur) != current.version:
+                    refresh()
+        except Exception:
+            logger.exception("Exercise catalog listener failed; retrying")
+            time.sleep(CATALOG_POLL_INTERVAL)
+        finally:
+            if conn is not None:
+                conn.close()
@@ -0,0 +1,70 @@
+"""Per-process cache of rendered HTML fragments.
+
+Pages in webapp.py are Jinja templates (templates/), compiled once per
+process. Parts that are the same for every user - the muscle-group cards,
+a muscle group's exercise cards - are rendered once per key and reused, so
+a request only renders its per-user parts. Keys carry everything the
+fragment depends on (language, exercise catalog version), so entries never
+go stale; old versions simply age out of the LRU.
+
+Fragments keyed by what a user sends - their dashboard sections, logging
+forms keyed by the URL's exercise name - go in `user_cache`, a separate
+LRU, so no amount of them can push the shared fragments out.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "512"))
+USER_FRAGMENT_CACHE_MAX_ENTRIES = int(os.getenv("USER_FRAGMENT_CACHE_MAX_ENTRIES", "1024"))
+
+
+class FragmentCache:
+    """LRU of rendered fragments keyed by tuples, with hit/miss counters."""
+
+    def __init__(self, max_entries=FRAGMENT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, key, render):
+        """Return the fragment for key, calling render() to build it on a miss."""
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return html
+            self.misses += 1
+        # Render outside the lock; two threads may race to fill one key,
+        # which only costs a duplicate render.
+        html = Markup(render())
+        if self.max_entries > 0:
+            with self._lock:
+                self._fragments[key] = html
+                self._fragments.move_to_end(key)
+                while len(self._fragments) > self.max_entries:
+                    self._fragments.popitem(last=False)
+        return html
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._fragments),
+            }
+
+
+cache = FragmentCache()
+user_cache = FragmentCache(USER_FRAGMENT_CACHE_MAX_ENTRIES)
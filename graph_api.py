@@ -0,0 +1,193 @@
+"""Outbound WhatsApp Cloud (Graph) API client.
+
+One GraphClient keeps a requests.Session with a keep-alive connection pool,
+so a burst of exercise images reuses the same TLS connection instead of
+opening one per message. All send paths in webhook2.py, webhook.py and
+simple_app.py go through it.
+
+Sends are paced by a rate_limit.RateLimiter and retried with jittered
+exponential backoff when Meta answers 429 or one of its throughput error
+codes, honoring Retry-After when present.
+"""
+import os
+import time
+import random
+import threading
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+import metrics
+from rate_limit import RateLimiter
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GRAPH_API_URL = os.getenv("GRAPH_API_URL", "https://graph.facebook.com")
+GRAPH_API_VERSION = os.getenv("GRAPH_API_VERSION", "v18.0")
+GRAPH_POOL_SIZE = int(os.getenv("GRAPH_POOL_SIZE", "10"))
+GRAPH_CONNECT_TIMEOUT = float(os.getenv("GRAPH_CONNECT_TIMEOUT", "5"))
+GRAPH_READ_TIMEOUT = float(os.getenv("GRAPH_READ_TIMEOUT", "15"))
+GRAPH_MAX_RETRIES = int(os.getenv("GRAPH_MAX_RETRIES", "4"))
+GRAPH_BACKOFF_BASE = float(os.getenv("GRAPH_BACKOFF_BASE", "0.5"))
+GRAPH_BACKOFF_MAX = float(os.getenv("GRAPH_BACKOFF_MAX", "30"))
+
+# Graph API error codes that mean "slow down" rather than "this message is bad".
+# 4: app-level rate limit, 80007: WABA rate limit, 130429: Cloud API
+# throughput reached, 131056: too many messages to the same recipient.
+THROTTLE_CODES = {4, 80007, 130429}
+PAIR_THROTTLE_CODES = {131056}
+
+
+def _error_code(response):
+    try:
+        return response.json().get("error", {}).get("code")
+    except (ValueError, AttributeError):
+        return None
+
+
+def _retry_after(response):
+    value = response.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def backoff_delay(attempt, base=GRAPH_BACKOFF_BASE, cap=GRAPH_BACKOFF_MAX):
+    """Full-jitter exponential backoff for the given retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class GraphClient:
+    """Thread-safe sender for one WhatsApp business phone number."""
+
+    def __init__(self, access_token, phone_number_id, api_version=GRAPH_API_VERSION,
+                 base_url=GRAPH_API_URL, pool_size=GRAPH_POOL_SIZE,
+                 timeout=(GRAPH_CONNECT_TIMEOUT, GRAPH_READ_TIMEOUT),
+                 rate_limiter=None, max_retries=GRAPH_MAX_RETRIES):
+        self.phone_number_id = phone_number_id
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.retries = 0
+        self.throttled = 0
+        self.api_root = base_url.rstrip('/')
+        self.base_url = f"{self.api_root}/{api_version}"
+        self.messages_url = f"{self.base_url}/{phone_number_id}/messages"
+
+        self.session = requests.Session()
+        # Every request goes to the same host, so one pool of pool_size
+        # keep-alive connections is all we need. pool_block makes extra
+        # threads wait for a free connection rather than open throwaway ones.
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json"
+        })
+
+    def send(self, payload, api_version=None):
+        """POST a message payload and return the final requests.Response.
+
+        Blocks until the rate limiter admits the message, then retries
+        throttled and 5xx responses up to max_retries times. api_version
+        overrides the client's Graph API version for this message.
+        """
+        url = self.messages_url
+        if api_version is not None:
+            url = f"{self.api_root}/{api_version}/{self.phone_number_id}/messages"
+        to = payload.get("to")
+        message_type = payload.get("type", "text")
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire(to)
+            started = time.perf_counter()
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except requests.RequestException:
+                metrics.GRAPH_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                                      type=message_type, status="error")
+                raise
+            status = response.status_code
+            metrics.GRAPH_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                                  type=message_type, status=status)
+
+            code = _error_code(response) if status >= 400 else None
+            throttled = status == 429 or code in THROTTLE_CODES or code in PAIR_THROTTLE_CODES
+            if not (throttled or status >= 500) or attempt >= self.max_retries:
+                return response
+
+            delay = backoff_delay(attempt)
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            self.retries += 1
+            attempt += 1
+            logger.warning("Graph API %s (code %s) sending to %s, retry %d in %.2fs",
+                           status, code, to, attempt, delay)
+            if throttled:
+                self.throttled += 1
+                # Pausing the bucket makes the next acquire() wait, and holds
+                # back every other sender sharing it. A pair limit only
+                # concerns this recipient; anything else means the whole
+                # number is over its throughput.
+                self.rate_limiter.pause(delay, key=to if code in PAIR_THROTTLE_CODES else None)
+            else:
+                time.sleep(delay)
+
+    def send_text(self, to, text):
+        return self.send({
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "text",
+            "text": {"body": text}
+        })
+
+    def send_image(self, to, image_url, caption):
+        return self.send({
+            "messaging_product": "whatsapp",
+            "to": to,
+            "type": "image",
+            "image": {
+                "link": image_url,
+                "caption": caption
+            }
+        })
+
+    def get_phone_number(self):
+        """Fetch the phone number object; a 200 means the token is valid."""
+        return self.session.get(f"{self.base_url}/{self.phone_number_id}", timeout=self.timeout)
+
+    def stats(self):
+        return {"retries": self.retries, "throttled": self.throttled}
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Return the process-wide client for the configured phone number."""
+    global _client, _client_pid
+    pid = os.getpid()
+    if _client is not None and _client_pid == pid:
+        return _client
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = GraphClient(
+                os.getenv("WHATSAPP_ACCESS_TOKEN"),
+                os.getenv("WHATSAPP_PHONE_NUMBER_ID")
+            )
+            _client_pid = pid
+        return _client
@@ -0,0 +1,168 @@
+"""Logging setup shared by the bots, the web app and run.py.
+
+configure_logging() routes every record through a QueueHandler so request
+threads only pay for a queue put; a QueueListener thread formats and
+writes them to stdout (and to a rotating file when LOG_FILE is set).
+
+    LOG_LEVEL=INFO                      root level
+    LOG_LEVELS=webhook2=DEBUG,db_pool=WARNING
+                                        per-module overrides
+    LOG_FORMAT=json                     json (one object per line) or text
+    LOG_SAMPLE_RATES=send=0.1,status=0.01
+                                        keep this fraction of INFO/DEBUG
+                                        records tagged extra={"event": ...}
+    LOG_FILE=logs/server.log            optional rotating file
+    LOG_FILE_MAX_BYTES / LOG_FILE_BACKUPS
+    LOG_QUEUE_SIZE=10000                records beyond this are dropped
+
+Records at WARNING and above are never sampled. Anything passed in
+`extra` is emitted as a field of the JSON record.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "send=0.1,status=0.01")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_FILE_MAX_BYTES = int(os.getenv("LOG_FILE_MAX_BYTES", str(10 * 1000 * 1000)))
+LOG_FILE_BACKUPS = int(os.getenv("LOG_FILE_BACKUPS", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+TEXT_FORMAT = "[%(asctime)s] %(levelname)s %(name)s: %(message)s"
+TEXT_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+# Attributes every LogRecord has; anything else came from `extra`.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+
+def parse_pairs(spec):
+    """'a=1,b=2' -> {'a': '1', 'b': '2'}"""
+    pairs = {}
+    for item in spec.split(","):
+        if "=" in item:
+            key, value = item.split("=", 1)
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, msg, extras, exc."""
+
+    def format(self, record):
+        entry = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class SamplingFilter(logging.Filter):
+    """Keep only a fraction of high-volume records, keyed by their `event`."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(getattr(record, "event", None))
+        return rate is None or random.random() < rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that sheds records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Resolve the message and traceback on the caller's thread (args may
+        # be mutated later), but leave formatting to the listener.
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_lock = threading.Lock()
+_configured_pid = None
+_listener = None
+queue_handler = None
+
+
+def _output_handlers(formatter):
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+    handlers = [stream]
+    if LOG_FILE:
+        directory = os.path.dirname(LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS, encoding="utf-8"
+        )
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    return handlers
+
+
+def configure_logging():
+    """Install the queue-backed handlers on the root logger (once per process)."""
+    global _configured_pid, _listener, queue_handler
+    pid = os.getpid()
+    if _configured_pid == pid:
+        return
+    with _lock:
+        if _configured_pid == pid:
+            return
+
+        if LOG_FORMAT == "text":
+            formatter = logging.Formatter(TEXT_FORMAT, datefmt=TEXT_DATEFMT)
+        else:
+            formatter = JsonFormatter()
+
+        # A forked child inherits the parent's handler but not its listener thread.
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+
+        queue_handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        queue_handler.addFilter(SamplingFilter({k: float(v) for k, v in parse_pairs(LOG_SAMPLE_RATES).items()}))
+        root.addHandler(queue_handler)
+        root.setLevel(LOG_LEVEL)
+        for name, level in parse_pairs(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level.upper())
+
+        _listener = QueueListener(queue_handler.queue, *_output_handlers(formatter), respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        _configured_pid = pid
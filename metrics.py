@@ -0,0 +1,226 @@
+"""In-process latency histograms and a Prometheus text /metrics endpoint.
+
+    import metrics
+
+    with metrics.timed(metrics.OPERATION_SECONDS, operation="get_user"):
+        ...
+
+    @metrics.timed(metrics.OPERATION_SECONDS, operation="get_exercises_by_muscle")
+    def get_exercises_by_muscle(...):
+        ...
+
+metrics.instrument_app(app, "webhook2") times every request per route and
+serves /metrics. db_pool times each query and graph_api each Graph API
+call, so those need no extra hooks. Component stats() dicts (dispatcher,
+caches, pool) are exported as gauges through register_stats().
+
+Values are per process; with several gunicorn workers each scrape sees the
+worker that answered it. Set METRICS_TOKEN to require
+`Authorization: Bearer <token>` on /metrics.
+"""
+import os
+import time
+import bisect
+import threading
+import functools
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+            lines.extend(self._render_series(series))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def _render_series(self, series):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in series]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # per-bucket (non-cumulative) counts, +Inf last, then sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _render_series(self, series):
+        lines = []
+        for key, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, (('le', le),))} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {counts[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class timed:
+    """Observe elapsed seconds into a histogram; context manager or decorator."""
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self._local = threading.local()
+
+    def __enter__(self):
+        starts = getattr(self._local, "starts", None)
+        if starts is None:
+            starts = self._local.starts = []
+        starts.append(time.perf_counter())
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self._local.starts.pop(), **self.labels)
+        return False
+
+    def __call__(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self:
+                return fn(*args, **kwargs)
+        return wrapper
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def register_stats(self, prefix, stats_fn):
+        """Export every numeric value of stats_fn() as gauge `<prefix>_<key>`."""
+        with self._lock:
+            self._stats[prefix] = stats_fn
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            stats = list(self._stats.items())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, stats_fn in stats:
+            try:
+                values = stats_fn()
+            except Exception:
+                continue
+            for key, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+register_stats = REGISTRY.register_stats
+render = REGISTRY.render
+
+HTTP_REQUEST_SECONDS = histogram(
+    "http_request_duration_seconds", "Time spent handling a request, by route.",
+    ("app", "method", "route", "status"))
+OPERATION_SECONDS = histogram(
+    "app_operation_duration_seconds", "Time spent in instrumented hot-path functions.",
+    ("operation",))
+DB_QUERY_SECONDS = histogram(
+    "db_query_duration_seconds", "Time spent executing a SQL statement, by verb and table.",
+    ("statement",))
+DB_POOL_WAIT_SECONDS = histogram(
+    "db_pool_wait_seconds", "Time spent waiting to borrow a pooled connection.")
+GRAPH_REQUEST_SECONDS = histogram(
+    "graph_api_request_duration_seconds", "Graph API call latency, by message type and HTTP status.",
+    ("type", "status"))
+
+
+def instrument_app(app, name):
+    """Time every request on a Flask app and add GET /metrics."""
+    from flask import Response, g, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("_metrics_started", None)
+        if started is not None:
+            rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, app=name, method=request.method,
+                                         route=rule, status=response.status_code)
+        return response
+
+    def metrics_endpoint():
+        if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+            return Response("Forbidden\n", status=403, mimetype="text/plain")
+        return Response(render(), content_type=CONTENT_TYPE)
+
+    app.add_url_rule("/metrics", endpoint="metrics", view_func=metrics_endpoint)
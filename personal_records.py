@@ -0,0 +1,177 @@
+"""Set-based personal record engine.
+
+Records live in `personal_records`, one row per (user_id, exercise_name):
+
+* weight / reps / date_achieved - heaviest set (more reps breaks a tie)
+* e1rm          - best estimated one-rep max (Epley: weight * (1 + reps / 30))
+* max_volume    - best sets * reps * weight for a single logged exercise
+* best_distance / best_duration - swimming, where workout_exercises.weight
+  holds meters (>= SWIM_DISTANCE_MIN) or minutes, as the dashboard reads it
+
+Records only ever improve when sets are added, so logging merges the new
+sets in with one upsert (upsert_sql() can be embedded in the logging
+statement itself). Deleting a set can take a record away, so
+recompute() rebuilds just the affected exercises from their remaining
+sets. `python personal_records.py rebuild` recomputes everything, e.g.
+after the columns are first added.
+"""
+import sys
+import argparse
+import logging
+
+import db_pool
+import data_version
+
+logger = logging.getLogger(__name__)
+
+SWIM_DISTANCE_MIN = 1000   # swimming weight values below this are minutes
+
+# Per-set measures; `s` has exercise_name, sets, reps, weight, workout_date, swimming.
+_MEASURES = f"""
+    CASE WHEN NOT s.swimming AND s.reps > 0
+         THEN CASE WHEN s.reps = 1 THEN s.weight ELSE round(s.weight * (1 + s.reps / 30.0), 2) END
+    END AS e1rm,
+    CASE WHEN NOT s.swimming THEN s.sets * s.reps * s.weight END AS volume,
+    CASE WHEN s.swimming AND s.weight >= {SWIM_DISTANCE_MIN} THEN s.weight END AS distance,
+    CASE WHEN s.swimming AND s.weight < {SWIM_DISTANCE_MIN} THEN s.weight END AS duration
+"""
+
+
+_HEAVIER = ("(EXCLUDED.weight, EXCLUDED.reps) > "
+            "(COALESCE(personal_records.weight, -1), COALESCE(personal_records.reps, -1))")
+
+_HISTORY = """
+    (SELECT w.user_id, we.exercise_name, we.sets, we.reps, we.weight, w.workout_date,
+            COALESCE(LOWER(w.muscle_group) = 'swimming', FALSE) AS swimming
+     FROM workouts w
+     JOIN workout_exercises we ON we.workout_id = w.id
+     {where})
+"""
+
+
+def candidates_sql(source, keys=("exercise_name",)):
+    """One candidate record per `keys` group from a relation of sets, in one pass."""
+    group = ", ".join(f"m.{key}" for key in keys)
+    return f"""
+        SELECT DISTINCT ON ({group})
+               m.*,
+               MAX(m.e1rm) OVER per_exercise AS best_e1rm,
+               MAX(m.volume) OVER per_exercise AS max_volume,
+               MAX(m.distance) OVER per_exercise AS best_distance,
+               MAX(m.duration) OVER per_exercise AS best_duration
+        FROM (SELECT s.*, {_MEASURES} FROM {source} s) m
+        WINDOW per_exercise AS (PARTITION BY {group})
+        ORDER BY {group}, m.weight DESC NULLS LAST, m.reps DESC NULLS LAST, m.workout_date
+    """
+
+
+def upsert_sql(source, user_id_param="%(user_id)s"):
+    """Merge the records of newly logged sets into personal_records.
+
+    `source` is a relation (CTE name, or parenthesised subquery) of one
+    user's new sets with exercise_name, sets, reps, weight, workout_date
+    and swimming. Every measure only moves up, and rows are only rewritten
+    when something improved.
+    """
+    return f"""
+        INSERT INTO personal_records
+            (user_id, exercise_name, weight, reps, date_achieved, e1rm, max_volume, best_distance, best_duration)
+        SELECT {user_id_param}, c.exercise_name, c.weight, c.reps, c.workout_date,
+               c.best_e1rm, c.max_volume, c.best_distance, c.best_duration
+        FROM ({candidates_sql(source)}) c
+        ON CONFLICT (user_id, exercise_name) DO UPDATE SET
+            weight = CASE WHEN {_HEAVIER} THEN EXCLUDED.weight ELSE personal_records.weight END,
+            reps = CASE WHEN {_HEAVIER} THEN EXCLUDED.reps ELSE personal_records.reps END,
+            date_achieved = CASE WHEN {_HEAVIER} THEN EXCLUDED.date_achieved ELSE personal_records.date_achieved END,
+            e1rm = GREATEST(personal_records.e1rm, EXCLUDED.e1rm),
+            max_volume = GREATEST(personal_records.max_volume, EXCLUDED.max_volume),
+            best_distance = GREATEST(personal_records.best_distance, EXCLUDED.best_distance),
+            best_duration = GREATEST(personal_records.best_duration, EXCLUDED.best_duration)
+        WHERE {_HEAVIER}
+           OR EXCLUDED.e1rm > COALESCE(personal_records.e1rm, -1)
+           OR EXCLUDED.max_volume > COALESCE(personal_records.max_volume, -1)
+           OR EXCLUDED.best_distance > COALESCE(personal_records.best_distance, -1)
+           OR EXCLUDED.best_duration > COALESCE(personal_records.best_duration, -1)
+    """
+
+
+def record_sets(cur, user_id, workout_date, sets, swimming=False):
+    """Merge freshly logged sets [(exercise_name, sets, reps, weight), ...]."""
+    if not sets:
+        return
+    names, set_counts, reps, weights = (list(column) for column in zip(*sets))
+    source = """
+        (SELECT v.exercise_name, v.sets, v.reps, v.weight,
+                %(workout_date)s::date AS workout_date, %(swimming)s AS swimming
+         FROM unnest(%(names)s::text[], %(sets)s::integer[], %(reps)s::integer[], %(weights)s::numeric[])
+              AS v (exercise_name, sets, reps, weight))
+    """
+    cur.execute(upsert_sql(source), {
+        "user_id": user_id, "workout_date": workout_date, "swimming": swimming,
+        "names": names, "sets": set_counts, "reps": reps, "weights": weights,
+    })
+
+
+def recompute(cur, user_id=None, exercise_names=None):
+    """Rebuild records from the sets that remain.
+
+    Narrow it to one user and, after a delete, to the exercises touched.
+    Records of exercises with no sets left are removed. Returns
+    (records written, records removed).
+    """
+    sets_filter, records_filter, params = [], [], {}
+    if user_id is not None:
+        sets_filter.append("w.user_id = %(user_id)s")
+        records_filter.append("pr.user_id = %(user_id)s")
+        params["user_id"] = user_id
+    if exercise_names is not None:
+        sets_filter.append("we.exercise_name = ANY(%(names)s)")
+        records_filter.append("pr.exercise_name = ANY(%(names)s)")
+        params["names"] = list(exercise_names)
+
+    cur.execute(f"""
+        DELETE FROM personal_records pr
+        WHERE {" AND ".join(records_filter) or "TRUE"}
+          AND NOT EXISTS (
+              SELECT 1 FROM workouts w JOIN workout_exercises we ON we.workout_id = w.id
+              WHERE w.user_id = pr.user_id AND we.exercise_name = pr.exercise_name
+          )
+    """, params)
+    removed = cur.rowcount
+
+    history = _HISTORY.format(where=("WHERE " + " AND ".join(sets_filter)) if sets_filter else "")
+    cur.execute(f"""
+        INSERT INTO personal_records
+            (user_id, exercise_name, weight, reps, date_achieved, e1rm, max_volume, best_distance, best_duration)
+        SELECT c.user_id, c.exercise_name, c.weight, c.reps, c.workout_date,
+               c.best_e1rm, c.max_volume, c.best_distance, c.best_duration
+        FROM ({candidates_sql(history, keys=("user_id", "exercise_name"))}) c
+        ON CONFLICT (user_id, exercise_name) DO UPDATE SET
+            weight = EXCLUDED.weight, reps = EXCLUDED.reps, date_achieved = EXCLUDED.date_achieved,
+            e1rm = EXCLUDED.e1rm, max_volume = EXCLUDED.max_volume,
+            best_distance = EXCLUDED.best_distance, best_duration = EXCLUDED.best_duration
+    """, params)
+    return cur.rowcount, removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the personal_records table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="recompute records from workout history")
+    rebuild_parser.add_argument("--user", type=int, help="only this users.id")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with db_pool.cursor() as cur:
+        written, removed = recompute(cur, args.user)
+        # Same transaction: pages cached on the old records must not survive.
+        if args.user is not None:
+            data_version.bump(cur, args.user)
+        else:
+            data_version.bump_all(cur)
+    print(f"✅ Recomputed {written} personal record(s), removed {removed} stale")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
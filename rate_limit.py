@@ -0,0 +1,110 @@
+"""Token-bucket rate limiting for Graph API sends.
+
+RateLimiter combines one global bucket (the business phone number's
+throughput) with a bucket per recipient number (Meta's pair rate limit), so
+we send as fast as allowed and no faster. After a throttling response the
+affected bucket is paused so every sender backs off, not just the one that
+got the 429.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+
+GRAPH_RATE_LIMIT = float(os.getenv("GRAPH_RATE_LIMIT", "50"))          # messages/sec, whole number
+GRAPH_RATE_BURST = float(os.getenv("GRAPH_RATE_BURST", "50"))
+GRAPH_RECIPIENT_RATE = float(os.getenv("GRAPH_RECIPIENT_RATE", "1"))   # messages/sec, one recipient
+GRAPH_RECIPIENT_BURST = float(os.getenv("GRAPH_RECIPIENT_BURST", "12"))
+MAX_TRACKED_RECIPIENTS = 10000
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilling at `rate` tokens/sec up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """Take `tokens` now, going into debt if needed; return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            wait = 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+            return max(wait, self._paused_until - now)
+
+    def acquire(self, tokens=1):
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds):
+        """Hold every caller off for `seconds` (e.g. after a 429)."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._refill(now)
+            self._tokens = min(self._tokens, 0)
+
+    def is_full(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens >= self.capacity
+
+
+class RateLimiter:
+    """Global bucket plus one bucket per recipient key."""
+
+    def __init__(self, rate=GRAPH_RATE_LIMIT, burst=GRAPH_RATE_BURST,
+                 per_key_rate=GRAPH_RECIPIENT_RATE, per_key_burst=GRAPH_RECIPIENT_BURST,
+                 max_keys=MAX_TRACKED_RECIPIENTS):
+        self.global_bucket = TokenBucket(rate, burst)
+        self.per_key_rate = per_key_rate
+        self.per_key_burst = per_key_burst
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bucket_for(self, key):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.per_key_rate, self.per_key_burst)
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._evict()
+            else:
+                self._buckets.move_to_end(key)
+            return bucket
+
+    def _evict(self):
+        # Oldest first; a full bucket carries no state worth keeping.
+        for key in list(self._buckets)[:len(self._buckets) - self.max_keys]:
+            if self._buckets[key].is_full():
+                del self._buckets[key]
+
+    def acquire(self, key=None):
+        """Block until both the recipient and the global bucket allow a send."""
+        waited = 0.0
+        if key is not None:
+            waited += self.bucket_for(key).acquire()
+        waited += self.global_bucket.acquire()
+        return waited
+
+    def pause(self, seconds, key=None):
+        if key is None:
+            self.global_bucket.pause(seconds)
+        else:
+            self.bucket_for(key).pause(seconds)
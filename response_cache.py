@@ -0,0 +1,104 @@
+"""Shared cache of whole rendered responses, with ETag revalidation.
+
+For pages whose body depends only on a small key - /exercises/<muscle_group>
+is (muscle group, language, exercise catalog version) - the first request
+renders the page and every later one in this process is served from
+memory. Each entry carries a content-hash ETag, so a browser revalidating
+with If-None-Match gets a bodiless 304.
+
+    return response_cache.cache.respond(key, lambda: render_page(...))
+
+Per-user pages (/dashboard, /api/workouts) go in their own LRU,
+`user_cache`, so however many users are active they can't push the shared
+pages out. They key on the user's data version (data_version.py) and pass
+a weak ETag built from the same key, so a revalidation is answered before
+looking at the cache or rendering.
+"""
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+# Seconds browsers may reuse a page without asking; 0 means always revalidate.
+RESPONSE_CACHE_MAX_AGE = int(os.getenv("RESPONSE_CACHE_MAX_AGE", "0"))
+USER_RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("USER_RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+
+class ResponseCache:
+    """LRU of (body, etag, mimetype) keyed by tuples, with hit/miss counters."""
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, max_age=RESPONSE_CACHE_MAX_AGE):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, body, mimetype="text/html"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        entry = (body, hashlib.sha1(body).hexdigest(), mimetype)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def respond(self, key, render, mimetype="text/html", etag=None):
+        """Response for key, rendering it with render() on a miss.
+
+        Honours If-None-Match for the current request. With `etag`, that
+        weak tag is used instead of the content hash, and a request that
+        already holds it gets its 304 without render() running.
+        """
+        if etag is not None and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            body, content_etag, mimetype = self.get(key) or self.put(key, render(), mimetype)
+            response = Response(body, mimetype=mimetype)
+        response.set_etag(etag or content_etag, weak=etag is not None)
+        if self.max_age > 0:
+            response.headers["Cache-Control"] = f"private, max-age={self.max_age}"
+        else:
+            response.headers["Cache-Control"] = "private, no-cache"
+        response = response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        return response
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "size": len(self._entries),
+            }
+
+
+cache = ResponseCache()
+user_cache = ResponseCache(max_entries=USER_RESPONSE_CACHE_MAX_ENTRIES, max_age=0)
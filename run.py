@@ -1,41 +1,16 @@
 import os
-from webhook import app
-from waitress import serve
-import logging
-from logging.handlers import RotatingFileHandler
-from time import strftime
 import sys
+import logging
 
-# Configure logging
-if not os.path.exists('logs'):
-    os.makedirs('logs')
-
-# Configure console handler
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter(
-    '[%(asctime)s] %(levelname)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-))
+# run.py has always kept a rotating logs/server.log next to stdout;
+# log_config reads these at import time.
+os.environ.setdefault("LOG_FILE", "logs/server.log")
 
-# Configure file handler with UTF-8 encoding
-file_handler = RotatingFileHandler(
-    'logs/server.log',
-    maxBytes=10000000,  # 10MB
-    backupCount=5,
-    encoding='utf-8'
-)
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(logging.Formatter(
-    '[%(asctime)s] %(levelname)s: %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-))
+import log_config
+log_config.configure_logging()
 
-# Set up root logger
-logging.basicConfig(
-    level=logging.INFO,
-    handlers=[console_handler, file_handler]
-)
+from webhook import app
+from waitress import serve
 
 # Server configuration
 SERVER_CONFIG = {
@@ -0,0 +1,133 @@
+"""Database objects the apps rely on beyond the base tables.
+
+Every statement is idempotent, and the deploy runs it before starting the
+new release (Procfile `release`, railway*.json `preDeployCommand`):
+
+    python schema.py
+"""
+import logging
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+STATEMENTS = [
+    # -- exercise catalog versioning (exercise_catalog.py) ---------------
+    # Any write to exercises (seed_exercises.py, getUrlimg.py, manual edits)
+    # bumps the version and notifies listeners so in-process catalogs reload.
+    """
+    CREATE TABLE IF NOT EXISTS exercise_catalog_version (
+        id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+        version BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    INSERT INTO exercise_catalog_version (id, version) VALUES (TRUE, 0)
+    ON CONFLICT (id) DO NOTHING
+    """,
+    """
+    CREATE OR REPLACE FUNCTION bump_exercise_catalog_version() RETURNS trigger AS $$
+    DECLARE
+        new_version BIGINT;
+    BEGIN
+        UPDATE exercise_catalog_version SET version = version + 1
+        RETURNING version INTO new_version;
+        PERFORM pg_notify('exercise_catalog', new_version::text);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS exercises_catalog_version ON exercises",
+    """
+    CREATE TRIGGER exercises_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON exercises
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_exercise_catalog_version()
+    """,
+
+    # -- bot conversation state (session_store.PostgresSessionStore) -----
+    """
+    CREATE TABLE IF NOT EXISTS bot_sessions (
+        wa_id VARCHAR(20) PRIMARY KEY,
+        state JSONB NOT NULL,
+        expires_at TIMESTAMPTZ NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS bot_sessions_expires_at_idx ON bot_sessions (expires_at)",
+
+    # -- webhook redelivery guard (dedup.py, WEBHOOK_DEDUP_PERSIST=1) ----
+    """
+    CREATE TABLE IF NOT EXISTS processed_messages (
+        message_id VARCHAR(128) PRIMARY KEY,
+        received_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS processed_messages_received_at_idx ON processed_messages (received_at)",
+
+    # -- delivery/read receipts (delivery_status.py) ---------------------
+    """
+    CREATE TABLE IF NOT EXISTS message_statuses (
+        message_id VARCHAR(128) PRIMARY KEY,
+        recipient_id VARCHAR(20),
+        status VARCHAR(16) NOT NULL,
+        status_at TIMESTAMPTZ NOT NULL,
+        error_code INTEGER
+    )
+    """,
+
+    # -- dashboard / workout history reads (dashboard.py, workout_history.py)
+    # INCLUDE columns make the dashboard's scans index-only; id in the key
+    # lets a history page seek straight to its (workout_date, id) cursor.
+    """
+    CREATE INDEX IF NOT EXISTS workouts_user_date_id_idx
+    ON workouts (user_id, workout_date, id) INCLUDE (muscle_group)
+    """,
+    "DROP INDEX IF EXISTS workouts_user_date_idx",
+    """
+    CREATE INDEX IF NOT EXISTS workout_exercises_workout_order_idx
+    ON workout_exercises (workout_id, order_index) INCLUDE (id, exercise_name, sets, reps, weight)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS personal_records_user_date_idx
+    ON personal_records (user_id, date_achieved DESC)
+    """,
+
+    # -- per-user totals (user_stats.py; backfill with `python user_stats.py rebuild`)
+    """
+    CREATE TABLE IF NOT EXISTS user_stats (
+        user_id INTEGER PRIMARY KEY,
+        total_workouts BIGINT NOT NULL DEFAULT 0,
+        total_exercises BIGINT NOT NULL DEFAULT 0,
+        total_reps BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    )
+    """,
+    # -- personal record measures (personal_records.py; backfill with
+    #    `python personal_records.py rebuild`)
+    """
+    ALTER TABLE personal_records
+        ADD COLUMN IF NOT EXISTS e1rm NUMERIC(8, 2),
+        ADD COLUMN IF NOT EXISTS max_volume NUMERIC(12, 2),
+        ADD COLUMN IF NOT EXISTS best_distance NUMERIC(8, 2),
+        ADD COLUMN IF NOT EXISTS best_duration NUMERIC(8, 2)
+    """,
+    # -- per-user data version (data_version.py): bumped by every workout
+    #    write, keys the web app's per-user caches and ETags
+    """
+    ALTER TABLE users ADD COLUMN IF NOT EXISTS data_version BIGINT NOT NULL DEFAULT 0
+    """,
+]
+
+
+def apply_schema():
+    with db_pool.cursor() as cur:
+        # The bot and web app deploy separately; let one apply at a time.
+        cur.execute("SELECT pg_advisory_xact_lock(hashtext('schema.py'))")
+        for statement in STATEMENTS:
+            cur.execute(statement)
+    logger.info("Applied %d schema statements", len(STATEMENTS))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    apply_schema()
+    print("✅ Schema is up to date")
@@ -0,0 +1,215 @@
+"""Conversation state storage for the WhatsApp bot.
+
+Replaces the module-global user_states dict so consecutive messages from a
+user can land on any gunicorn worker or Railway replica. Two backends:
+
+* MemorySessionStore - per-process, TTL-evicted and size-bounded; fine for
+  a single worker and for local development.
+* PostgresSessionStore - shared `bot_sessions` table; use it whenever more
+  than one process serves the webhook.
+
+Both expose the dict-style calls the handlers already use (`in`, `[]`,
+`get`, `pop`) plus update(wa_id, fn) for atomic read-modify-write. States
+are plain JSON-serialisable dicts; mutate them through update() or by
+assigning a new dict, never in place.
+"""
+import os
+import copy
+import json
+import time
+import threading
+import logging
+from collections import OrderedDict
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+SESSION_STORE = os.getenv("SESSION_STORE", "memory")
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(6 * 3600)))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "50000"))
+
+_MISSING = object()
+
+
+class SessionStore:
+    """Dict-style helpers shared by the backends."""
+
+    def get(self, wa_id, default=None):
+        raise NotImplementedError
+
+    def set(self, wa_id, state):
+        raise NotImplementedError
+
+    def pop(self, wa_id, default=None):
+        raise NotImplementedError
+
+    def update(self, wa_id, fn):
+        """Atomically replace the state with fn(current_state_or_empty_dict).
+
+        Returning None from fn deletes the session. Returns the new state.
+        """
+        raise NotImplementedError
+
+    def __contains__(self, wa_id):
+        return self.get(wa_id) is not None
+
+    def __getitem__(self, wa_id):
+        state = self.get(wa_id)
+        if state is None:
+            raise KeyError(wa_id)
+        return state
+
+    def __setitem__(self, wa_id, state):
+        self.set(wa_id, state)
+
+    def __delitem__(self, wa_id):
+        if self.pop(wa_id, _MISSING) is _MISSING:
+            raise KeyError(wa_id)
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with TTL eviction and an LRU size bound."""
+
+    def __init__(self, ttl=SESSION_TTL, max_entries=SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()   # wa_id -> (expires_at, state)
+        self._lock = threading.RLock()
+
+    def _live(self, wa_id, now):
+        entry = self._data.get(wa_id)
+        if entry is None:
+            return None
+        if entry[0] <= now:
+            del self._data[wa_id]
+            return None
+        return entry[1]
+
+    def _store(self, wa_id, state, now):
+        self._data[wa_id] = (now + self.ttl, state)
+        self._data.move_to_end(wa_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def get(self, wa_id, default=None):
+        with self._lock:
+            state = self._live(wa_id, time.monotonic())
+        # Hand out copies so callers can't mutate stored state behind our back.
+        return default if state is None else copy.deepcopy(state)
+
+    def set(self, wa_id, state):
+        with self._lock:
+            self._store(wa_id, copy.deepcopy(state), time.monotonic())
+
+    def pop(self, wa_id, default=None):
+        with self._lock:
+            state = self._live(wa_id, time.monotonic())
+            if state is None:
+                return default
+            del self._data[wa_id]
+            return state
+
+    def update(self, wa_id, fn):
+        with self._lock:
+            now = time.monotonic()
+            current = self._live(wa_id, now)
+            new_state = fn(copy.deepcopy(current) if current is not None else {})
+            if new_state is None:
+                self._data.pop(wa_id, None)
+                return None
+            self._store(wa_id, copy.deepcopy(new_state), now)
+            return copy.deepcopy(new_state)
+
+    def purge_expired(self):
+        now = time.monotonic()
+        with self._lock:
+            for wa_id in [k for k, (expires_at, _) in self._data.items() if expires_at <= now]:
+                del self._data[wa_id]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+class PostgresSessionStore(SessionStore):
+    """Shared store in the `bot_sessions` table (see schema.py)."""
+
+    PURGE_EVERY = 500   # writes between expired-row cleanups
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _maybe_purge(self, cur):
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % self.PURGE_EVERY == 0
+        if due:
+            cur.execute("DELETE FROM bot_sessions WHERE expires_at < NOW()")
+
+    def get(self, wa_id, default=None):
+        with db_pool.cursor() as cur:
+            cur.execute("""
+                SELECT state FROM bot_sessions
+                WHERE wa_id = %s AND expires_at > NOW()
+            """, (wa_id,))
+            row = cur.fetchone()
+        return default if row is None else row[0]
+
+    def set(self, wa_id, state):
+        with db_pool.cursor() as cur:
+            cur.execute("""
+                INSERT INTO bot_sessions (wa_id, state, expires_at)
+                VALUES (%s, %s, NOW() + make_interval(secs => %s))
+                ON CONFLICT (wa_id) DO UPDATE
+                SET state = EXCLUDED.state, expires_at = EXCLUDED.expires_at
+            """, (wa_id, json.dumps(state), self.ttl))
+            self._maybe_purge(cur)
+
+    def pop(self, wa_id, default=None):
+        with db_pool.cursor() as cur:
+            cur.execute("""
+                DELETE FROM bot_sessions WHERE wa_id = %s
+                RETURNING state, expires_at > NOW()
+            """, (wa_id,))
+            row = cur.fetchone()
+        if row is None or not row[1]:
+            return default
+        return row[0]
+
+    def update(self, wa_id, fn):
+        with db_pool.cursor() as cur:
+            # Make sure a row exists to lock, then hold it for the whole
+            # read-modify-write so concurrent webhooks for this user serialise.
+            cur.execute("""
+                INSERT INTO bot_sessions (wa_id, state, expires_at)
+                VALUES (%s, '{}'::jsonb, NOW())
+                ON CONFLICT (wa_id) DO NOTHING
+            """, (wa_id,))
+            cur.execute("""
+                SELECT state, expires_at > NOW() FROM bot_sessions
+                WHERE wa_id = %s FOR UPDATE
+            """, (wa_id,))
+            state, live = cur.fetchone()
+            new_state = fn(state if live else {})
+            if new_state is None:
+                cur.execute("DELETE FROM bot_sessions WHERE wa_id = %s", (wa_id,))
+                return None
+            cur.execute("""
+                UPDATE bot_sessions
+                SET state = %s, expires_at = NOW() + make_interval(secs => %s)
+                WHERE wa_id = %s
+            """, (json.dumps(new_state), self.ttl, wa_id))
+            self._maybe_purge(cur)
+            return new_state
+
+
+def make_session_store(kind=SESSION_STORE):
+    """Build the backend named by SESSION_STORE ('memory' or 'postgres')."""
+    if kind == "postgres":
+        return PostgresSessionStore()
+    if kind != "memory":
+        logger.warning("Unknown SESSION_STORE %r, using memory", kind)
+    return MemorySessionStore()
@@ -1,20 +1,26 @@
 import os
 from flask import request
-import requests
 import json
+import logging
+import exercise_catalog
+import graph_api
+from dispatcher import dispatcher
+from dedup import deduplicator
+import delivery_status
 
 # Import webapp first
 import webapp
 
 # Get the Flask app from webapp
 app = webapp.app
+logger = logging.getLogger(__name__)
 
 # Import necessary functions from webhook2
 from webhook2 import (
-    connect_db, send_message, send_interactive, get_user,
+    send_message, send_interactive, get_user, get_users,
+    collect_events, group_by_sender,
     send_language_buttons, send_registration_options,
     send_workout_logging_options, generate_web_login_token,
-    send_exercises_fast,  # ✅ Add this import
     user_states
 )
 
@@ -22,23 +28,10 @@ from webhook2 import (
 def get_exercises(muscle_group, language='en'):
     """Get exercises for a muscle group"""
     try:
-        conn = connect_db()
-        cur = conn.cursor()
+        # Case-insensitive lookup in the in-memory catalog
+        exercises = exercise_catalog.get_catalog().by_muscle(muscle_group)
         
-        # Use LOWER() for case-insensitive matching
-        cur.execute("""
-            SELECT name_en, name_es, image_url
-            FROM exercises
-            WHERE LOWER(muscle_group) = LOWER(%s)
-            ORDER BY name_en
-        """, (muscle_group,))
-        
-        exercises = cur.fetchall()
-        
-        print(f"🔍 Query: muscle_group = '{muscle_group}', Lang = '{language}', Found: {len(exercises)} exercises")
-        
-        cur.close()
-        conn.close()
+        logger.debug("Catalog lookup: muscle_group=%r lang=%r found=%d", muscle_group, language, len(exercises))
         
         # Format exercises based on language
         result = []
@@ -46,38 +39,29 @@ def get_exercises(muscle_group, language='en'):
             name = ex[0] if language == 'en' else ex[1]
             result.append({
                 'name': name,
-                'image_url': ex[2],
+                'image_url': ex[3],
                 'description': ''
             })
         
         return result
         
-    except Exception as e:
-        print(f"❌ Error getting exercises: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Error getting exercises")
         return []
 
+# This path has always posted to v21.0, newer than the bots' GRAPH_API_VERSION
+IMAGE_API_VERSION = "v21.0"
+
 def send_exercise_images(sender, exercises, muscle_group):
-    """Send exercise images synchronously"""
-    import requests
-    import time
-    
-    access_token = os.getenv('WHATSAPP_ACCESS_TOKEN')
-    phone_number_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
-    url = f"https://graph.facebook.com/v21.0/{phone_number_id}/messages"
-    
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Content-Type": "application/json"
-    }
+    """Send exercise images synchronously (paced by the client's rate limiter)"""
+    client = graph_api.get_client()
     
-    print(f"📤 Sending {len(exercises)} exercise images...")
+    logger.info("Sending %d exercise images to %s", len(exercises), sender)
     
     for i, exercise in enumerate(exercises, 1):
         try:
             if not exercise.get('image_url'):
-                print(f"⚠️ Skipping exercise {i}: No image URL")
+                logger.warning("Skipping exercise %d (%s): no image URL", i, exercise['name'])
                 continue
                 
             payload = {
@@ -90,25 +74,21 @@ def send_exercise_images(sender, exercises, muscle_group):
                 }
             }
             
-            response = requests.post(url, headers=headers, json=payload)
+            response = client.send(payload, api_version=IMAGE_API_VERSION)
             
             # ✅ Show the full response for errors
             if response.status_code == 200:
-                print(f"✅ Sent image {i}/{len(exercises)}: {exercise['name']}")
+                logger.info("Sent image %d/%d: %s", i, len(exercises), exercise['name'],
+                            extra={"event": "send", "kind": "image", "status": response.status_code})
             else:
-                print(f"❌ FAILED image {i}/{len(exercises)}: {exercise['name']}")
-                print(f"   Status: {response.status_code}")
-                print(f"   URL: {exercise['image_url']}")
-                print(f"   Error: {response.text}")
+                logger.warning("Failed image %d/%d: %s", i, len(exercises), exercise['name'],
+                               extra={"status": response.status_code, "url": exercise['image_url'],
+                                      "error": response.text})
             
-            time.sleep(0.5)
-            
-        except Exception as e:
-            print(f"❌ Exception on image {i}: {e}")
-            import traceback
-            traceback.print_exc()
+        except Exception:
+            logger.exception("Exception on image %d", i)
     
-    print(f"🎉 Finished sending {len(exercises)} images!")
+    logger.info("Finished sending %d images to %s", len(exercises), sender)
 
 @app.route('/webhook', methods=['GET'])
 def webhook_verify():
@@ -120,254 +100,274 @@ def webhook_verify():
     verify_token = os.getenv('WHATSAPP_VERIFY_TOKEN', 'fitbuddy_verify')
     
     if mode == 'subscribe' and token == verify_token:
-        print("✅ Webhook verified!")
+        logger.info("Webhook verified")
         return challenge, 200
     else:
-        print("❌ Webhook verification failed")
+        logger.warning("Webhook verification failed")
         return "Forbidden", 403
 
 @app.route('/webhook', methods=['POST'])
 def webhook():
     """Handle incoming WhatsApp messages"""
-    data = request.get_json()
-    print("=" * 50)
-    print("📩 INCOMING WEBHOOK REQUEST")
-    print("=" * 50)
+    raw = request.get_data(cache=False)
     
     try:
-        message_entry = data["entry"][0]["changes"][0]["value"]
-        
-        if "statuses" in message_entry:
-            print("📊 Status update received, ignoring...")
+        # Status-only callbacks: record in batches and ack without full parsing/logging
+        if delivery_status.is_status_only(raw):
+            statuses = list(delivery_status.iter_statuses(json.loads(raw or b"{}")))
+            delivery_status.recorder.record(statuses)
+            logger.info("Acked status-only webhook (%d statuses)", len(statuses), extra={"event": "status"})
             return "ok", 200
+        
+        data = json.loads(raw)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Incoming webhook: %s", json.dumps(data, indent=2))
+        
+        messages, statuses = collect_events(data)
+        delivery_status.recorder.record(statuses)
             
-        if "messages" not in message_entry:
-            print("⚠️ No messages in entry")
+        if not messages:
+            logger.warning("Webhook payload without messages")
             return "ok", 200
 
-        message = message_entry["messages"][0]
-        sender = message["from"]
-        msg_type = message["type"]
+        fresh = []
+        for message in messages:
+            if deduplicator.is_duplicate(message.get("id")):
+                logger.info("Duplicate delivery of %s, skipping", message.get("id"))
+            else:
+                fresh.append(message)
         
-        print(f"👤 Sender: {sender}, Type: {msg_type}")
+        by_sender = group_by_sender(fresh)
+        if by_sender:
+            users = get_users(list(by_sender))
+            for sender, sender_messages in by_sender.items():
+                dispatcher.submit(sender, process_messages, sender, sender_messages, users.get(sender))
         
-        user = get_user(sender)
-        print(f"📊 User data: {user}")
+    except Exception:
+        logger.exception("Webhook error")
+    
+    return "ok", 200
 
-        # Extract text
-        text = ""
-        if msg_type == "text":
-            text = message["text"]["body"].strip().lower()
-            print(f"💬 Text received: '{text}'")
+def process_messages(sender, messages, user):
+    """Dispatcher job: handle one sender's messages from a payload, in order"""
+    for index, message in enumerate(messages):
+        if index > 0:
+            user = get_user(sender)
+        try:
+            handle_message(message, user)
+        except Exception:
+            logger.exception("Error handling message %s", message.get("id"))
 
-        # Get language
-        lang = "en"
-        if sender in user_states and "lang" in user_states[sender]:
-            lang = user_states[sender]["lang"]
-        elif user and user[4]:
-            lang = user[4]
+def handle_message(message, user):
+    """Run the bot logic for a single inbound message"""
+    sender = message["from"]
+    msg_type = message["type"]
+    
+    logger.info("Message from %s", sender, extra={"wa_id": sender, "type": msg_type})
+    logger.debug("User data: %s", user)
 
-        # Handle greetings
-        if msg_type == "text" and text in ["hi", "hello", "hola", "hey"]:
-            print(f"👋 Processing greeting: '{text}'")
-            user_states.pop(sender, None)
-            
-            if user and user[4] and user[3]:
-                lang = user[4]
-                user_states[sender] = {"lang": lang}
-                print(f"✅ Sending registration options to existing user (lang: {lang})")
-                send_registration_options(sender, lang)
-            else:
-                user_states[sender] = {"awaiting_language": True}
-                print("✅ Sending language buttons to new user")
-                send_language_buttons(sender)
-            return "ok", 200
+    # Extract text
+    text = ""
+    if msg_type == "text":
+        text = message["text"]["body"].strip().lower()
+        logger.debug("Text received: %r", text)
 
-        # Handle tracker command
-        if msg_type == "text" and text in ["tracker", "web", "website", "dashboard", "panel", "rastreador"]:
-            token = generate_web_login_token(sender)
+    # Get language
+    lang = "en"
+    state = user_states.get(sender, {})
+    if "lang" in state:
+        lang = state["lang"]
+    elif user and user[4]:
+        lang = user[4]
+
+    # Handle greetings
+    if msg_type == "text" and text in ["hi", "hello", "hola", "hey"]:
+        logger.debug("Processing greeting: %r", text)
+        user_states.pop(sender, None)
+        
+        if user and user[4] and user[3]:
+            lang = user[4]
+            user_states[sender] = {"lang": lang}
+            logger.debug("Sending registration options to existing user (lang: %s)", lang)
+            send_registration_options(sender, lang)
+        else:
+            user_states[sender] = {"awaiting_language": True}
+            logger.debug("Sending language buttons to new user")
+            send_language_buttons(sender)
+        return
+
+    # Handle tracker command
+    if msg_type == "text" and text in ["tracker", "web", "website", "dashboard", "panel", "rastreador"]:
+        token = generate_web_login_token(sender)
+        
+        if token:
+            web_url = f"{os.getenv('WEB_APP_URL')}/login/{token}"
             
-            if token:
-                web_url = f"{os.getenv('WEB_APP_URL')}/login/{token}"
-                
-                msg = {
-                    "en": f"🌐 *Access Your Workout Tracker*\n\n{web_url}\n\n⏰ Link expires in 1 hour\n\n📝 Log workouts, track progress, and view analytics!\n\n💬 Type 'hi' to start a new chat session.",
-                    "es": f"🌐 *Accede a Tu Rastreador de Entrenamientos*\n\n{web_url}\n\n⏰ Enlace expira en 1 hora\n\n📝 ¡Registra entrenamientos, rastrea progreso y ve análisis!\n\n💬 Escribe 'hi' para iniciar una nueva sesión de chat."
-                }
-                send_message(sender, msg[lang])
-                
-                user_states.pop(sender, None)
-            else:
-                msg = {
-                    "en": "❌ Error generating login link. Please try again.",
-                    "es": "❌ Error generando enlace. Por favor intenta de nuevo."
-                }
-                send_message(sender, msg[lang])
+            msg = {
+                "en": f"🌐 *Access Your Workout Tracker*\n\n{web_url}\n\n⏰ Link expires in 1 hour\n\n📝 Log workouts, track progress, and view analytics!\n\n💬 Type 'hi' to start a new chat session.",
+                "es": f"🌐 *Accede a Tu Rastreador de Entrenamientos*\n\n{web_url}\n\n⏰ Enlace expira en 1 hora\n\n📝 ¡Registra entrenamientos, rastrea progreso y ve análisis!\n\n💬 Escribe 'hi' para iniciar una nueva sesión de chat."
+            }
+            send_message(sender, msg[lang])
             
-            return "ok", 200
+            user_states.pop(sender, None)
+        else:
+            msg = {
+                "en": "❌ Error generating login link. Please try again.",
+                "es": "❌ Error generando enlace. Por favor intenta de nuevo."
+            }
+            send_message(sender, msg[lang])
+        
+        return
 
-        # Handle muscle group selection
-        if msg_type == "text" and user_states.get(sender, {}).get("expecting_muscle"):
-            lang = user_states[sender].get("lang", "en")
+    # Handle muscle group selection
+    if msg_type == "text" and state.get("expecting_muscle"):
+        lang = state.get("lang", "en")
+        
+        # Combined muscle map - accepts both languages, returns DB value based on user's lang
+        muscle_translations = {
+            # English inputs
+            "chest": {"en": "chest", "es": "pecho"},
+            "back": {"en": "back", "es": "espalda"},
+            "biceps": {"en": "biceps", "es": "biceps"},
+            "triceps": {"en": "triceps", "es": "triceps"},
+            "shoulders": {"en": "shoulders", "es": "hombros"},
+            "legs": {"en": "legs", "es": "pierna"},  # ✅ Changed to 'pierna' (singular)
+            "abs": {"en": "abs", "es": "abdominales"},
+            # Spanish inputs
+            "pecho": {"en": "chest", "es": "pecho"},
+            "espalda": {"en": "back", "es": "espalda"},
+            "bíceps": {"en": "biceps", "es": "biceps"},
+            "hombros": {"en": "shoulders", "es": "hombros"},
+            "piernas": {"en": "legs", "es": "pierna"},  # ✅ Maps 'piernas' to 'pierna' in DB
+            "pierna": {"en": "legs", "es": "pierna"},   # ✅ Also accept singular
+            "abdominales": {"en": "abs", "es": "abdominales"}
+        }
+        
+        # Get the muscle group in the database language
+        muscle_info = muscle_translations.get(text)
+        
+        if muscle_info:
+            # Use the database value based on user's language
+            muscle_db_value = muscle_info[lang]
             
-            # Combined muscle map - accepts both languages, returns DB value based on user's lang
-            muscle_translations = {
-                # English inputs
-                "chest": {"en": "chest", "es": "pecho"},
-                "back": {"en": "back", "es": "espalda"},
-                "biceps": {"en": "biceps", "es": "biceps"},
-                "triceps": {"en": "triceps", "es": "triceps"},
-                "shoulders": {"en": "shoulders", "es": "hombros"},
-                "legs": {"en": "legs", "es": "pierna"},  # ✅ Changed to 'pierna' (singular)
-                "abs": {"en": "abs", "es": "abdominales"},
-                # Spanish inputs
-                "pecho": {"en": "chest", "es": "pecho"},
-                "espalda": {"en": "back", "es": "espalda"},
-                "bíceps": {"en": "biceps", "es": "biceps"},
-                "hombros": {"en": "shoulders", "es": "hombros"},
-                "piernas": {"en": "legs", "es": "pierna"},  # ✅ Maps 'piernas' to 'pierna' in DB
-                "pierna": {"en": "legs", "es": "pierna"},   # ✅ Also accept singular
-                "abdominales": {"en": "abs", "es": "abdominales"}
-            }
+            logger.debug("Text %r (lang %s) -> muscle group %r", text, lang, muscle_db_value)
             
-            # Get the muscle group in the database language
-            muscle_info = muscle_translations.get(text)
+            exercises = get_exercises(muscle_db_value, lang)
             
-            if muscle_info:
-                # Use the database value based on user's language
-                muscle_db_value = muscle_info[lang]
+            if exercises:
+                user_states.update(sender, lambda s: {
+                    **s, "selected_muscle": muscle_db_value, "expecting_muscle": False
+                })
                 
-                print(f"🗺️ Text: '{text}', Lang: '{lang}' → DB value: '{muscle_db_value}'")
-                print(f"💪 Searching for muscle group: {muscle_db_value}")
+                logger.debug("Found %d exercises for %s", len(exercises), muscle_db_value)
                 
-                exercises = get_exercises(muscle_db_value, lang)
+                # Runs on the sender's dispatcher lane; the menu below queues behind it
+                dispatcher.submit(sender, send_exercise_images, sender, exercises, muscle_db_value)
                 
-                if exercises:
-                    user_states[sender]["selected_muscle"] = muscle_db_value
-                    user_states[sender]["expecting_muscle"] = False
-                    
-                    print(f"📋 Found {len(exercises)} exercises for {muscle_db_value}")
-                    
-                    # ✅ Use synchronous function
-                    send_exercise_images(sender, exercises, muscle_db_value)
-                    
-                    send_workout_logging_options(sender, lang)
-                else:
-                    # If no exercises found, show what's actually in the database
-                    try:
-                        conn = connect_db()
-                        cur = conn.cursor()
-                        cur.execute("SELECT DISTINCT muscle_group FROM exercises ORDER BY muscle_group")
-                        db_muscles = [row[0] for row in cur.fetchall()]
-                        cur.close()
-                        conn.close()
-                        print(f"🔍 Available muscle groups in DB: {db_muscles}")
-                    except Exception as e:
-                        print(f"❌ Debug query failed: {e}")
-                    
-                    msg = {
-                        "en": f"❌ No exercises found for {muscle_db_value}. Try another muscle group.",
-                        "es": f"❌ No se encontraron ejercicios para {muscle_db_value}. Prueba otro grupo muscular."
-                    }
-                    send_message(sender, msg[lang])
+                send_workout_logging_options(sender, lang)
             else:
+                # If no exercises found, show what's actually in the database
+                try:
+                    db_muscles = list(exercise_catalog.get_catalog().muscle_groups())
+                    logger.info("No exercises for %s; available muscle groups: %s", muscle_db_value, db_muscles)
+                except Exception:
+                    logger.exception("Debug query failed")
+                
                 msg = {
-                    "en": "❌ Invalid muscle group. Please choose: Chest, Back, Biceps, Triceps, Shoulders, Legs, or Abs",
-                    "es": "❌ Grupo muscular inválido. Elige: Pecho, Espalda, Biceps, Triceps, Hombros, Piernas o Abdominales"
+                    "en": f"❌ No exercises found for {muscle_db_value}. Try another muscle group.",
+                    "es": f"❌ No se encontraron ejercicios para {muscle_db_value}. Prueba otro grupo muscular."
                 }
                 send_message(sender, msg[lang])
-            
-            return "ok", 200
+        else:
+            msg = {
+                "en": "❌ Invalid muscle group. Please choose: Chest, Back, Biceps, Triceps, Shoulders, Legs, or Abs",
+                "es": "❌ Grupo muscular inválido. Elige: Pecho, Espalda, Biceps, Triceps, Hombros, Piernas o Abdominales"
+            }
+            send_message(sender, msg[lang])
+        
+        return
 
-        # Handle button responses
-        if msg_type == "interactive":
-            button_reply = message["interactive"]
-            reply_id = button_reply["button_reply"]["id"]
+    # Handle button responses
+    if msg_type == "interactive":
+        button_reply = message["interactive"]
+        reply_id = button_reply["button_reply"]["id"]
+        
+        logger.debug("Button clicked: %s", reply_id)
+        
+        if reply_id in ["lang_en", "lang_es"]:
+            selected_lang = "en" if reply_id == "lang_en" else "es"
+            user_states[sender] = {"lang": selected_lang, "awaiting_language": False}
             
-            print(f"🔘 Button clicked: {reply_id}")
+            send_registration_options(sender, selected_lang)
+            return
             
-            if reply_id in ["lang_en", "lang_es"]:
-                selected_lang = "en" if reply_id == "lang_en" else "es"
-                user_states[sender] = {"lang": selected_lang, "awaiting_language": False}
-                
-                send_registration_options(sender, selected_lang)
-                return "ok", 200
+        elif reply_id == "continue":
+            lang = user_states.get(sender, {}).get("lang")
+            if not lang and user:
+                lang = user[4]
                 
-            elif reply_id == "continue":
-                lang = user_states.get(sender, {}).get("lang")
-                if not lang and user:
-                    lang = user[4]
-                    
-                if not lang:
-                    user_states[sender] = {"awaiting_language": True}
-                    send_language_buttons(sender)
-                    return "ok", 200
+            if not lang:
+                user_states[sender] = {"awaiting_language": True}
+                send_language_buttons(sender)
+                return
+            
+            msg = {
+                "en": "💪 Reply with a muscle group:\n- Chest\n- Back\n- Biceps\n- Triceps\n- Shoulders\n- Legs\n- Abs\n\n📊 Or type 'tracker' to log workouts",
+                "es": "💪 Responde con un grupo muscular:\n- Pecho\n- Espalda\n- Biceps\n- Triceps\n- Hombros\n- Piernas\n- Abdominales\n\n📊 O escribe 'tracker' para abrir el rastreador"
+            }
+            send_message(sender, msg[lang])
+            user_states[sender] = {
+                "lang": lang,
+                "expecting_muscle": True
+            }
+            return
+        
+        # ✅ ADD THIS NEW HANDLER
+        elif reply_id == "start_over":
+            lang = user_states.get(sender, {}).get("lang", "en")
+            if not lang and user:
+                lang = user[4]
+            
+            logger.debug("Starting over for user %s", sender)
+            
+            # Reset user state but keep language
+            user_states[sender] = {
+                "lang": lang,
+                "expecting_muscle": True
+            }
+            
+            msg = {
+                "en": "💪 Reply with a muscle group:\n- Chest\n- Back\n- Biceps\n- Triceps\n- Shoulders\n- Legs\n- Abs\n\n📊 Or type 'tracker' to log workouts",
+                "es": "💪 Responde con un grupo muscular:\n- Pecho\n- Espalda\n- Biceps\n- Triceps\n- Hombros\n- Piernas\n- Abdominales\n\n📊 O escribe 'tracker' para abrir el rastreador"
+            }
+            send_message(sender, msg[lang])
+            return
+            
+        elif reply_id == "view_web":
+            lang = user_states.get(sender, {}).get("lang")
+            if not lang and user:
+                lang = user[4]
+            
+            token = generate_web_login_token(sender)
+            
+            if token:
+                web_url = f"{os.getenv('WEB_APP_URL')}/login/{token}"
                 
                 msg = {
-                    "en": "💪 Reply with a muscle group:\n- Chest\n- Back\n- Biceps\n- Triceps\n- Shoulders\n- Legs\n- Abs\n\n📊 Or type 'tracker' to log workouts",
-                    "es": "💪 Responde con un grupo muscular:\n- Pecho\n- Espalda\n- Biceps\n- Triceps\n- Hombros\n- Piernas\n- Abdominales\n\n📊 O escribe 'tracker' para abrir el rastreador"
+                    "en": f"🌐 *Access Your Workout Tracker*\n\n{web_url}\n\n⏰ Link expires in 1 hour\n\n📊 View history, analytics, and personal records!\n\n💬 Type 'hi' to start a new chat session.",
+                    "es": f"🌐 *Accede a Tu Rastreador*\n\n{web_url}\n\n⏰ Enlace expira en 1 hora\n\n📊 ¡Ve historial, análisis y récords personales!\n\n💬 Escribe 'hi' para iniciar una nueva sesión de chat."
                 }
                 send_message(sender, msg[lang])
-                user_states[sender] = {
-                    "lang": lang,
-                    "expecting_muscle": True
-                }
-                return "ok", 200
-            
-            # ✅ ADD THIS NEW HANDLER
-            elif reply_id == "start_over":
-                lang = user_states.get(sender, {}).get("lang", "en")
-                if not lang and user:
-                    lang = user[4]
-                
-                print(f"🔄 Starting over for user {sender}")
-                
-                # Reset user state but keep language
-                user_states[sender] = {
-                    "lang": lang,
-                    "expecting_muscle": True
-                }
                 
+                user_states.pop(sender, None)
+            else:
                 msg = {
-                    "en": "💪 Reply with a muscle group:\n- Chest\n- Back\n- Biceps\n- Triceps\n- Shoulders\n- Legs\n- Abs\n\n📊 Or type 'tracker' to log workouts",
-                    "es": "💪 Responde con un grupo muscular:\n- Pecho\n- Espalda\n- Biceps\n- Triceps\n- Hombros\n- Piernas\n- Abdominales\n\n📊 O escribe 'tracker' para abrir el rastreador"
+                    "en": "❌ Error generating login link. Please try again.",
+                    "es": "❌ Error generando enlace. Por favor intenta de nuevo."
                 }
                 send_message(sender, msg[lang])
-                return "ok", 200
-                
-            elif reply_id == "view_web":
-                lang = user_states.get(sender, {}).get("lang")
-                if not lang and user:
-                    lang = user[4]
-                
-                token = generate_web_login_token(sender)
-                
-                if token:
-                    web_url = f"{os.getenv('WEB_APP_URL')}/login/{token}"
-                    
-                    msg = {
-                        "en": f"🌐 *Access Your Workout Tracker*\n\n{web_url}\n\n⏰ Link expires in 1 hour\n\n📊 View history, analytics, and personal records!\n\n💬 Type 'hi' to start a new chat session.",
-                        "es": f"🌐 *Accede a Tu Rastreador*\n\n{web_url}\n\n⏰ Enlace expira en 1 hora\n\n📊 ¡Ve historial, análisis y récords personales!\n\n💬 Escribe 'hi' para iniciar una nueva sesión de chat."
-                    }
-                    send_message(sender, msg[lang])
-                    
-                    user_states.pop(sender, None)
-                else:
-                    msg = {
-                        "en": "❌ Error generating login link. Please try again.",
-                        "es": "❌ Error generando enlace. Por favor intenta de nuevo."
-                    }
-                    send_message(sender, msg[lang])
-                
-                return "ok", 200
-
-        return "ok", 200
-        
-    except Exception as e:
-        print(f"❌ Webhook error: {e}")
-        import traceback
-        traceback.print_exc()
-        return "ok", 200
+            
+            return
 
 # Health check
 @app.route('/health')
@@ -376,11 +376,5 @@ def health():
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 8080))
-    print("=" * 50)
-    print(f"🚀 Starting Combined App on port {port}")
-    print(f"📍 Webhook GET: /webhook")
-    print(f"📍 Webhook POST: /webhook")
-    print(f"📍 Dashboard: /dashboard")
-    print(f"📍 Health: /health")
-    print("=" * 50)
+    logger.info("Starting combined app on port %d (webhook: /webhook, dashboard: /dashboard, health: /health)", port)
     app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
\ No newline at end of file
@@ -1,4 +1,5 @@
-from webhook2 import generate_web_login_token, connect_db
+import db_pool
+from webhook2 import generate_web_login_token
 
 # Test token generation
 test_wa_id = "666580599871427"  # Replace with your WhatsApp number
@@ -9,12 +10,9 @@ if token:
     print(f"🔗 Test URL: http://localhost:5001/login/{token}")
     
     # Verify in database
-    conn = connect_db()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM login_tokens WHERE token = %s", (token,))
-    result = cur.fetchone()
+    with db_pool.cursor() as cur:
+        cur.execute("SELECT * FROM login_tokens WHERE token = %s", (token,))
+        result = cur.fetchone()
     print(f"📊 Database entry: {result}")
-    cur.close()
-    conn.close()
 else:
     print("❌ Token generation failed")
\ No newline at end of file
@@ -0,0 +1,122 @@
+"""Per-user workout totals kept up to date as workouts are written.
+
+The dashboard used to aggregate a user's whole history on every load.
+`user_stats` holds the three totals instead; the web app adjusts them in
+the same transaction that logs or deletes exercises, so reading them is a
+primary-key lookup.
+
+A user without a row (e.g. history logged before this table existed) is
+rebuilt from workouts/workout_exercises the first time one of their
+workouts changes; the dashboard falls back to the live aggregate until
+then. To backfill or repair everyone:
+
+    python user_stats.py rebuild            # all users
+    python user_stats.py rebuild --user 42  # one user
+"""
+import sys
+import argparse
+import logging
+
+import db_pool
+import data_version
+
+logger = logging.getLogger(__name__)
+
+_AGGREGATE = """
+    SELECT w.user_id,
+           COUNT(DISTINCT w.id) AS total_workouts,
+           COUNT(we.id) AS total_exercises,
+           COALESCE(SUM(we.sets * we.reps), 0) AS total_reps
+    FROM workouts w
+    LEFT JOIN workout_exercises we ON we.workout_id = w.id
+"""
+
+
+def rebuild(cur, user_id=None):
+    """Recompute totals from the workout tables (one user, or everyone).
+
+    Bumps the rebuilt users' data version (data_version.py) in the same
+    transaction, so pages cached on the old totals are not served again.
+    Returns the number of user_stats rows written.
+    """
+    where = "WHERE w.user_id = %(user_id)s" if user_id is not None else ""
+    cur.execute(f"""
+        INSERT INTO user_stats (user_id, total_workouts, total_exercises, total_reps, updated_at)
+        SELECT user_id, total_workouts, total_exercises, total_reps, NOW()
+        FROM ({_AGGREGATE} {where} GROUP BY w.user_id) totals
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_workouts = EXCLUDED.total_workouts,
+            total_exercises = EXCLUDED.total_exercises,
+            total_reps = EXCLUDED.total_reps,
+            updated_at = NOW()
+    """, {"user_id": user_id})
+    written = cur.rowcount
+    if user_id is not None:
+        # Users whose last workout was deleted have nothing to aggregate.
+        cur.execute("""
+            UPDATE user_stats SET total_workouts = 0, total_exercises = 0, total_reps = 0, updated_at = NOW()
+            WHERE user_id = %s AND NOT EXISTS (SELECT 1 FROM workouts WHERE user_id = %s)
+        """, (user_id, user_id))
+        data_version.bump(cur, user_id)
+    else:
+        cur.execute("""
+            UPDATE user_stats s SET total_workouts = 0, total_exercises = 0, total_reps = 0, updated_at = NOW()
+            WHERE NOT EXISTS (SELECT 1 FROM workouts w WHERE w.user_id = s.user_id)
+        """)
+        data_version.bump_all(cur)
+    return written
+
+
+def apply_delta(cur, user_id, workouts=0, exercises=0, reps=0):
+    """Adjust a user's totals in the caller's transaction.
+
+    Call after the workout rows have been written. If the user has no row
+    yet it is built from scratch, which already includes this change.
+    """
+    cur.execute("""
+        UPDATE user_stats
+        SET total_workouts = total_workouts + %s,
+            total_exercises = total_exercises + %s,
+            total_reps = total_reps + %s,
+            updated_at = NOW()
+        WHERE user_id = %s
+    """, (workouts, exercises, reps, user_id))
+    if cur.rowcount:
+        return
+    # First change for this user. DO NOTHING on conflict: if a concurrent
+    # request created the row meanwhile, its totals can't see our
+    # uncommitted rows, so add our delta on top instead.
+    cur.execute(f"""
+        INSERT INTO user_stats (user_id, total_workouts, total_exercises, total_reps, updated_at)
+        SELECT %(user_id)s, COALESCE(MAX(total_workouts), 0), COALESCE(MAX(total_exercises), 0),
+               COALESCE(MAX(total_reps), 0), NOW()
+        FROM ({_AGGREGATE} WHERE w.user_id = %(user_id)s GROUP BY w.user_id) totals
+        ON CONFLICT (user_id) DO NOTHING
+    """, {"user_id": user_id})
+    if not cur.rowcount:
+        cur.execute("""
+            UPDATE user_stats
+            SET total_workouts = total_workouts + %s,
+                total_exercises = total_exercises + %s,
+                total_reps = total_reps + %s,
+                updated_at = NOW()
+            WHERE user_id = %s
+        """, (workouts, exercises, reps, user_id))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the user_stats summary table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = sub.add_parser("rebuild", help="recompute totals from the workout tables")
+    rebuild_parser.add_argument("--user", type=int, help="only this users.id")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    with db_pool.cursor() as cur:
+        written = rebuild(cur, args.user)
+    print(f"✅ Rebuilt user_stats for {written} user(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
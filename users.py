@@ -0,0 +1,272 @@
+"""User profile reads and writes shared by the WhatsApp bots.
+
+save_user is a single INSERT ... ON CONFLICT (wa_id) DO UPDATE that only
+sets the columns the caller passed, so picking a language no longer wipes
+a stored name/email and two concurrent webhooks can't both take the
+INSERT branch. save_users does the same for many rows at once (bulk
+imports, backfills) with one statement per column set.
+
+get_user/get_users read through a small per-process TTL cache so a
+registered user tapping through the menus doesn't cost a users query per
+message. Unknown and unregistered numbers are never cached: they are
+mid-registration, and with several workers or replicas the next message
+may land on a process that didn't see the write.
+
+Every upsert also NOTIFYs the `user_cache` channel with the wa_ids it
+wrote, and a background thread in each process LISTENs and evicts them, so
+a language change is seen everywhere once it commits. If LISTEN is
+unavailable (some poolers drop it), other processes fall back to the
+entry expiring (USER_CACHE_TTL); set it to 0 to disable the cache.
+"""
+import os
+import time
+import select
+import threading
+import logging
+from collections import OrderedDict
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import db_pool
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+USER_CACHE_CHANNEL = "user_cache"
+# Writes touching more users than this tell listeners to drop everything.
+NOTIFY_MAX_IDS = 100
+LISTEN_RETRY_INTERVAL = 30.0
+
+USER_COLUMNS = ("name", "email", "registered", "language")
+USER_SELECT = "SELECT wa_id, name, email, registered, language FROM users"
+
+
+class UserCache:
+    """TTL'd LRU of registered users' rows keyed by wa_id, with hit/miss counters."""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_entries=USER_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._rows = OrderedDict()   # wa_id -> (expires_at, row_or_None)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # Bumped by every eviction, so a read that raced one isn't stored.
+        self.generation = 0
+
+    def lookup(self, wa_ids):
+        """Split wa_ids into ({wa_id: cached_row}, [wa_ids to fetch])."""
+        found, missing = {}, []
+        now = time.monotonic()
+        with self._lock:
+            for wa_id in wa_ids:
+                entry = self._rows.get(wa_id)
+                if entry is not None and entry[0] > now:
+                    self._rows.move_to_end(wa_id)
+                    found[wa_id] = entry[1]
+                    self.hits += 1
+                else:
+                    missing.append(wa_id)
+                    self.misses += 1
+        return found, missing
+
+    def store(self, rows, generation=None):
+        """Cache the registered rows of {wa_id: row_or_None}.
+
+        Pass the `generation` read before fetching them; if anything was
+        evicted since, the rows may predate that write and are dropped.
+        """
+        if self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            for wa_id, row in rows.items():
+                if row is None or not row[3]:   # unknown or unregistered
+                    continue
+                self._rows[wa_id] = (expires_at, row)
+                self._rows.move_to_end(wa_id)
+            while len(self._rows) > self.max_entries:
+                self._rows.popitem(last=False)
+
+    def invalidate(self, wa_ids):
+        with self._lock:
+            self.generation += 1
+            for wa_id in wa_ids:
+                self._rows.pop(wa_id, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._rows.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "size": len(self._rows),
+            }
+
+
+cache = UserCache()
+_listener_pid = None
+_listener_lock = threading.Lock()
+
+
+def _ensure_listener():
+    """Start this process's invalidation listener once (again after a fork)."""
+    global _listener_pid
+    pid = os.getpid()
+    if _listener_pid == pid or cache.ttl <= 0:
+        return
+    with _listener_lock:
+        if _listener_pid == pid:
+            return
+        _listener_pid = pid
+        thread = threading.Thread(target=_listen_forever, name="user-cache", daemon=True)
+        thread.start()
+
+
+def _listen_forever():
+    while True:
+        conn = None
+        try:
+            conn = psycopg2.connect(**db_pool.get_pool().connect_kwargs)
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {USER_CACHE_CHANNEL}")
+            # Writes before LISTEN weren't heard; don't trust older entries.
+            cache.clear()
+            while True:
+                if not select.select([conn], [], [], LISTEN_RETRY_INTERVAL)[0]:
+                    cur.execute("SELECT 1")   # notice a dead connection
+                    continue
+                conn.poll()
+                wa_ids = {notify.payload for notify in conn.notifies}
+                conn.notifies.clear()
+                if "*" in wa_ids:
+                    cache.clear()
+                else:
+                    cache.invalidate(wa_ids)
+        except Exception:
+            logger.exception("User cache listener failed; retrying")
+            time.sleep(LISTEN_RETRY_INTERVAL)
+        finally:
+            if conn is not None:
+                conn.close()
+
+
+def _notify(cur, wa_ids):
+    """Have every process evict wa_ids once the caller's transaction commits."""
+    wa_ids = list(wa_ids)
+    if len(wa_ids) > NOTIFY_MAX_IDS:
+        cur.execute("SELECT pg_notify(%s, '*')", (USER_CACHE_CHANNEL,))
+    elif wa_ids:
+        cur.execute("SELECT pg_notify(%s, wa_id) FROM unnest(%s::text[]) AS wa_id",
+                    (USER_CACHE_CHANNEL, wa_ids))
+
+
+def get_users(wa_ids):
+    """Return {wa_id: row} for the given ids; unknown users map to None.
+
+    Rows are (wa_id, name, email, registered, language) tuples, as before.
+    """
+    _ensure_listener()
+    wa_ids = list(dict.fromkeys(wa_ids))
+    found, missing = cache.lookup(wa_ids)
+    if missing:
+        generation = cache.generation
+        with db_pool.cursor() as cur:
+            if len(missing) == 1:
+                cur.execute(USER_SELECT + " WHERE wa_id = %s", (missing[0],))
+            else:
+                cur.execute(USER_SELECT + " WHERE wa_id = ANY(%s)", (missing,))
+            fetched = {row[0]: row for row in cur.fetchall()}
+        loaded = {wa_id: fetched.get(wa_id) for wa_id in missing}
+        cache.store(loaded, generation)
+        found.update(loaded)
+    return found
+
+
+def get_user(wa_id):
+    """Single-user read through the cache; None if the user doesn't exist."""
+    return get_users([wa_id])[wa_id]
+
+
+def _supplied(fields):
+    """Keep only known columns the caller actually passed (None = leave alone)."""
+    unknown = set(fields) - set(USER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown user column(s): {', '.join(sorted(unknown))}")
+    return {column: value for column, value in fields.items() if value is not None}
+
+
+def _upsert_sql(columns):
+    insert_columns = ", ".join(("wa_id",) + columns)
+    if not columns:
+        return f"INSERT INTO users ({insert_columns}) VALUES %s ON CONFLICT (wa_id) DO NOTHING"
+    updates = ", ".join(f"{column} = EXCLUDED.{column}" for column in columns)
+    return f"INSERT INTO users ({insert_columns}) VALUES %s ON CONFLICT (wa_id) DO UPDATE SET {updates}"
+
+
+def upsert_user(cur, wa_id, **fields):
+    """Upsert one user on an existing cursor; only supplied columns are written."""
+    fields = _supplied(fields)
+    columns = tuple(column for column in USER_COLUMNS if column in fields)
+    execute_values(cur, _upsert_sql(columns), [(wa_id,) + tuple(fields[c] for c in columns)])
+    _notify(cur, [wa_id])
+
+
+def upsert_users(cur, users):
+    """Upsert many users on an existing cursor.
+
+    `users` is an iterable of dicts with a wa_id plus any of USER_COLUMNS.
+    Rows for the same wa_id are merged (later values win) because one
+    statement can't update a row twice. Returns the number of users written.
+    """
+    merged = {}
+    for user in users:
+        user = dict(user)
+        wa_id = user.pop("wa_id")
+        merged.setdefault(wa_id, {}).update(_supplied(user))
+
+    by_columns = {}
+    for wa_id, fields in merged.items():
+        columns = tuple(column for column in USER_COLUMNS if column in fields)
+        by_columns.setdefault(columns, []).append((wa_id,) + tuple(fields[c] for c in columns))
+
+    for columns, rows in by_columns.items():
+        execute_values(cur, _upsert_sql(columns), rows, page_size=500)
+    _notify(cur, merged)
+    return len(merged)
+
+
+def save_user(wa_id, name=None, email=None, registered=None, language=None):
+    """Create or update a user; arguments left as None keep their stored value."""
+    try:
+        with db_pool.cursor() as cur:
+            upsert_user(cur, wa_id, name=name, email=email, registered=registered, language=language)
+    finally:
+        # Evict even on failure: we can't tell whether the write landed.
+        cache.invalidate([wa_id])
+
+
+def save_users(users):
+    """Batch variant of save_user - see upsert_users."""
+    users = list(users)
+    try:
+        with db_pool.cursor() as cur:
+            count = upsert_users(cur, users)
+    finally:
+        cache.invalidate({user["wa_id"] for user in users})
+    logger.info("Upserted %d users", count)
+    return count
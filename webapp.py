@@ -1,29 +1,53 @@
-from flask import Flask, render_template, redirect, url_for, session, request, jsonify
+from flask import Flask, Response, render_template, redirect, url_for, session, request, jsonify
 from flask_cors import CORS
-import psycopg2
 import os
+import logging
 from dotenv import load_dotenv
 import time
+import hashlib
 from datetime import datetime, timedelta
+import db_pool
+import user_stats
+import personal_records
+from dashboard import fetch_dashboard
+import workout_history
+import workout_export
+import exercise_catalog
+import fragments
+import response_cache
+import assets
+import compression
+import data_version
+import log_config
+import metrics
 
 load_dotenv()
+log_config.configure_logging()
 
 app = Flask(__name__)
+logger = logging.getLogger("webapp")
 app.secret_key = os.urandom(24)
 CORS(app)
+metrics.instrument_app(app, "webapp")
+metrics.register_stats("db_pool", lambda: db_pool.get_pool().stats())
+metrics.register_stats("fragment_cache", fragments.cache.stats)
+metrics.register_stats("user_fragment_cache", fragments.user_cache.stats)
+metrics.register_stats("response_cache", response_cache.cache.stats)
+metrics.register_stats("user_response_cache", response_cache.user_cache.stats)
+metrics.register_stats("exercise_catalog", lambda: {
+    "version": exercise_catalog.get_catalog().version,
+    "exercises": len(exercise_catalog.get_catalog()),
+})
 
-DB_HOST = os.getenv("DB_HOST")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_PORT = os.getenv("DB_PORT")
+# Load the exercise catalog in the background so the first lookup is warm
+exercise_catalog.start()
 
-def connect_db():
-    return psycopg2.connect(
-        host=DB_HOST, database=DB_NAME,
-        user=DB_USER, password=DB_PASSWORD,
-        port=DB_PORT
-    )
+app.jinja_env.trim_blocks = True
+app.jinja_env.lstrip_blocks = True
+static_assets = assets.init_app(app)
+metrics.register_stats("static_assets", static_assets.stats)
+compressor = compression.init_app(app)
+metrics.register_stats("compression", compressor.stats)
 
 @app.route('/')
 def home():
@@ -88,47 +112,35 @@ def home():
 def web_login(token):
     """Handle one-time token login from WhatsApp"""
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Verify token
-        cur.execute("""
-            SELECT wa_id, expires_at, used FROM login_tokens
-            WHERE token = %s
-        """, (token,))
-        
-        result = cur.fetchone()
-        
-        if not result:
-            cur.close()
-            conn.close()
-            return render_error("Invalid Login Link", "This login link is not valid. Please request a new one from WhatsApp.")
-        
-        wa_id, expires_at, used = result
-        
-        if used:
-            cur.close()
-            conn.close()
-            return render_error("Link Already Used", "This login link has already been used. Please request a new one from WhatsApp.")
-        
-        if int(time.time()) > expires_at:
-            cur.close()
-            conn.close()
-            return render_error("Link Expired", "This login link has expired. Please request a new one from WhatsApp.")
-        
-        # Mark token as used
-        cur.execute("UPDATE login_tokens SET used = TRUE WHERE token = %s", (token,))
-        
-        # Get user data
-        cur.execute("""
-            SELECT id, name, email, language FROM users WHERE wa_id = %s
-        """, (wa_id,))
-        
-        user_data = cur.fetchone()
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_pool.cursor() as cur:
+            # Verify token
+            cur.execute("""
+                SELECT wa_id, expires_at, used FROM login_tokens
+                WHERE token = %s
+            """, (token,))
+            
+            result = cur.fetchone()
+            
+            if not result:
+                return render_error("Invalid Login Link", "This login link is not valid. Please request a new one from WhatsApp.")
+            
+            wa_id, expires_at, used = result
+            
+            if used:
+                return render_error("Link Already Used", "This login link has already been used. Please request a new one from WhatsApp.")
+            
+            if int(time.time()) > expires_at:
+                return render_error("Link Expired", "This login link has expired. Please request a new one from WhatsApp.")
+            
+            # Mark token as used
+            cur.execute("UPDATE login_tokens SET used = TRUE WHERE token = %s", (token,))
+            
+            # Get user data
+            cur.execute("""
+                SELECT id, name, email, language FROM users WHERE wa_id = %s
+            """, (wa_id,))
+            
+            user_data = cur.fetchone()
         
         if user_data:
             # Set session
@@ -142,9 +154,7 @@ def web_login(token):
         return render_error("User Not Found", "Could not find your user account.")
         
     except Exception as e:
-        print(f"Login error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Login error")
         return render_error("Login Failed", f"An error occurred: {str(e)}")
 
 def render_error(title, message):
@@ -196,533 +206,139 @@ def dashboard():
         return redirect(url_for('home'))
     
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Get workout statistics
-        cur.execute("""
-            SELECT COUNT(DISTINCT w.id) as total_workouts,
-                   COUNT(we.id) as total_exercises,
-                   COALESCE(SUM(we.sets * we.reps), 0) as total_reps
-            FROM workouts w
-            LEFT JOIN workout_exercises we ON we.workout_id = w.id
-            WHERE w.user_id = %s
-        """, (session['user_id'],))
-        
-        stats = cur.fetchone()
-        total_workouts, total_exercises, total_reps = stats if stats else (0, 0, 0)
-        
-        # Get recent workouts (last 30 days)
-        cur.execute("""
-            SELECT w.workout_date, w.muscle_group, 
-                   we.exercise_name, we.sets, we.reps, we.weight, we.id as exercise_id
-            FROM workouts w
-            JOIN workout_exercises we ON we.workout_id = w.id
-            WHERE w.user_id = %s AND w.workout_date >= CURRENT_DATE - INTERVAL '30 days'
-            ORDER BY w.workout_date DESC, we.order_index
-            LIMIT 50
-        """, (session['user_id'],))
-        
-        workouts = cur.fetchall()
-        
-        # Get personal records
-        cur.execute("""
-            SELECT exercise_name, weight, reps, date_achieved
-            FROM personal_records
-            WHERE user_id = %s
-            ORDER BY date_achieved DESC
-            LIMIT 10
-        """, (session['user_id'],))
-        
-        records = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        return render_dashboard(session.get('name'), workouts, records, stats)
+        user_id, lang = session['user_id'], session.get('language') or 'en'
+        with db_pool.cursor() as cur:
+            # The page changes when the user's data does, when the 30-day
+            # window moves, and with name, language or a deploy.
+            data_key = (user_id, data_version.fetch(cur, user_id), datetime.now().strftime('%Y-%m-%d'))
+            key = ('dashboard',) + data_key + (session.get('name'), lang, PAGE_VERSION)
+            
+            def build():
+                # Totals, last 30 days and personal records in one round trip
+                workouts, records, stats = fetch_dashboard(cur, user_id)
+                return render_dashboard(session.get('name'), workouts, records, stats, lang, data_key)
+            
+            return response_cache.user_cache.respond(key, build, etag=data_version.etag(*key))
         
     except Exception as e:
-        print(f"Dashboard error: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Dashboard error")
         return f"Error loading dashboard: {str(e)}", 500
 
-def render_dashboard(name, workouts, records, stats):
+# Muscle groups shown on the dashboard, with bilingual names
+MUSCLE_GROUPS = [
+    {"key": "chest", "en": "Chest", "es": "Pecho", "emoji": "💪", "color": "#667eea"},
+    {"key": "back", "en": "Back", "es": "Espalda", "emoji": "🏋️", "color": "#f093fb"},
+    {"key": "biceps", "en": "Biceps", "es": "Bíceps", "emoji": "💪", "color": "#fa709a"},
+    {"key": "triceps", "en": "Triceps", "es": "Tríceps", "emoji": "💪", "color": "#fee140"},
+    {"key": "shoulders", "en": "Shoulders", "es": "Hombros", "emoji": "🏋️", "color": "#43e97b"},
+    {"key": "legs", "en": "Legs", "es": "Piernas", "emoji": "🦵", "color": "#4facfe"},
+    {"key": "abs", "en": "Abs", "es": "Abdominales", "emoji": "🎯", "color": "#30cfd0"},
+    {"key": "swimming", "en": "Swimming", "es": "Natación", "emoji": "🏊", "color": "#00d2ff"},
+]
+
+STROKE_TYPES = ['Freestyle', 'Backstroke', 'Breaststroke', 'Butterfly']
+
+PAGE_TEMPLATES = (
+    'dashboard.html', 'exercises.html', 'log_exercise.html', 'log_swimming.html',
+    '_muscle_cards.html', '_exercise_cards.html', '_recent_workouts.html', '_records.html',
+)
+
+# Compile every page template now rather than on each one's first request
+for template_name in PAGE_TEMPLATES:
+    app.jinja_env.get_template(template_name)
+
+# Changes when a deploy changes a template or asset, so page ETags do too
+PAGE_VERSION = hashlib.sha1(repr((
+    [app.jinja_env.loader.get_source(app.jinja_env, name)[0] for name in PAGE_TEMPLATES + ('base.html',)],
+    sorted(static_assets.by_name),
+)).encode('utf-8')).hexdigest()[:12]
+
+
+def render_partial(template_name, **context):
+    return app.jinja_env.get_template(template_name).render(**context)
+
+
+def render_fragment(key, template_name, **context):
+    """Render a fragment once per key (a tuple of everything it depends on); see fragments.py."""
+    return fragments.cache.get_or_render(
+        (template_name,) + key, lambda: render_partial(template_name, **context))
+
+
+def render_form(key, template_name, muscle_group, exercise_name, **context):
+    """A logging form page, cached per key in fragments.user_cache.
+
+    Only forms for catalog exercises are cached, so requests for made-up
+    /log-exercise URLs can't fill the cache.
+    """
+    context.update(muscle_group=muscle_group, exercise_name=exercise_name)
+    try:
+        known = exercise_catalog.get_catalog().has_exercise(muscle_group, exercise_name)
+    except Exception:
+        logger.warning("Exercise catalog unavailable; rendering form uncached", exc_info=True)
+        known = False
+    if not known:
+        return render_partial(template_name, **context)
+    return fragments.user_cache.get_or_render(
+        (template_name,) + key, lambda: render_partial(template_name, **context))
+
+
+def exercise_stats(muscle, sets, reps, weight):
+    """'3 × 10 @ 60.00kg', or for swimming '1h 5min • 500 cal' / '1500m • 500 cal'."""
+    if muscle and muscle.lower() == 'swimming':
+        # For swimming: weight field contains duration (minutes) or distance (meters)
+        # reps field contains calories
+        if weight < 1000:  # Assume values < 1000 are duration in minutes
+            hours, mins = int(weight // 60), int(weight % 60)
+            duration_str = f"{hours}h {mins}min" if hours > 0 else f"{mins}min"
+            return f"{duration_str} • {reps} cal"
+        return f"{int(weight)}m • {reps} cal"
+    return f"{sets} × {reps} @ {weight}kg"
+
+
+def group_workout_days(workouts):
+    """[(heading, badge, [(exercise, stats, exercise_id), ...]), ...] in row order."""
+    days = []
+    current_date = None
+    for date, muscle, exercise, sets, reps, weight, exercise_id in workouts:
+        if date != current_date:
+            days.append((date.strftime('%A, %B %d, %Y'), muscle.title() if muscle else 'General', []))
+            current_date = date
+        days[-1][2].append((exercise, exercise_stats(muscle, sets, reps, weight), exercise_id))
+    return days
+
+
+def render_dashboard(name, workouts, records, stats, lang='en', data_key=None):
+    """data_key is (user id, data version, date) of the rows, if known."""
     total_workouts, total_exercises, total_reps = stats
-    
-    # Define exactly 7 muscle groups with bilingual names
-    muscle_groups = [
-        {
-            "key": "chest",
-            "en": "Chest",
-            "es": "Pecho",
-            "emoji": "💪",
-            "color": "#667eea"
-        },
-        {
-            "key": "back",
-            "en": "Back",
-            "es": "Espalda",
-            "emoji": "🏋️",
-            "color": "#f093fb"
-        },
-        {
-            "key": "biceps",
-            "en": "Biceps",
-            "es": "Bíceps",
-            "emoji": "💪",
-            "color": "#fa709a"
-        },
-        {
-            "key": "triceps",
-            "en": "Triceps",
-            "es": "Tríceps",
-            "emoji": "💪",
-            "color": "#fee140"
-        },
-        {
-            "key": "shoulders",
-            "en": "Shoulders",
-            "es": "Hombros",
-            "emoji": "🏋️",
-            "color": "#43e97b"
-        },
-        {
-            "key": "legs",
-            "en": "Legs",
-            "es": "Piernas",
-            "emoji": "🦵",
-            "color": "#4facfe"
-        },
-        {
-            "key": "abs",
-            "en": "Abs",
-            "es": "Abdominales",
-            "emoji": "🎯",
-            "color": "#30cfd0"
-        },
-        {
-            "key": "swimming",
-            "en": "Swimming",
-            "es": "Natación",
-            "emoji": "🏊",
-            "color": "#00d2ff"
-        }
-    ]
-    
-    # Build muscle group cards
-    muscle_cards = ""
-    for muscle in muscle_groups:
-        muscle_cards += f"""
-        <div class="muscle-card" style="border-left: 4px solid {muscle['color']};" onclick="window.location.href='/exercises/{muscle['key']}'">
-            <div class="muscle-emoji">{muscle['emoji']}</div>
-            <h3>{muscle['en']}</h3>
-            <p class="muscle-subtitle">{muscle['es']}</p>
-        </div>
-        """
-    
-    # Build workout history HTML
-    workout_html = ""
-    if workouts:
-        current_date = None
-        for date, muscle, exercise, sets, reps, weight, exercise_id in workouts:
-            if date != current_date:
-                if current_date is not None:
-                    workout_html += "</div>"
-                workout_html += f"""
-                <div class="workout-day">
-                    <div class="workout-date">
-                        <strong>📅 {date.strftime('%A, %B %d, %Y')}</strong>
-                        <span class="muscle-badge">{muscle.title() if muscle else 'General'}</span>
-                    </div>
-                """
-                current_date = date
-            
-            # Check if this is a swimming exercise
-            is_swimming = muscle.lower() == 'swimming' if muscle else False
-            
-            if is_swimming:
-                # For swimming: weight field contains duration (minutes) or distance (meters)
-                # reps field contains calories
-                if weight < 1000:  # Assume values < 1000 are duration in minutes
-                    hours = int(weight // 60)
-                    mins = int(weight % 60)
-                    if hours > 0:
-                        duration_str = f"{hours}h {mins}min"
-                    else:
-                        duration_str = f"{mins}min"
-                    workout_html += f"""
-                    <div class="exercise-row">
-                        <span class="exercise-name">{exercise}</span>
-                        <span class="exercise-stats">{duration_str} • {reps} cal</span>
-                        <button class="delete-btn" onclick="deleteExercise({exercise_id})" title="Delete this exercise">🗑️</button>
-                    </div>
-                    """
-                else:  # Distance in meters
-                    workout_html += f"""
-                    <div class="exercise-row">
-                        <span class="exercise-name">{exercise}</span>
-                        <span class="exercise-stats">{int(weight)}m • {reps} cal</span>
-                        <button class="delete-btn" onclick="deleteExercise({exercise_id})" title="Delete this exercise">🗑️</button>
-                    </div>
-                    """
-            else:
-                workout_html += f"""
-                <div class="exercise-row">
-                    <span class="exercise-name">{exercise}</span>
-                    <span class="exercise-stats">{sets} × {reps} @ {weight}kg</span>
-                    <button class="delete-btn" onclick="deleteExercise({exercise_id})" title="Delete this exercise">🗑️</button>
-                </div>
-                """
-        
-        if current_date is not None:
-            workout_html += "</div>"
-    else:
-        workout_html = """
-        <div class="empty-state">
-            <div class="empty-emoji">🏋️</div>
-            <p>No workouts logged yet!</p>
-            <p>Start tracking your progress by browsing exercises below.</p>
-        </div>
-        """
-    
-    # Build personal records HTML
-    records_html = ""
-    if records:
-        for exercise, weight, reps, date in records:
-            records_html += f"""
-            <div class="record-item">
-                <div class="record-exercise">
-                    <strong>{exercise}</strong>
-                    <span class="record-date">{date.strftime('%b %d, %Y')}</span>
-                </div>
-                <div class="record-stats">
-                    <span class="record-weight">{weight}kg</span>
-                    <span class="record-reps">× {reps}</span>
-                </div>
-            </div>
-            """
+    lang = lang if lang in ('en', 'es') else 'en'
+    muscle_cards = render_fragment((lang,), '_muscle_cards.html', muscle_groups=MUSCLE_GROUPS, lang=lang)
+    # Per-user sections are keyed by the user's data version (or else their
+    # rows), so a name or language change doesn't render them again.
+    workouts, records = tuple(workouts), tuple(records)
+    recent_html = fragments.user_cache.get_or_render(
+        ('_recent_workouts.html', data_key or workouts),
+        lambda: render_partial('_recent_workouts.html', days=group_workout_days(workouts)))
+    records_html = fragments.user_cache.get_or_render(
+        ('_records.html', data_key or records), lambda: render_partial('_records.html', records=records))
+    return render_template(
+        'dashboard.html', name=name,
+        total_workouts=total_workouts, total_exercises=total_exercises, total_reps=total_reps,
+        muscle_cards=muscle_cards, recent_html=recent_html, records_html=records_html,
+    )
+
+
+def render_exercises_page(muscle_group, lang, catalog):
+    muscle_group = muscle_group.lower()
+    context = dict(exercises=catalog.by_muscle_language(muscle_group, 'en'),
+                   muscle_group=muscle_group, lang=lang)
+    # Only catalog groups are cached, so made-up URLs can't fill the cache
+    if catalog.has_muscle_group(muscle_group):
+        exercise_cards = render_fragment((muscle_group, lang, catalog.version), '_exercise_cards.html',
+                                         **context)
     else:
-        records_html = """
-        <div class="empty-state-small">
-            <p>Complete workouts to set your first PR! 🎯</p>
-        </div>
-        """
-    
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Workout Dashboard</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Arial, sans-serif;
-                background: #f5f7fa;
-                min-height: 100vh;
-                padding-bottom: 60px;
-            }}
-            .header {{
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                padding: 30px 20px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-            }}
-            .header-content {{
-                max-width: 1200px;
-                margin: 0 auto;
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-            }}
-            h1 {{ font-size: 1.8em; }}
-            .logout-btn {{
-                background: rgba(255,255,255,0.2);
-                color: white;
-                padding: 10px 20px;
-                text-decoration: none;
-                border-radius: 8px;
-                transition: background 0.3s;
-            }}
-            .logout-btn:hover {{
-                background: rgba(255,255,255,0.3);
-            }}
-            
-            .container {{
-                max-width: 1200px;
-                margin: 30px auto;
-                padding: 0 20px;
-            }}
-            .stats-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 20px;
-                margin-bottom: 30px;
-            }}
-            .stat-card {{
-                background: white;
-                padding: 25px;
-                border-radius: 15px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                text-align: center;
-            }}
-            .stat-value {{
-                font-size: 2.5em;
-                font-weight: bold;
-                color: #667eea;
-                display: block;
-            }}
-            .stat-label {{
-                color: #666;
-                margin-top: 8px;
-                font-size: 0.9em;
-            }}
-            
-            /* Muscle Group Cards Section */
-            .section-title {{
-                font-size: 1.8em;
-                color: #333;
-                margin: 40px 0 20px 0;
-            }}
-            .muscle-grid {{
-                display: grid;
-                grid-template-columns: repeat(auto-fill, minmax(180px, 1fr));
-                gap: 20px;
-                margin-bottom: 40px;
-            }}
-            .muscle-card {{
-                background: white;
-                padding: 30px 20px;
-                border-radius: 15px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                text-align: center;
-                cursor: pointer;
-                transition: all 0.3s ease;
-            }}
-            .muscle-card:hover {{
-                transform: translateY(-5px);
-                box-shadow: 0 5px 20px rgba(0,0,0,0.1);
-            }}
-            .muscle-emoji {{
-                font-size: 3em;
-                margin-bottom: 15px;
-            }}
-            .muscle-card h3 {{
-                color: #333;
-                margin-bottom: 5px;
-                font-size: 1.2em;
-            }}
-            .muscle-subtitle {{
-                color: #999;
-                font-size: 0.9em;
-                font-weight: 500;
-            }}
-            
-            .content-grid {{
-                display: grid;
-                grid-template-columns: 2fr 1fr;
-                gap: 20px;
-            }}
-            .card {{
-                background: white;
-                padding: 25px;
-                border-radius: 15px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-            }}
-            .card h2 {{
-                color: #333;
-                margin-bottom: 20px;
-                font-size: 1.5em;
-            }}
-            .workout-day {{
-                margin-bottom: 30px;
-                padding-bottom: 20px;
-                border-bottom: 2px solid #f0f0f0;
-            }}
-            .workout-day:last-child {{
-                border-bottom: none;
-            }}
-            .workout-date {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 15px;
-                color: #333;
-            }}
-            .muscle-badge {{
-                background: #667eea;
-                color: white;
-                padding: 5px 15px;
-                border-radius: 20px;
-                font-size: 0.85em;
-            }}
-            .exercise-row {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                padding: 12px;
-                background: #f8f9fa;
-                margin-bottom: 8px;
-                border-radius: 8px;
-                position: relative;
-            }}
-            .exercise-name {{
-                font-weight: 500;
-                color: #333;
-                flex: 1;
-            }}
-            .exercise-stats {{
-                color: #666;
-                font-family: 'Courier New', monospace;
-                margin-right: 10px;
-            }}
-            .delete-btn {{
-                background: #ff4444;
-                color: white;
-                border: none;
-                padding: 6px 12px;
-                border-radius: 6px;
-                cursor: pointer;
-                font-size: 1em;
-                transition: all 0.3s;
-                opacity: 0.7;
-            }}
-            .delete-btn:hover {{
-                opacity: 1;
-                background: #cc0000;
-                transform: scale(1.1);
-            }}
-            .record-item {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                padding: 15px;
-                background: #f8f9fa;
-                margin-bottom: 10px;
-                border-radius: 8px;
-                border-left: 4px solid #ffd700;
-            }}
-            .record-exercise strong {{
-                display: block;
-                color: #333;
-                margin-bottom: 5px;
-            }}
-            .record-date {{
-                color: #999;
-                font-size: 0.85em;
-            }}
-            .record-stats {{
-                text-align: right;
-            }}
-            .record-weight {{
-                font-size: 1.3em;
-                font-weight: bold;
-                color: #667eea;
-                display: block;
-            }}
-            .record-reps {{
-                color: #666;
-                font-size: 0.9em;
-            }}
-            .empty-state {{
-                text-align: center;
-                padding: 60px 20px;
-                color: #999;
-            }}
-            .empty-emoji {{
-                font-size: 4em;
-                margin-bottom: 20px;
-            }}
-            .empty-state-small {{
-                text-align: center;
-                padding: 40px 20px;
-                color: #999;
-            }}
-            
-            @media (max-width: 768px) {{
-                .content-grid {{
-                    grid-template-columns: 1fr;
-                }}
-                .header-content {{
-                    flex-direction: column;
-                    gap: 15px;
-                    text-align: center;
-                }}
-                .muscle-grid {{
-                    grid-template-columns: repeat(auto-fill, minmax(140px, 1fr));
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="header-content">
-                <h1>💪 {name}'s Workout Tracker</h1>
-                <a href="/logout" class="logout-btn">Logout</a>
-            </div>
-        </div>
-        
-        <div class="container">
-            <div class="stats-grid">
-                <div class="stat-card">
-                    <span class="stat-value">{total_workouts}</span>
-                    <span class="stat-label">Total Workouts</span>
-                </div>
-                <div class="stat-card">
-                    <span class="stat-value">{total_exercises}</span>
-                    <span class="stat-label">Total Exercises</span>
-                </div>
-                <div class="stat-card">
-                    <span class="stat-value">{total_reps:,}</span>
-                    <span class="stat-label">Total Reps</span>
-                </div>
-            </div>
-            
-            <h2 class="section-title">Browse Exercises by Muscle Group</h2>
-            <div class="muscle-grid">
-                {muscle_cards}
-            </div>
-            
-            <div class="content-grid">
-                <div class="card">
-                    <h2>Recent Workouts (Last 30 Days)</h2>
-                    {workout_html}
-                </div>
-                
-                <div class="card">
-                    <h2>🏆 Personal Records</h2>
-                    {records_html}
-                </div>
-            </div>
-        </div>
-        
-        <script>
-            async function deleteExercise(exerciseId) {{
-                if (!confirm('Are you sure you want to delete this exercise?')) {{
-                    return;
-                }}
-                
-                try {{
-                    const response = await fetch(`/api/delete-exercise/${{exerciseId}}`, {{
-                        method: 'DELETE'
-                    }});
-                    
-                    if (response.ok) {{
-                        alert('✅ Exercise deleted successfully!');
-                        window.location.reload();
-                    }} else {{
-                        alert('❌ Error deleting exercise');
-                    }}
-                }} catch (error) {{
-                    console.error('Error:', error);
-                    alert('❌ Error deleting exercise');
-                }}
-            }}
-        </script>
-    </body>
-    </html>
-    """
+        exercise_cards = render_partial('_exercise_cards.html', **context)
+    return render_template('exercises.html', muscle_group=muscle_group, exercise_cards=exercise_cards)
+
 
 # Add new route for exercise browsing by muscle group
 @app.route('/exercises/<muscle_group>')
@@ -732,676 +348,39 @@ def view_exercises(muscle_group):
         return redirect(url_for('home'))
     
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Get exercises for this muscle group
+        # The page depends only on the muscle group, language and catalog
+        # version, so it is rendered once per key and revalidated by ETag.
+        # Groups outside the catalog are rendered uncached, so made-up URLs
+        # can't push real pages out of the cache.
         lang = session.get('language', 'en')
-        
-        cur.execute("""
-            SELECT DISTINCT name_en, name_es, equipment, image_url, gif_url 
-            FROM exercises 
-            WHERE LOWER(muscle_group) = LOWER(%s)
-            AND (language = 'en' OR language IS NULL)
-            ORDER BY name_en
-        """, (muscle_group,))
-        
-        exercises = cur.fetchall()
-        
-        cur.close()
-        conn.close()
-        
-        # Build exercise cards
-        exercise_cards = ""
-        for name_en, name_es, equipment, image_url, gif_url in exercises:
-            exercise_name = name_en if lang == 'en' else name_es
-            
-            gif_section = ""
-            if gif_url:
-                gif_section = f'<a href="{gif_url}" target="_blank" class="gif-link">View Animation 🎬</a>'
-            
-            exercise_cards += f"""
-            <div class="exercise-card">
-                <img src="{image_url}" alt="{exercise_name}" onerror="this.src='https://via.placeholder.com/300x200?text=Exercise'">
-                <div class="exercise-info">
-                    <h3>{exercise_name}</h3>
-                    <p class="equipment">Equipment: {equipment}</p>
-                    {gif_section}
-                    <button class="log-btn" onclick="window.location.href='/log-exercise/{muscle_group}/{exercise_name}'">
-                        Log This Exercise
-                    </button>
-                </div>
-            </div>
-            """
-    
-        return f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>{muscle_group.title()} Exercises</title>
-            <meta name="viewport" content="width=device-width, initial-scale=1">
-            <style>
-                * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-                body {{
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Arial, sans-serif;
-                    background: #f5f7fa;
-                    min-height: 100vh;
-                }}
-                .header {{
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    padding: 20px;
-                }}
-                .header-content {{
-                    max-width: 1200px;
-                    margin: 0 auto;
-                    display: flex;
-                    align-items: center;
-                    gap: 20px;
-                }}
-                .back-btn {{
-                    background: rgba(255,255,255,0.2);
-                    color: white;
-                    padding: 10px 20px;
-                    text-decoration: none;
-                    border-radius: 8px;
-                }}
-                .container {{
-                    max-width: 1200px;
-                    margin: 30px auto;
-                    padding: 0 20px;
-                }}
-                .exercise-grid {{
-                    display: grid;
-                    grid-template-columns: repeat(auto-fill, minmax(300px, 1fr));
-                    gap: 25px;
-                }}
-                .exercise-card {{
-                    background: white;
-                    border-radius: 15px;
-                    overflow: hidden;
-                    box-shadow: 0 2px 10px rgba(0,0,0,0.05);
-                    transition: transform 0.3s;
-                }}
-                .exercise-card:hover {{
-                    transform: translateY(-5px);
-                    box-shadow: 0 5px 20px rgba(0,0,0,0.1);
-                }}
-                .exercise-card img {{
-                    width: 100%;
-                    height: 200px;
-                    object-fit: cover;
-                }}
-                .exercise-info {{
-                    padding: 20px;
-                }}
-                .exercise-info h3 {{
-                    color: #333;
-                    margin-bottom: 10px;
-                }}
-                .equipment {{
-                    color: #999;
-                    font-size: 0.9em;
-                    margin-bottom: 15px;
-                }}
-                .gif-link {{
-                    display: inline-block;
-                    color: #667eea;
-                    text-decoration: none;
-                    margin-bottom: 15px;
-                    font-size: 0.9em;
-                }}
-                .log-btn {{
-                    width: 100%;
-                    background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                    color: white;
-                    border: none;
-                    padding: 12px;
-                    border-radius: 8px;
-                    cursor: pointer;
-                    font-size: 1em;
-                    transition: opacity 0.3s;
-                }}
-                .log-btn:hover {{
-                    opacity: 0.9;
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="header">
-                <div class="header-content">
-                    <a href="/dashboard" class="back-btn">← Back</a>
-                    <h1>💪 {muscle_group.title()} Exercises</h1>
-                </div>
-            </div>
-            
-            <div class="container">
-                <div class="exercise-grid">
-                    {exercise_cards}
-                </div>
-            </div>
-            
-            <script>
-                function logExercise(exerciseName, muscleGroup) {{
-                    const sets = prompt("How many sets?", "3");
-                    if (!sets) return;
-                    
-                    const reps = prompt("How many reps?", "10");
-                    if (!reps) return;
-                    
-                    const weight = prompt("Weight in kg?", "20");
-                    if (!weight) return;
-                    
-                    fetch('/api/log-workout', {{
-                        method: 'POST',
-                        headers: {{'Content-Type': 'application/json'}},
-                        body: JSON.stringify({{
-                            muscle_group: muscleGroup,
-                            exercises: [{{
-                                name: exerciseName,
-                                sets: parseInt(sets),
-                                reps: parseInt(reps),
-                                weight: parseFloat(weight)
-                            }}]
-                        }})
-                    }})
-                    .then(response => response.json())
-                    .then(data => {{
-                        if (data.success) {{
-                            alert('✅ Workout logged successfully!');
-                        }} else {{
-                            alert('❌ Error logging workout');
-                        }}
-                    }});
-                }}
-            </script>
-        </body>
-        </html>
-        """
+        catalog = exercise_catalog.get_catalog()
+        muscle_group = muscle_group.lower()
+        if not catalog.has_muscle_group(muscle_group):
+            return render_exercises_page(muscle_group, lang, catalog)
+        return response_cache.cache.respond(
+            ('exercises', muscle_group, lang, catalog.version),
+            lambda: render_exercises_page(muscle_group, lang, catalog))
         
     except Exception as e:
-        print(f"Error viewing exercises: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error viewing exercises")
         return f"Error: {str(e)}", 500
 
 def render_swimming_log_form(muscle_group, exercise_name, current_date, display_date):
     """Special logging form for swimming exercises with Duration/Distance/Type"""
     
-    # Get stroke types for dropdown
-    stroke_types = ['Freestyle', 'Backstroke', 'Breaststroke', 'Butterfly']
-    
     # Extract stroke type from exercise name if possible
     default_stroke = 'Freestyle'
-    for stroke in stroke_types:
+    for stroke in STROKE_TYPES:
         if stroke.lower() in exercise_name.lower():
             default_stroke = stroke
             break
     
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Log {exercise_name}</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Arial, sans-serif;
-                background: #f5f7fa;
-                min-height: 100vh;
-                padding-bottom: 100px;
-            }}
-            .header {{
-                background: white;
-                padding: 15px 20px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                position: sticky;
-                top: 0;
-                z-index: 100;
-            }}
-            .header-content {{
-                max-width: 600px;
-                margin: 0 auto;
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-            }}
-            .back-btn {{
-                background: none;
-                border: none;
-                color: #00d2ff;
-                font-size: 1.1em;
-                cursor: pointer;
-                padding: 5px;
-            }}
-            .save-btn {{
-                background: #00d2ff;
-                color: white;
-                border: none;
-                padding: 8px 20px;
-                border-radius: 8px;
-                font-weight: 600;
-                cursor: pointer;
-            }}
-            .workout-info {{
-                max-width: 600px;
-                margin: 20px auto;
-                padding: 0 20px;
-            }}
-            .workout-title {{
-                font-size: 1.8em;
-                color: #333;
-                margin-bottom: 10px;
-                font-weight: bold;
-                line-height: 1.2;
-            }}
-            .workout-meta {{
-                display: flex;
-                gap: 20px;
-                color: #666;
-                font-size: 0.95em;
-                margin-bottom: 30px;
-                flex-wrap: wrap;
-            }}
-            .meta-item {{
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                cursor: pointer;
-                background: white;
-                padding: 10px 15px;
-                border-radius: 10px;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-                transition: all 0.3s;
-                position: relative;
-            }}
-            .meta-item:hover {{
-                color: #00d2ff;
-                box-shadow: 0 4px 10px rgba(0,210,255,0.2);
-                transform: translateY(-2px);
-            }}
-            .meta-item.clickable {{
-                border: 2px solid #e0e0e0;
-            }}
-            .meta-item.clickable:hover {{
-                border-color: #00d2ff;
-            }}
-            .date-picker {{
-                position: absolute;
-                opacity: 0;
-                width: 100%;
-                height: 100%;
-                top: 0;
-                left: 0;
-                cursor: pointer;
-                pointer-events: none;
-            }}
-            .exercise-card {{
-                background: white;
-                max-width: 600px;
-                margin: 0 auto 20px auto;
-                padding: 20px;
-                border-radius: 15px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            }}
-            .exercise-header {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 20px;
-            }}
-            .exercise-name {{
-                color: #00d2ff;
-                font-size: 1.2em;
-                font-weight: 600;
-            }}
-            .toggle-container {{
-                display: flex;
-                background: #f0f0f0;
-                border-radius: 10px;
-                padding: 4px;
-                margin-bottom: 25px;
-            }}
-            .toggle-btn {{
-                flex: 1;
-                padding: 10px 20px;
-                border: none;
-                background: transparent;
-                border-radius: 8px;
-                cursor: pointer;
-                font-weight: 600;
-                color: #666;
-                transition: all 0.3s;
-            }}
-            .toggle-btn.active {{
-                background: white;
-                color: #00d2ff;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.1);
-            }}
-            .form-group {{
-                margin-bottom: 20px;
-            }}
-            .form-label {{
-                display: block;
-                color: #666;
-                font-weight: 600;
-                margin-bottom: 8px;
-                font-size: 0.95em;
-            }}
-            .time-inputs {{
-                display: flex;
-                align-items: center;
-                gap: 10px;
-            }}
-            .time-input {{
-                flex: 1;
-                background: #f8f9fa;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                padding: 12px;
-                text-align: center;
-                font-size: 1.1em;
-                font-weight: 500;
-                color: #333;
-            }}
-            .time-input:focus {{
-                outline: none;
-                border-color: #00d2ff;
-                background: white;
-            }}
-            .time-label {{
-                color: #999;
-                font-size: 0.9em;
-                font-weight: 600;
-            }}
-            .distance-input {{
-                width: 100%;
-                background: #f8f9fa;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                padding: 12px;
-                text-align: center;
-                font-size: 1.1em;
-                font-weight: 500;
-                color: #333;
-            }}
-            .distance-input:focus {{
-                outline: none;
-                border-color: #00d2ff;
-                background: white;
-            }}
-            .type-selector {{
-                width: 100%;
-                background: #f8f9fa;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                padding: 12px;
-                font-size: 1em;
-                font-weight: 500;
-                color: #333;
-                cursor: pointer;
-            }}
-            .type-selector:focus {{
-                outline: none;
-                border-color: #00d2ff;
-                background: white;
-            }}
-            .calories-display {{
-                background: linear-gradient(135deg, #00d2ff 0%, #0099cc 100%);
-                color: white;
-                padding: 20px;
-                border-radius: 12px;
-                text-align: center;
-                margin-top: 20px;
-            }}
-            .calories-number {{
-                font-size: 2.5em;
-                font-weight: bold;
-                margin-bottom: 5px;
-            }}
-            .calories-label {{
-                font-size: 0.9em;
-                opacity: 0.9;
-            }}
-            .bottom-bar {{
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                background: white;
-                padding: 15px 20px;
-                box-shadow: 0 -2px 10px rgba(0,0,0,0.1);
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .finish-btn {{
-                width: 100%;
-                background: linear-gradient(135deg, #00d2ff 0%, #0099cc 100%);
-                color: white;
-                border: none;
-                padding: 15px;
-                border-radius: 10px;
-                font-size: 1.1em;
-                font-weight: 600;
-                cursor: pointer;
-            }}
-            
-            @media (max-width: 600px) {{
-                .workout-info {{
-                    padding: 0 15px;
-                }}
-                .workout-title {{
-                    font-size: 1.4em;
-                }}
-                .workout-meta {{
-                    gap: 15px;
-                    font-size: 0.9em;
-                }}
-                .exercise-card {{
-                    margin: 0 15px 20px 15px;
-                    padding: 15px;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="header-content">
-                <button class="back-btn" onclick="history.back()">✕ Cancel</button>
-                <button class="save-btn" onclick="saveWorkout()">Save</button>
-            </div>
-        </div>
-        
-        <div class="workout-info">
-            <h1 class="workout-title">🏊 {exercise_name}</h1>
-            <div class="workout-meta">
-                <div class="meta-item clickable" onclick="toggleDatePicker()" title="Click to change date">
-                    <span>📅</span>
-                    <span id="displayDate">{display_date}</span>
-                    <span style="color: #00d2ff; font-size: 0.8em;">▼</span>
-                    <input type="date" id="datePicker" class="date-picker" value="{current_date}" max="{current_date}" onchange="updateDate(this)">
-                </div>
-                <div class="meta-item">🏊 Swimming</div>
-            </div>
-        </div>
-        
-        <div class="exercise-card">
-            <div class="exercise-header">
-                <span class="exercise-name">{exercise_name}</span>
-            </div>
-            
-            <div class="toggle-container">
-                <button class="toggle-btn active" id="durationBtn" onclick="setMode('duration')">✓ Duration</button>
-                <button class="toggle-btn" id="distanceBtn" onclick="setMode('distance')">Distance</button>
-            </div>
-            
-            <div class="form-group">
-                <label class="form-label">Type</label>
-                <select class="type-selector" id="strokeType">
-                    <option value="Freestyle" {"selected" if default_stroke == "Freestyle" else ""}>Freestyle</option>
-                    <option value="Backstroke" {"selected" if default_stroke == "Backstroke" else ""}>Backstroke</option>
-                    <option value="Breaststroke" {"selected" if default_stroke == "Breaststroke" else ""}>Breaststroke</option>
-                    <option value="Butterfly" {"selected" if default_stroke == "Butterfly" else ""}>Butterfly</option>
-                </select>
-            </div>
-            
-            <div id="durationSection">
-                <div class="form-group">
-                    <label class="form-label">Duration</label>
-                    <div class="time-inputs">
-                        <input type="number" id="hours" class="time-input" placeholder="0" min="0" max="23" value="0" oninput="calculateCalories()">
-                        <span class="time-label">hours</span>
-                        <input type="number" id="minutes" class="time-input" placeholder="0" min="0" max="59" value="30" oninput="calculateCalories()">
-                        <span class="time-label">min</span>
-                    </div>
-                </div>
-            </div>
-            
-            <div id="distanceSection" style="display: none;">
-                <div class="form-group">
-                    <label class="form-label">Distance (meters)</label>
-                    <input type="number" id="distance" class="distance-input" placeholder="0" min="0" step="50" oninput="calculateCalories()">
-                </div>
-            </div>
-            
-            <div class="calories-display">
-                <div class="calories-number" id="caloriesDisplay">519</div>
-                <div class="calories-label">calories burned</div>
-            </div>
-        </div>
-        
-        <div class="bottom-bar">
-            <button class="finish-btn" onclick="saveWorkout()">Finish Workout 💪</button>
-        </div>
-        
-        <script>
-            let selectedDate = '{current_date}';
-            let currentMode = 'duration';
-            
-            function toggleDatePicker() {{
-                const picker = document.getElementById('datePicker');
-                if (picker.showPicker) {{
-                    try {{
-                        picker.showPicker();
-                    }} catch (e) {{
-                        picker.focus();
-                        picker.click();
-                    }}
-                }} else {{
-                    picker.focus();
-                    picker.click();
-                }}
-            }}
-            
-            function updateDate(picker) {{
-                selectedDate = picker.value;
-                const date = new Date(picker.value + 'T00:00:00');
-                const options = {{ year: 'numeric', month: 'short', day: 'numeric' }};
-                document.getElementById('displayDate').textContent = date.toLocaleDateString('en-US', options);
-            }}
-            
-            function setMode(mode) {{
-                currentMode = mode;
-                const durationBtn = document.getElementById('durationBtn');
-                const distanceBtn = document.getElementById('distanceBtn');
-                const durationSection = document.getElementById('durationSection');
-                const distanceSection = document.getElementById('distanceSection');
-                
-                if (mode === 'duration') {{
-                    durationBtn.classList.add('active');
-                    distanceBtn.classList.remove('active');
-                    durationSection.style.display = 'block';
-                    distanceSection.style.display = 'none';
-                }} else {{
-                    distanceBtn.classList.add('active');
-                    durationBtn.classList.remove('active');
-                    distanceSection.style.display = 'block';
-                    durationSection.style.display = 'none';
-                }}
-                calculateCalories();
-            }}
-            
-            function calculateCalories() {{
-                const strokeType = document.getElementById('strokeType').value;
-                let calories = 0;
-                
-                // Approximate calories per minute for different strokes (for 70kg person)
-                const caloriesPerMinute = {{
-                    'Freestyle': 11,
-                    'Backstroke': 9,
-                    'Breaststroke': 10,
-                    'Butterfly': 13
-                }};
-                
-                if (currentMode === 'duration') {{
-                    const hours = parseInt(document.getElementById('hours').value) || 0;
-                    const minutes = parseInt(document.getElementById('minutes').value) || 0;
-                    const totalMinutes = (hours * 60) + minutes;
-                    calories = Math.round(totalMinutes * caloriesPerMinute[strokeType]);
-                }} else {{
-                    const distance = parseInt(document.getElementById('distance').value) || 0;
-                    // Approximate: 100m takes about 2 minutes for average swimmer
-                    const estimatedMinutes = (distance / 100) * 2;
-                    calories = Math.round(estimatedMinutes * caloriesPerMinute[strokeType]);
-                }}
-                
-                document.getElementById('caloriesDisplay').textContent = calories;
-            }}
-            
-            // Calculate initial calories
-            calculateCalories();
-            
-            async function saveWorkout() {{
-                const strokeType = document.getElementById('strokeType').value;
-                let duration = 0;
-                let distance = 0;
-                
-                if (currentMode === 'duration') {{
-                    const hours = parseInt(document.getElementById('hours').value) || 0;
-                    const minutes = parseInt(document.getElementById('minutes').value) || 0;
-                    duration = (hours * 60) + minutes;
-                    
-                    if (duration === 0) {{
-                        alert('⚠️ Please enter a duration!');
-                        return;
-                    }}
-                }} else {{
-                    distance = parseInt(document.getElementById('distance').value) || 0;
-                    
-                    if (distance === 0) {{
-                        alert('⚠️ Please enter a distance!');
-                        return;
-                    }}
-                }}
-                
-                const calories = parseInt(document.getElementById('caloriesDisplay').textContent);
-                
-                const response = await fetch('/api/log-swimming-workout', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{
-                        exercise_name: '{exercise_name}',
-                        stroke_type: strokeType,
-                        mode: currentMode,
-                        duration: duration,
-                        distance: distance,
-                        calories: calories,
-                        workout_date: selectedDate
-                    }})
-                }});
-                
-                if (response.ok) {{
-                    alert('✅ Workout logged successfully!');
-                    window.location.href = '/dashboard';
-                }} else {{
-                    alert('❌ Error logging workout');
-                }}
-            }}
-        </script>
-    </body>
-    </html>
-    """
+    # Nothing on the form is per-user, so the whole page is one fragment
+    return render_form(
+        (exercise_name, current_date), 'log_swimming.html', muscle_group, exercise_name,
+        current_date=current_date, display_date=display_date, stroke_types=STROKE_TYPES,
+        default_stroke=default_stroke,
+    )
 
 @app.route('/log-exercise/<muscle_group>/<exercise_name>')
 def log_exercise_form(muscle_group, exercise_name):
@@ -1409,7 +388,6 @@ def log_exercise_form(muscle_group, exercise_name):
     if 'user_id' not in session:
         return redirect(url_for('home'))
     
-    from datetime import datetime
     current_date = datetime.now().strftime('%Y-%m-%d')
     display_date = datetime.now().strftime('%b %d, %Y')
     
@@ -1419,467 +397,10 @@ def log_exercise_form(muscle_group, exercise_name):
     if is_swimming:
         return render_swimming_log_form(muscle_group, exercise_name, current_date, display_date)
     
-    return f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Log {exercise_name}</title>
-        <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-            body {{
-                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Arial, sans-serif;
-                background: #f5f7fa;
-                min-height: 100vh;
-                padding-bottom: 100px;
-            }}
-            .header {{
-                background: white;
-                padding: 15px 20px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-                position: sticky;
-                top: 0;
-                z-index: 100;
-            }}
-            .header-content {{
-                max-width: 600px;
-                margin: 0 auto;
-                display: flex;
-                align-items: center;
-                justify-content: space-between;
-            }}
-            .back-btn {{
-                background: none;
-                border: none;
-                color: #667eea;
-                font-size: 1.1em;
-                cursor: pointer;
-                padding: 5px;
-            }}
-            .save-btn {{
-                background: #667eea;
-                color: white;
-                border: none;
-                padding: 8px 20px;
-                border-radius: 8px;
-                font-weight: 600;
-                cursor: pointer;
-            }}
-            .workout-info {{
-                max-width: 600px;
-                margin: 20px auto;
-                padding: 0 20px;
-            }}
-            .workout-title {{
-                font-size: 1.8em;
-                color: #333;
-                margin-bottom: 10px;
-                font-weight: bold;
-                line-height: 1.2;
-            }}
-            .workout-meta {{
-                display: flex;
-                gap: 20px;
-                color: #666;
-                font-size: 0.95em;
-                margin-bottom: 30px;
-                flex-wrap: wrap;
-            }}
-            .meta-item {{
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                cursor: pointer;
-                background: white;
-                padding: 10px 15px;
-                border-radius: 10px;
-                box-shadow: 0 2px 5px rgba(0,0,0,0.05);
-                transition: all 0.3s;
-                position: relative;
-            }}
-            .meta-item:hover {{
-                color: #667eea;
-                box-shadow: 0 4px 10px rgba(102,126,234,0.2);
-                transform: translateY(-2px);
-            }}
-            .meta-item.clickable {{
-                border: 2px solid #e0e0e0;
-            }}
-            .meta-item.clickable:hover {{
-                border-color: #667eea;
-            }}
-            .date-picker {{
-                position: absolute;
-                opacity: 0;
-                width: 100%;
-                height: 100%;
-                top: 0;
-                left: 0;
-                cursor: pointer;
-            }}
-            .exercise-card {{
-                background: white;
-                max-width: 600px;
-                margin: 0 auto 20px auto;
-                padding: 20px;
-                border-radius: 15px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.08);
-            }}
-            .exercise-header {{
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 20px;
-            }}
-            .exercise-name {{
-                color: #667eea;
-                font-size: 1.2em;
-                font-weight: 600;
-            }}
-            .set-table {{
-                width: 100%;
-                overflow-x: auto;
-            }}
-            .set-header {{
-                display: grid;
-                grid-template-columns: 60px 1fr 1fr 50px;
-                gap: 10px;
-                padding: 10px 0;
-                border-bottom: 2px solid #f0f0f0;
-                font-weight: 600;
-                color: #666;
-                font-size: 0.9em;
-            }}
-            .set-header > div {{
-                text-align: center;
-            }}
-            .set-header > div:first-child {{
-                text-align: left;
-            }}
-            .set-row {{
-                display: grid;
-                grid-template-columns: 60px 1fr 1fr 50px;
-                gap: 10px;
-                padding: 15px 0;
-                align-items: center;
-                border-bottom: 1px solid #f5f5f5;
-            }}
-            .set-number {{
-                background: #f0f0f0;
-                width: 40px;
-                height: 40px;
-                border-radius: 50%;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                font-weight: 600;
-                color: #333;
-            }}
-            .set-input {{
-                background: #f8f9fa;
-                border: 2px solid #e0e0e0;
-                border-radius: 8px;
-                padding: 10px;
-                text-align: center;
-                font-size: 1em;
-                font-weight: 500;
-                color: #333;
-                width: 100%;
-            }}
-            .set-input:focus {{
-                outline: none;
-                border-color: #667eea;
-                background: white;
-            }}
-            .check-mark {{
-                width: 30px;
-                height: 30px;
-                border-radius: 50%;
-                border: 2px solid #e0e0e0;
-                display: flex;
-                align-items: center;
-                justify-content: center;
-                cursor: pointer;
-                transition: all 0.3s;
-                margin: 0 auto;
-            }}
-            .check-mark.checked {{
-                background: #4CAF50;
-                border-color: #4CAF50;
-                color: white;
-            }}
-            .add-set-btn {{
-                width: 100%;
-                background: #f8f9fa;
-                border: 2px dashed #e0e0e0;
-                color: #666;
-                padding: 15px;
-                border-radius: 10px;
-                margin-top: 15px;
-                cursor: pointer;
-                font-size: 1em;
-                font-weight: 500;
-                transition: all 0.3s;
-            }}
-            .add-set-btn:hover {{
-                background: #e0e0e0;
-                border-color: #667eea;
-                color: #667eea;
-            }}
-            .bottom-bar {{
-                position: fixed;
-                bottom: 0;
-                left: 0;
-                right: 0;
-                background: white;
-                padding: 15px 20px;
-                box-shadow: 0 -2px 10px rgba(0,0,0,0.1);
-                max-width: 600px;
-                margin: 0 auto;
-            }}
-            .finish-btn {{
-                width: 100%;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                color: white;
-                border: none;
-                padding: 15px;
-                border-radius: 10px;
-                font-size: 1.1em;
-                font-weight: 600;
-                cursor: pointer;
-            }}
-            
-            @media (max-width: 600px) {{
-                .workout-info {{
-                    padding: 0 15px;
-                }}
-                .workout-title {{
-                    font-size: 1.4em;
-                }}
-                .workout-meta {{
-                    gap: 15px;
-                    font-size: 0.9em;
-                }}
-                .exercise-card {{
-                    margin: 0 15px 20px 15px;
-                    padding: 15px;
-                }}
-                .set-header {{
-                    grid-template-columns: 45px 90px 90px 45px;
-                    gap: 8px;
-                    font-size: 0.85em;
-                }}
-                .set-row {{
-                    grid-template-columns: 45px 90px 90px 45px;
-                    gap: 8px;
-                    padding: 12px 0;
-                }}
-                .set-number {{
-                    width: 35px;
-                    height: 35px;
-                    font-size: 0.9em;
-                }}
-                .set-input {{
-                    padding: 8px 4px;
-                    font-size: 0.95em;
-                }}
-                .check-mark {{
-                    width: 28px;
-                    height: 28px;
-                }}
-                .add-set-btn {{
-                    padding: 12px;
-                    font-size: 0.95em;
-                }}
-                .bottom-bar {{
-                    padding: 12px 15px;
-                }}
-                .finish-btn {{
-                    padding: 14px;
-                    font-size: 1em;
-                }}
-            }}
-            
-            @media (max-width: 400px) {{
-                .set-header {{
-                    grid-template-columns: 40px 80px 80px 40px;
-                    gap: 6px;
-                }}
-                .set-row {{
-                    grid-template-columns: 40px 80px 80px 40px;
-                    gap: 6px;
-                }}
-                .set-input {{
-                    padding: 6px 2px;
-                    font-size: 0.9em;
-                }}
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <div class="header-content">
-                <button class="back-btn" onclick="history.back()">✕ Cancel</button>
-                <button class="save-btn" onclick="saveWorkout()">Save</button>
-            </div>
-        </div>
-        
-        <div class="workout-info">
-            <h1 class="workout-title">{exercise_name}</h1>
-            <div class="workout-meta">
-                <div class="meta-item clickable" onclick="toggleDatePicker()" title="Click to change date">
-                    <span>📅</span>
-                    <span id="displayDate">{display_date}</span>
-                    <span style="color: #667eea; font-size: 0.8em;">▼</span>
-                    <input type="date" id="datePicker" class="date-picker" value="{current_date}" max="{current_date}" onchange="updateDate(this)">
-                </div>
-                <div class="meta-item">🏋️ {muscle_group.title()}</div>
-            </div>
-        </div>
-        
-        <div class="exercise-card">
-            <div class="exercise-header">
-                <span class="exercise-name">{exercise_name}</span>
-            </div>
-            
-            <div class="set-table">
-                <div class="set-header">
-                    <div>Set</div>
-                    <div>lbs</div>
-                    <div>Reps</div>
-                    <div>✓</div>
-                </div>
-                
-                <div id="setsContainer">
-                    <div class="set-row">
-                        <div class="set-number">1</div>
-                        <input type="number" class="set-input weight-input" placeholder="0" step="0.5">
-                        <input type="number" class="set-input reps-input" placeholder="0">
-                        <div class="check-mark" onclick="toggleCheck(this)"></div>
-                    </div>
-                    
-                    <div class="set-row">
-                        <div class="set-number">2</div>
-                        <input type="number" class="set-input weight-input" placeholder="0" step="0.5">
-                        <input type="number" class="set-input reps-input" placeholder="0">
-                        <div class="check-mark" onclick="toggleCheck(this)"></div>
-                    </div>
-                    
-                    <div class="set-row">
-                        <div class="set-number">3</div>
-                        <input type="number" class="set-input weight-input" placeholder="0" step="0.5">
-                        <input type="number" class="set-input reps-input" placeholder="0">
-                        <div class="check-mark" onclick="toggleCheck(this)"></div>
-                    </div>
-                </div>
-                
-                <button class="add-set-btn" onclick="addSet()">+ Add Set</button>
-            </div>
-        </div>
-        
-        <div class="bottom-bar">
-            <button class="finish-btn" onclick="saveWorkout()">Finish Workout 💪</button>
-        </div>
-        
-        <script>
-            let setCount = 3;
-            let selectedDate = '{current_date}';
-            
-            function toggleDatePicker() {{
-                const picker = document.getElementById('datePicker');
-                // Try modern API first, fallback to click
-                if (picker.showPicker) {{
-                    try {{
-                        picker.showPicker();
-                    }} catch (e) {{
-                        // Fallback for browsers that don't support showPicker
-                        picker.focus();
-                        picker.click();
-                    }}
-                }} else {{
-                    // Fallback for older browsers
-                    picker.focus();
-                    picker.click();
-                }}
-            }}
-            
-            function updateDate(picker) {{
-                selectedDate = picker.value;
-                const date = new Date(picker.value + 'T00:00:00');
-                const options = {{ year: 'numeric', month: 'short', day: 'numeric' }};
-                document.getElementById('displayDate').textContent = date.toLocaleDateString('en-US', options);
-            }}
-            
-            function toggleCheck(element) {{
-                element.classList.toggle('checked');
-                if (element.classList.contains('checked')) {{
-                    element.innerHTML = '✓';
-                }} else {{
-                    element.innerHTML = '';
-                }}
-            }}
-            
-            function addSet() {{
-                setCount++;
-                const container = document.getElementById('setsContainer');
-                
-                const setRow = document.createElement('div');
-                setRow.className = 'set-row';
-                setRow.innerHTML = `
-                    <div class="set-number">${{setCount}}</div>
-                    <input type="number" class="set-input weight-input" placeholder="0" step="0.5">
-                    <input type="number" class="set-input reps-input" placeholder="0">
-                    <div class="check-mark" onclick="toggleCheck(this)"></div>
-                `;
-                
-                container.appendChild(setRow);
-            }}
-            
-            async function saveWorkout() {{
-                const setRows = document.querySelectorAll('.set-row');
-                const exercises = [];
-                
-                setRows.forEach((row, index) => {{
-                    const weight = row.querySelector('.weight-input').value;
-                    const reps = row.querySelector('.reps-input').value;
-                    const checked = row.querySelector('.check-mark').classList.contains('checked');
-                    
-                    if (weight && reps && checked) {{
-                        exercises.push({{
-                            name: '{exercise_name}',
-                            sets: 1,
-                            reps: parseInt(reps),
-                            weight: parseFloat(weight)
-                        }});
-                    }}
-                }});
-                
-                if (exercises.length === 0) {{
-                    alert('⚠️ Please complete at least one set!');
-                    return;
-                }}
-                
-                const response = await fetch('/api/log-workout', {{
-                    method: 'POST',
-                    headers: {{'Content-Type': 'application/json'}},
-                    body: JSON.stringify({{
-                        muscle_group: '{muscle_group}',
-                        exercises: exercises,
-                        workout_date: selectedDate
-                    }})
-                }});
-                
-                if (response.ok) {{
-                    alert('✅ Workout logged successfully!');
-                    window.location.href = '/dashboard';
-                }} else {{
-                    alert('❌ Error logging workout');
-                }}
-            }}
-        </script>
-    </body>
-    </html>
-    """
+    return render_form(
+        (muscle_group, exercise_name, current_date), 'log_exercise.html', muscle_group, exercise_name,
+        current_date=current_date, display_date=display_date,
+    )
 
 @app.route('/api/log-workout', methods=['POST'])
 def api_log_workout():
@@ -1893,53 +414,58 @@ def api_log_workout():
         exercises = data['exercises']
         workout_date = data.get('workout_date', datetime.now().strftime('%Y-%m-%d'))
         
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Create workout with custom date
-        cur.execute("""
-            INSERT INTO workouts (user_id, workout_date, muscle_group)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        """, (session['user_id'], workout_date, muscle_group))
-        
-        workout_id = cur.fetchone()[0]
-        
-        # Add exercises
-        for idx, exercise in enumerate(exercises):
-            cur.execute("""
-                INSERT INTO workout_exercises 
-                (workout_id, exercise_name, sets, reps, weight, order_index)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (workout_id, exercise['name'], exercise['sets'], 
-                  exercise['reps'], exercise['weight'], idx))
-            
-            # Check for PR
-            cur.execute("""
-                SELECT weight FROM personal_records 
-                WHERE user_id = %s AND exercise_name = %s
-            """, (session['user_id'], exercise['name']))
-            
-            pr = cur.fetchone()
-            if not pr or exercise['weight'] > pr[0]:
+        with db_pool.cursor() as cur:
+            if exercises:
+                # Workout, every set and the PR upsert in one statement, so a
+                # 10-set session costs the same round trips as a single set.
+                new_records = personal_records.upsert_sql("""
+                    (SELECT ns.exercise_name, ns.sets, ns.reps, ns.weight,
+                            %(workout_date)s::date AS workout_date,
+                            LOWER(%(muscle_group)s) = 'swimming' AS swimming
+                     FROM new_sets ns)
+                """)
+                cur.execute(f"""
+                    WITH workout AS (
+                        INSERT INTO workouts (user_id, workout_date, muscle_group)
+                        VALUES (%(user_id)s, %(workout_date)s, %(muscle_group)s)
+                        RETURNING id
+                    ),
+                    new_sets AS (
+                        INSERT INTO workout_exercises
+                        (workout_id, exercise_name, sets, reps, weight, order_index)
+                        SELECT workout.id, v.exercise_name, v.sets, v.reps, v.weight, v.order_index - 1
+                        FROM workout, unnest(%(names)s::text[], %(sets)s::integer[], %(reps)s::integer[],
+                                             %(weights)s::numeric[])
+                             WITH ORDINALITY AS v (exercise_name, sets, reps, weight, order_index)
+                        RETURNING exercise_name, sets, reps, weight
+                    ),
+                    prs AS ({new_records})
+                    SELECT COALESCE(SUM(sets * reps), 0) FROM new_sets
+                """, {
+                    "user_id": session['user_id'],
+                    "workout_date": workout_date,
+                    "muscle_group": muscle_group,
+                    "names": [exercise['name'] for exercise in exercises],
+                    "sets": [exercise['sets'] for exercise in exercises],
+                    "reps": [exercise['reps'] for exercise in exercises],
+                    "weights": [exercise['weight'] for exercise in exercises],
+                })
+                total_reps = cur.fetchone()[0]
+            else:
                 cur.execute("""
-                    INSERT INTO personal_records (user_id, exercise_name, weight, reps)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (user_id, exercise_name)
-                    DO UPDATE SET weight = %s, reps = %s, date_achieved = %s
-                """, (session['user_id'], exercise['name'], exercise['weight'], 
-                      exercise['reps'], exercise['weight'], exercise['reps'], workout_date))
-        
-        conn.commit();
-        cur.close();
-        conn.close();
+                    INSERT INTO workouts (user_id, workout_date, muscle_group)
+                    VALUES (%s, %s, %s)
+                """, (session['user_id'], workout_date, muscle_group))
+                total_reps = 0
+            
+            user_stats.apply_delta(cur, session['user_id'], workouts=1,
+                                   exercises=len(exercises), reps=total_reps)
+            data_version.bump(cur, session['user_id'])
         
         return jsonify({"success": True})
         
     except Exception as e:
-        print(f"Error logging workout: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error logging workout")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/log-swimming-workout', methods=['POST'])
@@ -1958,76 +484,125 @@ def api_log_swimming_workout():
         calories = data.get('calories', 0)
         workout_date = data.get('workout_date', datetime.now().strftime('%Y-%m-%d'))
         
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Create workout
-        cur.execute("""
-            INSERT INTO workouts (user_id, workout_date, muscle_group)
-            VALUES (%s, %s, %s)
-            RETURNING id
-        """, (session['user_id'], workout_date, 'swimming'))
-        
-        workout_id = cur.fetchone()[0]
-        
         # Store swimming workout data
         # For swimming, we'll use the weight field for duration (minutes) or distance (meters)
         # and reps field for calories
         value = duration if mode == 'duration' else distance
         
-        cur.execute("""
-            INSERT INTO workout_exercises 
-            (workout_id, exercise_name, sets, reps, weight, order_index)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """, (workout_id, f"{stroke_type} Swimming", 1, calories, value, 0))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_pool.cursor() as cur:
+            # Create workout
+            cur.execute("""
+                INSERT INTO workouts (user_id, workout_date, muscle_group)
+                VALUES (%s, %s, %s)
+                RETURNING id
+            """, (session['user_id'], workout_date, 'swimming'))
+            
+            workout_id = cur.fetchone()[0]
+            
+            cur.execute("""
+                INSERT INTO workout_exercises 
+                (workout_id, exercise_name, sets, reps, weight, order_index)
+                VALUES (%s, %s, %s, %s, %s, %s)
+                RETURNING sets * reps
+            """, (workout_id, f"{stroke_type} Swimming", 1, calories, value, 0))
+            
+            user_stats.apply_delta(cur, session['user_id'], workouts=1, exercises=1,
+                                   reps=cur.fetchone()[0] or 0)
+            personal_records.record_sets(cur, session['user_id'], workout_date,
+                                         [(f"{stroke_type} Swimming", 1, calories, value)], swimming=True)
+            data_version.bump(cur, session['user_id'])
         
         return jsonify({"success": True})
         
     except Exception as e:
-        print(f"Error logging swimming workout: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error logging swimming workout")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/workouts', methods=['GET'])
 def get_workouts():
-    """API endpoint for workout data"""
+    """API endpoint for workout history, newest first.
+
+    Query parameters: cursor (next_cursor from the previous page), limit,
+    start_date / end_date (YYYY-MM-DD) and muscle_group.
+    """
     if 'user_id' not in session:
         return jsonify({"error": "Not authenticated"}), 401
     
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        cur.execute("""
-            SELECT w.workout_date, we.exercise_name, we.sets, we.reps, we.weight, w.muscle_group
-            FROM workouts w
-            JOIN workout_exercises we ON we.workout_id = w.id
-            WHERE w.user_id = %s
-            ORDER BY w.workout_date DESC
-            LIMIT 100
-        """, (session['user_id'],))
-        
-        data = cur.fetchall()
-        cur.close()
-        conn.close()
-        
-        return jsonify([{
-            "date": str(row[0]),
-            "exercise": row[1],
-            "sets": row[2],
-            "reps": row[3],
-            "weight": float(row[4]),
-            "muscle_group": row[5]
-        } for row in data])
+        limit = min(max(int(request.args.get('limit', workout_history.DEFAULT_LIMIT)), 1),
+                    workout_history.MAX_LIMIT)
+        start_date, end_date = (
+            datetime.strptime(request.args[key], '%Y-%m-%d').date() if request.args.get(key) else None
+            for key in ('start_date', 'end_date')
+        )
+        cursor = request.args.get('cursor')
+        if cursor:
+            workout_history.decode_cursor(cursor)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        user_id, muscle_group = session['user_id'], request.args.get('muscle_group')
+        with db_pool.cursor() as cur:
+            # Pages are cached per data version; clients revalidate with
+            # If-None-Match and get a bodiless 304, without the history
+            # query, if the user's data hasn't changed.
+            key = ('workouts', user_id, data_version.fetch(cur, user_id),
+                   cursor, limit, start_date, end_date, muscle_group)
+            
+            def build():
+                workouts, next_cursor = workout_history.fetch_page(
+                    cur, user_id, cursor=cursor, limit=limit, start_date=start_date,
+                    end_date=end_date, muscle_group=muscle_group)
+                return jsonify({"workouts": workouts, "next_cursor": next_cursor}).get_data()
+            
+            return response_cache.user_cache.respond(key, build, mimetype='application/json',
+                                                     etag=data_version.etag(*key))
         
     except Exception as e:
-        print(f"Error getting workouts: {e}")
+        logger.exception("Error getting workouts")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/workouts/export', methods=['GET'])
+def export_workouts():
+    """Stream the user's whole history: ?format=csv (default) or ndjson.
+
+    The body is gzip-encoded on the fly when the client accepts it.
+    """
+    if 'user_id' not in session:
+        return jsonify({"error": "Not authenticated"}), 401
+    
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in workout_export.FORMATS:
+        return jsonify({"error": f"Unsupported format: {fmt}"}), 400
+    
+    chunks = workout_export.stream(lambda name: db_pool.cursor(name=name), session['user_id'], fmt)
+    try:
+        # Run the query now, so a database error is still a clean 500.
+        first = next(chunks, None)
+    except Exception as e:
+        logger.exception("Error exporting workouts")
         return jsonify({"error": str(e)}), 500
+    
+    def body():
+        try:
+            if first is not None:
+                yield first
+            yield from chunks
+        except Exception:
+            logger.exception("Error streaming workout export")
+            raise
+    
+    stream = body()
+    headers = {
+        'Content-Disposition': f'attachment; filename="workouts-{datetime.now():%Y-%m-%d}.{fmt}"',
+        'Cache-Control': 'private, no-store',
+        'Vary': 'Accept-Encoding',
+    }
+    if 'gzip' in request.accept_encodings:
+        stream = workout_export.gzip_chunks(stream)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(stream, content_type=workout_export.FORMATS[fmt], headers=headers)
 
 @app.route('/api/delete-exercise/<int:exercise_id>', methods=['DELETE'])
 def delete_exercise(exercise_id):
@@ -2036,50 +611,50 @@ def delete_exercise(exercise_id):
         return jsonify({"error": "Not authenticated"}), 401
     
     try:
-        conn = connect_db()
-        cur = conn.cursor()
-        
-        # Verify the exercise belongs to the user before deleting
-        cur.execute("""
-            SELECT we.workout_id 
-            FROM workout_exercises we
-            JOIN workouts w ON w.id = we.workout_id
-            WHERE we.id = %s AND w.user_id = %s
-        """, (exercise_id, session['user_id']))
-        
-        result = cur.fetchone()
-        
-        if not result:
-            cur.close()
-            conn.close()
-            return jsonify({"error": "Exercise not found or unauthorized"}), 404
-        
-        workout_id = result[0]
-        
-        # Delete the exercise
-        cur.execute("DELETE FROM workout_exercises WHERE id = %s", (exercise_id,))
-        
-        # Check if this was the last exercise in the workout
-        cur.execute("""
-            SELECT COUNT(*) FROM workout_exercises WHERE workout_id = %s
-        """, (workout_id,))
-        
-        remaining_exercises = cur.fetchone()[0]
-        
-        # If no exercises left, delete the entire workout
-        if remaining_exercises == 0:
-            cur.execute("DELETE FROM workouts WHERE id = %s", (workout_id,))
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        with db_pool.cursor() as cur:
+            # Verify the exercise belongs to the user before deleting
+            cur.execute("""
+                SELECT we.workout_id 
+                FROM workout_exercises we
+                JOIN workouts w ON w.id = we.workout_id
+                WHERE we.id = %s AND w.user_id = %s
+            """, (exercise_id, session['user_id']))
+            
+            result = cur.fetchone()
+            
+            if not result:
+                return jsonify({"error": "Exercise not found or unauthorized"}), 404
+            
+            workout_id = result[0]
+            
+            # Delete the exercise
+            cur.execute("""
+                DELETE FROM workout_exercises WHERE id = %s RETURNING sets * reps, exercise_name
+            """, (exercise_id,))
+            deleted_reps, exercise_name = cur.fetchone()
+            deleted_reps = deleted_reps or 0
+            
+            # Check if this was the last exercise in the workout
+            cur.execute("""
+                SELECT COUNT(*) FROM workout_exercises WHERE workout_id = %s
+            """, (workout_id,))
+            
+            remaining_exercises = cur.fetchone()[0]
+            
+            # If no exercises left, delete the entire workout
+            if remaining_exercises == 0:
+                cur.execute("DELETE FROM workouts WHERE id = %s", (workout_id,))
+            
+            user_stats.apply_delta(cur, session['user_id'], workouts=-1 if remaining_exercises == 0 else 0,
+                                   exercises=-1, reps=-deleted_reps)
+            # The deleted set may have held a record; rebuild just that exercise.
+            personal_records.recompute(cur, session['user_id'], [exercise_name])
+            data_version.bump(cur, session['user_id'])
         
         return jsonify({"success": True})
         
     except Exception as e:
-        print(f"Error deleting exercise: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error deleting exercise")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/logout')
@@ -1,6 +1,7 @@
 from flask import Flask, request
-import requests
 import psycopg2
+from graph_api import GraphClient
+from users import upsert_user
 
 app = Flask(__name__)
 
@@ -16,6 +17,8 @@ DB_PORT = "5432"
 
 user_states = {}
 
+graph_client = GraphClient(ACCESS_TOKEN, PHONE_NUMBER_ID)
+
 def connect_db():
     return psycopg2.connect(
         host=DB_HOST, database=DB_NAME,
@@ -24,43 +27,13 @@ def connect_db():
     )
 
 def send_message(to, text):
-    url = f"https://graph.facebook.com/v18.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "type": "text",
-        "text": {"body": text}
-    }
-    requests.post(url, headers=headers, json=payload)
+    graph_client.send_text(to, text)
 
 def send_image(to, image_url, caption):
-    url = f"https://graph.facebook.com/v18.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "messaging_product": "whatsapp",
-        "to": to,
-        "type": "image",
-        "image": {
-            "link": image_url,
-            "caption": caption
-        }
-    }
-    requests.post(url, headers=headers, json=payload)
+    graph_client.send_image(to, image_url, caption)
 
 def send_interactive(payload):
-    url = f"https://graph.facebook.com/v18.0/{PHONE_NUMBER_ID}/messages"
-    headers = {
-        "Authorization": f"Bearer {ACCESS_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    requests.post(url, headers=headers, json=payload)
+    graph_client.send(payload)
 
 def send_language_buttons(to):
     payload = {
@@ -137,17 +110,11 @@ def get_user(wa_id):
         print("❌ DB error:", e)
         return None
 
-def save_user(wa_id, name=None, email=None, registered=False, language=None):
+def save_user(wa_id, name=None, email=None, registered=None, language=None):
     try:
         conn = connect_db()
         cur = conn.cursor()
-        cur.execute("SELECT wa_id FROM users WHERE wa_id = %s", (wa_id,))
-        if cur.fetchone():
-            cur.execute("UPDATE users SET name=%s, email=%s, registered=%s, language=%s WHERE wa_id=%s",
-                        (name, email, registered, language, wa_id))
-        else:
-            cur.execute("INSERT INTO users (wa_id, name, email, registered, language) VALUES (%s, %s, %s, %s, %s)",
-                        (wa_id, name, email, registered, language))
+        upsert_user(cur, wa_id, name=name, email=email, registered=registered, language=language)
         conn.commit()
         cur.close()
         conn.close()
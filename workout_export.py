@@ -0,0 +1,90 @@
+"""Stream a user's full workout history as CSV or NDJSON.
+
+Rows come from a server-side (named) cursor, EXPORT_FETCH_SIZE at a time,
+and are written out in ~64 KB chunks, so memory stays flat however long
+the history is. gzip_chunks() compresses the stream as it is produced.
+"""
+import io
+import os
+import csv
+import json
+import zlib
+
+EXPORT_FETCH_SIZE = int(os.getenv("EXPORT_FETCH_SIZE", "2000"))
+CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+COLUMNS = ("workout_id", "date", "muscle_group", "exercise_id", "exercise", "sets", "reps", "weight")
+
+EXPORT_SQL = """
+    SELECT w.id, w.workout_date, w.muscle_group,
+           we.id, we.exercise_name, we.sets, we.reps, we.weight
+    FROM workouts w
+    JOIN workout_exercises we ON we.workout_id = w.id
+    WHERE w.user_id = %s
+    ORDER BY w.workout_date, w.id, we.order_index
+"""
+
+
+def _csv_rows(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_rows(rows):
+    lines, size = [], 0
+    for workout_id, day, group, exercise_id, name, sets, reps, weight in rows:
+        line = json.dumps({
+            "workout_id": workout_id, "date": str(day), "muscle_group": group,
+            "exercise_id": exercise_id, "exercise": name, "sets": sets, "reps": reps,
+            "weight": float(weight) if weight is not None else None,
+        }) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_SIZE:
+            yield "".join(lines)
+            lines, size = [], 0
+    yield "".join(lines)
+
+
+def stream(cursor_factory, user_id, fmt="csv"):
+    """Yield the export as text chunks.
+
+    `cursor_factory(name)` must return a context manager giving a named
+    cursor, e.g. lambda name: db_pool.cursor(name=name). The connection is
+    held until the generator finishes or is closed.
+    """
+    encode = _csv_rows if fmt == "csv" else _ndjson_rows
+    with cursor_factory(f"workout_export_{user_id}") as cur:
+        cur.itersize = EXPORT_FETCH_SIZE
+        cur.execute(EXPORT_SQL, (user_id,))
+        for chunk in encode(cur):
+            if chunk:
+                yield chunk
+
+
+def gzip_chunks(chunks):
+    """gzip-encode a stream of text chunks as they arrive."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # wbits 31: gzip container
+    try:
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode("utf-8"))
+            if data:
+                yield data
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close:
+            close()
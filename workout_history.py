@@ -0,0 +1,88 @@
+"""Keyset-paginated workout history for /api/workouts.
+
+Pages are ordered newest first by (workout_date, id). The cursor is the
+key of the last workout on the previous page, so the next page starts
+with an index seek on workouts (user_id, workout_date, id) rather than
+skipping rows like OFFSET would: page 500 costs the same as page 1.
+A page holds whole workouts, each with its exercises in logged order.
+"""
+import base64
+import binascii
+import datetime
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def encode_cursor(workout_date, workout_id):
+    raw = f"{workout_date.isoformat()}:{workout_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Return (workout_date, workout_id); ValueError if the cursor is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, workout_id = raw.split(":")
+        return datetime.date.fromisoformat(day), int(workout_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"invalid cursor: {cursor!r}") from e
+
+
+def fetch_page(cur, user_id, cursor=None, limit=DEFAULT_LIMIT, start_date=None, end_date=None,
+               muscle_group=None):
+    """Return (workouts, next_cursor); next_cursor is None on the last page.
+
+    workouts: [{"id", "date", "muscle_group", "exercises": [...]}, ...]
+    """
+    conditions = ["user_id = %(user_id)s"]
+    params = {"user_id": user_id, "limit": limit + 1}
+    if cursor:
+        params["after_date"], params["after_id"] = decode_cursor(cursor)
+        conditions.append("(workout_date, id) < (%(after_date)s, %(after_id)s)")
+    if start_date:
+        conditions.append("workout_date >= %(start_date)s")
+        params["start_date"] = start_date
+    if end_date:
+        conditions.append("workout_date <= %(end_date)s")
+        params["end_date"] = end_date
+    if muscle_group:
+        conditions.append("LOWER(muscle_group) = LOWER(%(muscle_group)s)")
+        params["muscle_group"] = muscle_group
+
+    # One extra workout tells us whether there is a next page.
+    cur.execute(f"""
+        WITH page AS (
+            SELECT id, workout_date, muscle_group
+            FROM workouts
+            WHERE {" AND ".join(conditions)}
+            ORDER BY workout_date DESC, id DESC
+            LIMIT %(limit)s
+        )
+        SELECT p.id, p.workout_date, p.muscle_group,
+               we.id, we.exercise_name, we.sets, we.reps, we.weight
+        FROM page p
+        LEFT JOIN workout_exercises we ON we.workout_id = p.id
+        ORDER BY p.workout_date DESC, p.id DESC, we.order_index
+    """, params)
+
+    workouts = []
+    for workout_id, day, group, exercise_id, name, sets, reps, weight in cur.fetchall():
+        if not workouts or workouts[-1]["id"] != workout_id:
+            workouts.append({"id": workout_id, "date": day, "muscle_group": group, "exercises": []})
+        if exercise_id is not None:
+            workouts[-1]["exercises"].append({
+                "id": exercise_id,
+                "exercise": name,
+                "sets": sets,
+                "reps": reps,
+                "weight": float(weight) if weight is not None else None,
+            })
+
+    next_cursor = None
+    if len(workouts) > limit:
+        workouts = workouts[:limit]
+        next_cursor = encode_cursor(workouts[-1]["date"], workouts[-1]["id"])
+    for workout in workouts:
+        workout["date"] = str(workout["date"])
+    return workouts, next_cursor